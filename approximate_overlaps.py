@@ -0,0 +1,205 @@
+# python3
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from kmer_engine import _BYTE_CODES
+from overlap_adjacency import OverlapAdjacency
+
+'''
+Error tolerant suffix-prefix overlaps => minimizer seeds + bounded mismatch verification.
+
+Exact matching (see overlap_index) misses almost every overlap of reads with 1% errors.
+    1. Seeds => the (w, m) minimizers of every read: for each window of w consecutive m-mers keep the one
+       with the smallest hash, consecutive windows mostly share it, so a read has about 2L / (w + 1) of them
+    2. Candidates => two reads sharing a minimizer at positions pa in a and pb in b are on the diagonal
+       d = pa - pb, i.e. b starts d bases into a and the overlap is len(a) - d long.
+       Pairs are generated per minimizer (minimizers seen in too many reads are repeats and skipped),
+       (a, b, d) triples seen at least min_seeds times are kept => work near-linear in the number of reads
+    3. Verification => count the mismatches of a[d:] against the start of b, accepted if at most
+       max_mismatch_rate of the overlap. Sequencing errors are substitutions, so the diagonal is exact.
+       Candidates are verified in vectorized batches on a process pool.
+The adjacency is packed like build_overlap_graph's => adj[a] = [(b, overlap length)], longest first.
+'''
+
+DEFAULT_MINIMIZER_LENGTH = 15
+DEFAULT_WINDOW = 10
+DEFAULT_MIN_SEEDS = 2
+DEFAULT_MAX_MISMATCH_RATE = 0.05
+MAX_OCCURRENCES = 256  # minimizers in more reads than that are repeats, they would give quadratic candidates
+BATCH_SIZE = 1 << 14  # candidates verified at a time
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_PAD = 255  # padding byte, never equal to a base code of the other read
+
+
+def _padded_codes(reads):
+    """(reads x longest read) array of 2-bit codes, padded with _PAD"""
+    lengths = np.array([len(read) for read in reads], dtype=np.int64)
+    codes = np.full((len(reads), int(lengths.max(initial=0))), _PAD, dtype=np.uint8)
+    for length in np.unique(lengths).tolist():
+        rows = np.flatnonzero(lengths == length)
+        raw = np.frombuffer(''.join(reads[row] for row in rows.tolist()).encode('ascii'), dtype=np.uint8)
+        codes[rows, :length] = _BYTE_CODES[raw].reshape(len(rows), length)
+    return codes, lengths
+
+
+def read_minimizers(codes, lengths, m, w):
+    """:return (read, position, hash) of every minimizer of every read"""
+    found = []
+    for length in np.unique(lengths).tolist():
+        if length < m + w - 1:
+            continue
+        rows = np.flatnonzero(lengths == length)
+        group = codes[rows, :length]
+        mmers = np.zeros((len(rows), length - m + 1), dtype=np.uint64)
+        for i in range(m):
+            mmers <<= np.uint64(2)
+            mmers |= (group[:, i:i + length - m + 1] & 3).astype(np.uint64)
+        hashes = mmers * _MIX
+        hashes ^= hashes >> np.uint64(31)
+        # m-mers with a base other than A/C/G/T never become minimizers
+        invalid = np.lib.stride_tricks.sliding_window_view(group > 3, m, axis=1).any(axis=2)
+        hashes[invalid] = np.iinfo(np.uint64).max
+
+        windows = np.lib.stride_tricks.sliding_window_view(hashes, w, axis=1)
+        positions = windows.argmin(axis=2) + np.arange(windows.shape[1])
+        read_of = np.repeat(rows, windows.shape[1])
+        positions = positions.ravel()
+        keys = np.unique(read_of * (length + 1) + positions)  # a minimizer shared by windows counts once
+        read_of, positions = keys // (length + 1), keys % (length + 1)
+        local = np.searchsorted(rows, read_of)
+        minimizer_hashes = hashes[local, positions]
+        valid = minimizer_hashes != np.iinfo(np.uint64).max
+        found.append((read_of[valid], positions[valid], minimizer_hashes[valid]))
+    if not found:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.uint64)
+    return tuple(np.concatenate(column) for column in zip(*found))
+
+
+def candidate_overlaps(reads_of, positions, hashes, lengths, min_overlap, min_seeds, duplicates=False):
+    """
+    :param duplicates: only report pairs of reads of the same length starting at the same position (d == 0)
+    :return (a, b, d) with b starting d bases into a, supported by at least min_seeds shared minimizers
+    """
+    order = np.argsort(hashes, kind='stable')
+    reads_of, positions, hashes = reads_of[order], positions[order], hashes[order]
+    starts = np.flatnonzero(np.concatenate(([True], hashes[1:] != hashes[:-1])))
+    sizes = np.diff(np.append(starts, len(hashes)))
+    keep = (sizes > 1) & (sizes <= MAX_OCCURRENCES)
+    starts, sizes = starts[keep], sizes[keep]
+
+    # every ordered pair of occurrences of the same minimizer
+    first = np.repeat(np.arange(len(starts)), sizes * sizes)
+    within = np.arange(len(first)) - np.repeat(np.cumsum(sizes * sizes) - sizes * sizes, sizes * sizes)
+    i = starts[first] + within // sizes[first]
+    j = starts[first] + within % sizes[first]
+
+    a, b = reads_of[i], reads_of[j]
+    shift = positions[i] - positions[j]
+    overlap = lengths[a] - shift
+    if duplicates:
+        valid = (a < b) & (shift == 0) & (lengths[a] == lengths[b])
+    else:
+        valid = (a != b) & (shift > 0) & (overlap >= min_overlap) & (overlap < lengths[b])
+    a, b, shift = a[valid], b[valid], shift[valid]
+
+    triples, counts = np.unique(np.stack((a, b, shift), axis=1), axis=0, return_counts=True)
+    triples = triples[counts >= min_seeds]
+    return triples[:, 0], triples[:, 1], triples[:, 2]
+
+
+_shared = {}
+
+
+def _share(codes, lengths):
+    _shared['codes'], _shared['lengths'] = codes, lengths
+
+
+def _count_mismatches(batch):
+    """Mismatches of a[d:] against b[:len(a) - d] for a batch of candidates"""
+    a, b, shift = batch
+    codes, lengths = _shared['codes'], _shared['lengths']
+    columns = np.arange(codes.shape[1])
+    overlap = lengths[a] - shift
+    shifted = np.take_along_axis(codes[a], np.minimum(columns + shift[:, None], codes.shape[1] - 1), axis=1)
+    differ = (shifted != codes[b]) & (columns < overlap[:, None])
+    return differ.sum(axis=1)
+
+
+def verified_overlaps(codes, lengths, min_overlap, workers=1, m=DEFAULT_MINIMIZER_LENGTH, w=DEFAULT_WINDOW,
+                      min_seeds=DEFAULT_MIN_SEEDS, max_mismatch_rate=DEFAULT_MAX_MISMATCH_RATE, duplicates=False):
+    """
+    :param workers: processes verifying candidates, all cores if None
+    :return (a, b, overlap length) of every candidate with at most max_mismatch_rate mismatches
+    """
+    a, b, shift = candidate_overlaps(*read_minimizers(codes, lengths, m, w), lengths, min_overlap, min_seeds,
+                                     duplicates=duplicates)
+    batches = [(a[i:i + BATCH_SIZE], b[i:i + BATCH_SIZE], shift[i:i + BATCH_SIZE])
+               for i in range(0, len(a), BATCH_SIZE)]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(workers, initializer=_share, initargs=(codes, lengths)) as executor:
+            mismatches = list(executor.map(_count_mismatches, batches))
+    else:
+        _share(codes, lengths)
+        mismatches = [_count_mismatches(batch) for batch in batches]
+    _shared.clear()
+    mismatches = np.concatenate(mismatches) if mismatches else np.empty(0, dtype=np.int64)
+
+    overlap = lengths[a] - shift
+    verified = mismatches <= max_mismatch_rate * overlap
+    return a[verified], b[verified], overlap[verified]
+
+
+def tolerant_suffix_prefix_overlap(s, t, max_mismatch_rate=DEFAULT_MAX_MISMATCH_RATE):
+    """
+    Length of the longest suffix of s which matches a prefix of t with at most max_mismatch_rate mismatches
+    (shorter than both, no minimum length), the error tolerant overlap_layout.suffix_prefix_overlap.
+    Every length is checked at once => an (overlap lengths x bases) comparison, fine for a few pairs of reads.
+    """
+    longest = min(len(s), len(t)) - 1
+    if longest < 1:
+        return 0
+    codes_s, codes_t = (_BYTE_CODES[np.frombuffer(read.encode('ascii'), dtype=np.uint8)] for read in (s, t))
+    overlaps = np.arange(longest, 0, -1)
+    columns = np.arange(longest)
+    # row i => s[len(s) - overlaps[i]:] against t[:overlaps[i]], columns past the overlap don't count
+    shifted = codes_s[np.minimum(len(s) - overlaps[:, None] + columns, len(s) - 1)]
+    mismatches = ((shifted != codes_t[:longest]) & (columns < overlaps[:, None])).sum(axis=1)
+    accepted = np.flatnonzero(mismatches <= max_mismatch_rate * overlaps)
+    return int(overlaps[accepted[0]]) if len(accepted) else 0
+
+
+def distinct_reads(reads, workers=1, **options):
+    """
+    Error tolerant version of dropping duplicate reads => a read starting at the same position as an earlier read
+    of the same length (up to max_mismatch_rate mismatches) is dropped. With sequencing errors such copies are not
+    equal strings, and as they overlap nothing the other one doesn't, the layout could not place them.
+    """
+    if not reads:
+        return []
+    codes, lengths = _padded_codes(reads)
+    _, copies, _ = verified_overlaps(codes, lengths, 0, workers, duplicates=True, **options)
+    dropped = set(copies.tolist())
+    return [read for index, read in enumerate(reads) if index not in dropped]
+
+
+def approximate_overlap_graph(reads, min_overlap, workers=1, top=None, **options):
+    """
+    Overlaps of at least min_overlap bases with at most max_mismatch_rate mismatches
+    :param top: keep only the `top` longest overlaps of every read
+    :param options: m, w, min_seeds, max_mismatch_rate (see verified_overlaps)
+    :return OverlapAdjacency, adj[a] => list of (b, overlap length), longest first, one entry per pair of reads
+    """
+    if not reads:
+        return OverlapAdjacency.from_arrays(0, [], [], [])
+    codes, lengths = _padded_codes(reads)
+    a, b, overlap = verified_overlaps(codes, lengths, min_overlap, workers, **options)
+
+    # longest overlap of every pair of reads (a repeat can put b on several diagonals)
+    order = np.lexsort((-overlap, b, a))
+    a, b, overlap = a[order], b[order], overlap[order]
+    first = np.concatenate(([True], (a[1:] != a[:-1]) | (b[1:] != b[:-1])))
+    return OverlapAdjacency.from_arrays(len(reads), a[first], b[first], overlap[first], top)
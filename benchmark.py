@@ -0,0 +1,199 @@
+# python3
+import argparse
+import contextlib
+import gc
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import eulerian_cycle
+from bubble_detection import bubble_detection
+from optimal_k import find_optimal_k
+from overlap_graph import build_overlap_graph
+from phiX174_error_prone import PhiX174GenomeAssembler
+from phiX174_kmer_composition import EulerianCycle, GenomeAssembly_k_mer_composition
+from read_simulator import kmer_composition, random_genome, simulate_reads
+from tip_removal import remove_tip
+
+'''
+Benchmark suite => every entry point on seeded synthetic data of increasing size.
+
+For each genome size a random genome is generated and
+    error-free reads         => build_overlap_graph, optimal_k
+    reads with errors        => remove_tip.remove_tips, bubble_detection.count_bubbles,
+                                PhiX174GenomeAssembler.assemble_genome
+    k-mer composition graph  => phiX174_kmer_composition.EulerianCycle, eulerian_cycle.EulerianCycle
+Each run is timed on its own, then run again under tracemalloc for the peak memory
+(tracemalloc slows Python code down, so it never overlaps with the timing).
+Results go to a JSON file, --baseline compares them with an earlier file and exits with 1
+when an entry point got slower than the tolerance allows.
+
+    python benchmark.py --sizes 5000 20000 80000 --output bench.json
+'''
+
+DEFAULT_SIZES = [5000, 20000, 80000]
+
+
+def _overlap_graph(data):
+    return sum(len(neighbors) for neighbors in build_overlap_graph(list(dict.fromkeys(data['reads']))))
+
+
+def _optimal_k(data):
+    return find_optimal_k(data['reads'])
+
+
+def _remove_tips(data):
+    return remove_tip(15, data['error_reads']).remove_tips()
+
+
+def _count_bubbles(data):
+    return bubble_detection(15, 16, data['error_reads']).count_bubbles()
+
+
+def _assemble_genome(data):
+    genome = PhiX174GenomeAssembler(20, data['error_reads']).assemble_genome()
+    return len(genome) == len(data['genome']) and genome in data['genome'] * 2
+
+
+def _kmer_composition_cycle(data):
+    graph = GenomeAssembly_k_mer_composition.de_brujin(data['k'], data['kmers'])
+    path = EulerianCycle(graph).build_eulerian_cycle()
+    return len(path) == len(data['kmers']) + 1
+
+
+def _eulerian_cycle(data):
+    # the script reads "n m" and the edges from stdin and prints its answer
+    stdin = sys.stdin
+    sys.stdin = io.StringIO(data['edge_list'])
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            eulerian_cycle.EulerianCycle()
+    finally:
+        sys.stdin = stdin
+    return output.getvalue().startswith('1')
+
+
+ENTRY_POINTS = [
+    ('build_overlap_graph', _overlap_graph),
+    ('optimal_k', _optimal_k),
+    ('remove_tip.remove_tips', _remove_tips),
+    ('bubble_detection.count_bubbles', _count_bubbles),
+    ('PhiX174GenomeAssembler.assemble_genome', _assemble_genome),
+    ('phiX174_kmer_composition.EulerianCycle', _kmer_composition_cycle),
+    ('eulerian_cycle.EulerianCycle', _eulerian_cycle),
+]
+
+
+def make_dataset(size, args, seed):
+    genome = random_genome(size, seed)
+    kmers = kmer_composition(genome, args.k)
+    graph = GenomeAssembly_k_mer_composition.de_brujin(args.k, kmers)
+    edges = ['%d %d' % (source + 1, target + 1) for source, target in zip(graph.sources.tolist(), graph.targets.tolist())]
+    return {
+        'genome': genome,
+        'reads': simulate_reads(genome, args.read_length, args.coverage, 0.0, seed + 1),
+        'error_reads': simulate_reads(genome, args.read_length, args.coverage, args.error_rate, seed + 2,
+                                      exact_errors=not args.poisson_errors),
+        'k': args.k,
+        'kmers': kmers,
+        'edge_list': '%d %d\n%s\n' % (graph.num_nodes, len(edges), '\n'.join(edges)),
+    }
+
+
+def measure(function, data, repeat):
+    """:return best wall time over `repeat` runs, peak traced memory of one run, result of the last run"""
+    seconds = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = function(data)
+        seconds.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(data)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(seconds), peak, result
+
+
+def run(args):
+    selected = [(name, function) for name, function in ENTRY_POINTS if not args.only or name in args.only]
+    results = []
+    for size in args.sizes:
+        data = make_dataset(size, args, args.seed)
+        for name, function in selected:
+            seconds, peak, result = measure(function, data, args.repeat)
+            results.append({
+                'entry_point': name,
+                'genome_size': size,
+                'reads': len(data['reads']),
+                'seconds': round(seconds, 6),
+                'peak_bytes': peak,
+                'result': result if isinstance(result, (bool, int, type(None))) else str(result),
+            })
+            print('%-42s %9d bases %9.3f s %10.1f MiB' % (name, size, seconds, peak / 2 ** 20), file=sys.stderr)
+    return results
+
+
+def regressions(baseline, results, tolerance):
+    """Entries slower than baseline * (1 + tolerance) for the same entry point and genome size"""
+    before = {(entry['entry_point'], entry['genome_size']): entry['seconds'] for entry in baseline['results']}
+    slower = []
+    for entry in results:
+        key = (entry['entry_point'], entry['genome_size'])
+        if key in before and entry['seconds'] > before[key] * (1 + tolerance):
+            slower.append((key, before[key], entry['seconds']))
+    return slower
+
+
+def parse_args(argv):
+    # the notes above are a string after the imports, not the module docstring
+    parser = argparse.ArgumentParser(description='Benchmark every entry point on seeded synthetic data of increasing '
+                                                 'size, results are written as JSON')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='genome sizes in bases')
+    parser.add_argument('--read-length', type=int, default=100)
+    parser.add_argument('--coverage', type=float, default=30)
+    parser.add_argument('--error-rate', type=float, default=0.01, help='per base, reads given to the de Bruijn cleanup')
+    parser.add_argument('--poisson-errors', action='store_true',
+                        help='substitute every base with probability error-rate, instead of error-rate * read-length '
+                             'errors in every read like the assignment datasets')
+    parser.add_argument('--k', type=int, default=10, help='k of the k-mer composition Eulerian cycle inputs')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help='timed runs per entry point, the best one is kept')
+    parser.add_argument('--only', nargs='+', choices=[name for name, _ in ENTRY_POINTS])
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--baseline', help='earlier JSON output to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown against the baseline')
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'platform': platform.platform(), 'machine': platform.machine()},
+        'results': run(args),
+    }
+    with open(args.output, 'w') as handle:
+        json.dump(report, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            slower = regressions(json.load(handle), report['results'], args.tolerance)
+        for (name, size), before, after in slower:
+            print('regression: %s at %d bases %.3f s -> %.3f s' % (name, size, before, after), file=sys.stderr)
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
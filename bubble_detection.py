@@ -1,7 +1,15 @@
 # python3
-import itertools
 import sys
 
+from bubble_popping import DEFAULT_MAX_VISITED, count_bubbles
+from compaction import compact_graph
+from csr_graph import CSRGraph
+from external_counting import count_kmers_external, memory_budget_from_argv
+from graph_cache import GraphCache, cache_dir_from_argv, reads_digest
+from kmer_engine import KmerEngine, count_packed_kmers
+from parallel_counting import count_kmers_parallel, workers_from_argv
+from read_io import iter_reads, source_from_argv
+
 '''
 1) The De Bruijn graph has hanging tips, which means that some nodes don't have any outgoing edge.
 2) There can be more than one bubble between two nodes. The PDF isn't completely clear about this.
@@ -24,88 +32,78 @@ Try and look at what bubbles look like => ABCD is a bubble
 
 class bubble_detection:
 
-    def __init__(self, k_mer_size, threshold, reads):
+    def __init__(self, k_mer_size, threshold, reads, bulk=False, max_visited=DEFAULT_MAX_VISITED, workers=1,
+                 memory_budget=None, cache_dir=None):
         self.k = k_mer_size  # break Reads into k-mers of size k
+        self.kmer_engine = KmerEngine(self.k)
         self.threshold = threshold  # Threshold above which bubble length needs to be to be detected
 
-        self.de_bruijn_graph = {}  # De bruijn graph
-        self.paths = {}  # path during dgs
+        self.max_visited = max_visited  # path steps followed from each source before the search gives up
+        self.workers = workers  # processes counting k-mers, 1 => serial
+        self.memory_budget = memory_budget  # bytes, k-mers are counted through temporary files if set
 
         self.num_bubbles = 0
-        # for each node, we're storing [set of outgoing edges, number of incoming edges]
-        self.build_de_bruijn_graph(self.reads_to_kmers(reads))
+        # the compacted graph of the same reads and k is memory-mapped from the cache if it was built before
+        self.cache = None
+        if cache_dir:
+            reads = list(reads)  # hashed first, built from only on a cache miss
+            self.cache = GraphCache(cache_dir, reads_digest(reads), self.k)
+        self.de_bruijn_graph = self.cache.load('unitigs') if self.cache else None
+        if self.de_bruijn_graph is None:
+            # CSR graph => integer nodes, out/in degree arrays and a deleted-edge bitmap (see csr_graph)
+            if bulk or workers > 1 or memory_budget:
+                self.de_bruijn_graph = self.build_de_bruijn_graph_bulk(reads)
+            else:
+                self.de_bruijn_graph = self.build_de_bruijn_graph(self.reads_to_kmers(reads))
+            # walk unitigs instead of single k-mers, lengths are kept in k-mers (see compaction)
+            self.de_bruijn_graph = compact_graph(self.de_bruijn_graph)
+            if self.cache:
+                self.cache.store('unitigs', self.de_bruijn_graph)
 
     def reads_to_kmers(self, reads):
-        k_mers = []
-        for read in reads:
-            for j in range(len(read) - self.k + 1):
-                k_mers.append(read[j: j + self.k])
-        return k_mers
+        # packed k-mers, generated lazily
+        return self.kmer_engine.reads_to_kmers(reads)
 
     def build_de_bruijn_graph(self, kmers):
         """
             How to Build de-bruijn graph:
-            1. For each k_mer get left and right K-1 mer
+            1. For each k_mer get left and right K-1 mer (2-bit packed integers, see kmer_engine)
             2. Add an edge from left -> right in the graph
             3. If left and right already exist in the graph use those nodes as opposed to creating new ones
         """
-        for kmer in kmers:
-            left, right = kmer[:-1], kmer[1:]
-
-            if left != right:
-                # for each node, add [set of outgoing edges, number of incoming edges] by default
-                self.de_bruijn_graph.setdefault(left, [set(), 0])
-                self.de_bruijn_graph.setdefault(right, [set(), 0])
+        return CSRGraph.from_kmer_counts(*count_packed_kmers(kmers), self.k)
 
-                if right not in self.de_bruijn_graph[left][0]:
-                    self.de_bruijn_graph[left][0].add(right)
-                    self.de_bruijn_graph[right][1] += 1
+    def build_de_bruijn_graph_bulk(self, reads):
+        """
+        Same graph, but k-mers are counted with NumPy in one pass (see kmer_engine.count_kmers_bulk),
+        on `workers` processes partitioned by minimizer if there is more than one (see parallel_counting),
+        through partition files on disk if there is a memory budget (see external_counting)
+        """
+        if self.memory_budget:
+            return CSRGraph.from_kmer_counts(*count_kmers_external(reads, self.k, self.memory_budget), self.k)
+        return CSRGraph.from_kmer_counts(*count_kmers_parallel(reads, self.k, self.workers), self.k)
 
     def count_bubbles(self):
-        for k, v in self.de_bruijn_graph.items():
-            # If node has multiple outgoing edges its can be start of bubble
-            if self.has_multiple_outgoing_edges(k):
-                self.dfs(path=[k], start=k, current=k, depth=0)
-
-        # paths has candidates of [... [V --> W]...]
-        # where V has multiple outgoing, and W has multiple incoming and bubble length is beyond a threshold
-        # for Combination of these paths where their intersection size = 2 => Bubble
-        for _, candidates_list in self.paths.items():
-            # get every pair in paths -> nC2
-            for pair in itertools.combinations(candidates_list, r=2):
-                # # only v,w ie the start and end of bubble are shared
-                if len(set(pair[0]) & set(pair[1])) == 2:
-                    self.num_bubbles += 1
-
+        """
+        Simple paths of at most threshold k-mers from every node with multiple outgoing edges (see bubble_popping)
+        a bubble is counted for every pair of them ending at the same node with nothing else in common,
+        walked over unitigs instead of single k-mers
+        """
+        self.num_bubbles += count_bubbles(self.de_bruijn_graph, self.threshold, self.max_visited)
         return self.num_bubbles
 
-    def dfs(self, path, start, current, depth):
-        # start -> V, current -> W
-        # Bubble -> Non overlapping paths between V and W
-        # start always has multiple outgoing, current always has multiple incoming
-        if current != start and self.has_multiple_incoming(current):
-            self.paths \
-                .setdefault((start, current), list()) \
-                .append(path[:])
-
-        if depth == self.threshold:
-            return
-
-        # continue dfs for neighbors of current
-        for neighbor in self.de_bruijn_graph[current][0]:
-            if neighbor not in path:  # avoid cycle
-                path.append(neighbor)
-                self.dfs(path, start, neighbor, depth + 1)
-                path.remove(neighbor)
-
     def has_multiple_incoming(self, vertex):
-        return self.de_bruijn_graph[vertex][1] > 1
+        return self.de_bruijn_graph.in_degree[vertex] > 1
 
     def has_multiple_outgoing_edges(self, vertex):
-        return len(self.de_bruijn_graph[vertex][0]) > 1
+        return self.de_bruijn_graph.out_degree[vertex] > 1
 
 
 if __name__ == "__main__":
-    data = sys.stdin.read().split()
-    k, t, reads = data[0], data[1], data[2:]
-    print(bubble_detection(int(k), int(t), reads).count_bubbles())
+    # k and t come first, the rest of the input is streamed as reads
+    data = iter_reads(source_from_argv(sys.argv[1:]))
+    k, t = next(data), next(data)
+    bubbles = bubble_detection(int(k), int(t), data, bulk='--bulk' in sys.argv[1:], workers=workers_from_argv(sys.argv[1:]),
+                               memory_budget=memory_budget_from_argv(sys.argv[1:]),
+                               cache_dir=cache_dir_from_argv(sys.argv[1:]))
+    print(bubbles.count_bubbles())
@@ -0,0 +1,205 @@
+# python3
+import heapq
+
+from instrumentation import counting
+
+'''
+"Tour bus" bubble detection / popping on a CSRGraph.
+
+Enumerating every simple path up to `threshold` from each branching node is exponential in repeat rich regions.
+Instead run one bounded Dijkstra (a BFS on an uncompacted graph, every edge is 1 k-mer long) per branching node V:
+    * nodes are expanded by distance in k-mers, edges in decreasing coverage order,
+      so the shorter and heavier path usually reaches a node first
+    * every reached node remembers the tree edge of its shortest path and which outgoing edge of V that path
+      started with (its branch), a shorter path found later replaces both (relaxation), a node is final when popped
+    * between shortest paths of equal length the branch with the lower next base wins, so the trees and the bubbles
+      found do not depend on the expansion order and compaction does not change them
+    * once the search is done, an edge reaching a node W from a different branch of V closes two paths V -> W
+      (the tree path and the path through the edge) which share nothing but V and W => a (V, W)-bubble,
+      found without enumerating paths
+    * paths are at most `threshold` k-mers long and at most `max_visited` nodes are explored from each V
+
+Popping keeps the path with the higher mean coverage and removes the edges of the other one.
+
+Counting keeps the definition of bubble_detection: every pair of simple paths V -> W of at most `threshold` k-mers
+(W with multiple incoming edges) which share no node but V and W is a bubble, not only the shortest path pairs.
+The paths are enumerated by a DFS over the unitigs (a unitig is one step, its inner k-mers are on no other path)
+capped at `max_visited` steps per V, the inner nodes of a path are a bitmask so a pair is checked with one AND.
+'''
+
+DEFAULT_MAX_VISITED = 1000  # nodes explored per source before the search gives up
+
+
+def _tree_path(graph, parent, node):
+    """Edges of the shortest path tree from the source to node"""
+    path = []
+    while parent[node] != -1:
+        edge = parent[node]
+        path.append(edge)
+        node = int(graph.sources[edge])
+    path.reverse()
+    return path
+
+
+def _branch_rank(graph, edge):
+    """
+    Orders the branches of a source by the base they continue with (ids on a graph without sequences),
+    the same on the k-mer graph and on its unitigs
+    """
+    if graph.labels is None and graph.sequence_data is None:
+        return edge
+    return graph.edge_sequence(edge)[0]
+
+
+def find_bubbles(graph, source, threshold, max_visited=DEFAULT_MAX_VISITED, counters=None):
+    """
+    :return list of (path, other path) edge lists running from source to the same node through different branches,
+            the first path of a pair is the shortest path to that node
+    :param counters: dict receiving nodes_visited / bubble_candidates (see instrumentation)
+    """
+    parent = {source: -1}  # node -> tree edge of its shortest path so far
+    branch = {source: -1}  # node -> first edge of that path
+    dist = {source: 0}
+    settled = set()
+    reached = []  # (edge, branch of its source) of every edge followed from a settled node
+    coverage, lengths = graph.coverage, graph.lengths
+    rank = {edge: _branch_rank(graph, edge) for edge in graph.out_edges(source)}
+
+    # (distance, discovery order, node) => ties are expanded in the order they were found
+    heap = [(0, 0, source)]
+    discovered = 1
+    while heap:
+        distance, _, node = heapq.heappop(heap)
+        if node in settled:
+            continue  # stale entry, the node was reached again by a shorter path
+        settled.add(node)
+        for edge in sorted(graph.out_edges(node), key=lambda e: -coverage[e]):
+            target_distance = distance + lengths[edge]
+            if target_distance > threshold:
+                continue
+            target = int(graph.targets[edge])
+            if target == source:
+                continue
+            edge_branch = edge if node == source else branch[node]
+            reached.append((edge, edge_branch))
+            if target in settled:
+                continue
+            if target not in dist:
+                if len(dist) >= max_visited:
+                    continue
+            elif target_distance > dist[target] or (target_distance == dist[target]
+                                                    and rank[edge_branch] >= rank[branch[target]]):
+                continue
+            # first or shorter path to target => relax, a tie goes to the lower branch
+            if dist.get(target) != target_distance:
+                heapq.heappush(heap, (target_distance, discovered, target))
+                discovered += 1
+            parent[target], branch[target], dist[target] = edge, edge_branch, target_distance
+
+    # trees are final once every node is settled => an edge into a node of another branch closes a bubble
+    closing = []
+    for edge, edge_branch in reached:
+        target = int(graph.targets[edge])
+        if target in branch and branch[target] != edge_branch:
+            closing.append((dist[target], rank[edge_branch], edge, edge_branch))
+    closing.sort(key=lambda item: item[:2])  # nearest reconvergence first, whatever the expansion order was
+
+    arrivals = {}  # reconvergence node -> {branch: last edge of the path through that branch}
+    bubbles = []
+    for _, _, edge, edge_branch in closing:
+        target = int(graph.targets[edge])
+        seen = arrivals.setdefault(target, {branch[target]: parent[target]})
+        if edge_branch in seen:
+            continue
+        path = _tree_path(graph, parent, int(graph.sources[edge])) + [edge]
+        for last_edge in seen.values():
+            other = _tree_path(graph, parent, int(graph.sources[last_edge])) + [last_edge]
+            bubbles.append((other, path))
+        seen[edge_branch] = edge
+
+    if counters is not None:
+        counting(counters, 'nodes_visited', len(parent))
+        counting(counters, 'bubble_candidates', len(bubbles))
+    return bubbles
+
+
+def bubble_sources(graph):
+    """nodes with several outgoing edges, a bubble can only start there"""
+    return [node for node in range(graph.num_nodes) if graph.out_degree[node] > 1]
+
+
+def bubble_paths(graph, source, threshold, max_visited=DEFAULT_MAX_VISITED):
+    """
+    :return {W: [bitmask of the inner nodes of every simple path source -> W]} for the nodes W with multiple
+            incoming edges reached within threshold k-mers, at most max_visited paths are followed
+    """
+    bits = {source: 1}  # node -> its bit, given in the order the nodes are reached
+    paths = {}
+    steps = 0
+    stack = [(source, 0, 1, 0)]  # (node, distance, nodes on the path, inner nodes of the path)
+    while stack:
+        node, distance, on_path, inner = stack.pop()
+        for edge in graph.out_edges(node):
+            target_distance = distance + int(graph.lengths[edge])
+            if target_distance > threshold:
+                continue
+            target = int(graph.targets[edge])
+            bit = bits.setdefault(target, 1 << len(bits))
+            if on_path & bit:
+                continue  # simple paths only
+            if steps >= max_visited:
+                return paths
+            steps += 1
+            if graph.in_degree[target] > 1:
+                paths.setdefault(target, []).append(inner)
+            stack.append((target, target_distance, on_path | bit, inner | bit))
+    return paths
+
+
+def count_bubbles(graph, threshold, max_visited=DEFAULT_MAX_VISITED, counters=None):
+    """:return number of pairs of paths V -> W of at most threshold k-mers sharing nothing but V and W"""
+    sources = bubble_sources(graph)
+    counting(counters, 'bubble_sources', len(sources))
+    bubbles = 0
+    for source in sources:
+        for inner in bubble_paths(graph, source, threshold, max_visited).values():
+            counting(counters, 'bubble_candidates', len(inner))
+            bubbles += sum(1 for i, path in enumerate(inner) for other in inner[i + 1:] if not path & other)
+    return bubbles
+
+
+def mean_coverage(graph, path):
+    # weighted by length, a unitig edge counts once per k-mer
+    total = sum(float(graph.coverage[edge]) * int(graph.lengths[edge]) for edge in path)
+    return total / sum(int(graph.lengths[edge]) for edge in path)
+
+
+def pop_bubbles(graph, threshold, max_visited=DEFAULT_MAX_VISITED, counters=None, sources=None):
+    """
+    Remove the weaker path of every bubble
+    :param sources: branching nodes to search from, every branching node of the graph by default
+    :param counters: dict receiving the search counters, bubbles_popped and edges_removed in k-mers (see instrumentation)
+    :return number of bubbles popped
+    """
+    popped = edges_removed = 0
+    if sources is None:
+        sources = bubble_sources(graph)
+    for source in sources:
+        for first, second in find_bubbles(graph, source, threshold, max_visited, counters):
+            target = graph.targets[first[-1]]
+            # an earlier pop may have removed either path or the branching itself
+            if graph.out_degree[source] < 2 or graph.in_degree[target] < 2:
+                continue
+            if any(graph.is_deleted(edge) for edge in first + second):
+                continue
+
+            weaker = second if mean_coverage(graph, first) >= mean_coverage(graph, second) else first
+            for edge in weaker:
+                graph.remove_edge(edge)
+            edges_removed += sum(int(graph.lengths[edge]) for edge in weaker)  # in k-mers, as clip_tips counts
+            popped += 1
+
+    counting(counters, 'bubble_sources', len(sources))
+    counting(counters, 'bubbles_popped', popped)
+    counting(counters, 'edges_removed', edges_removed)
+    return popped
@@ -0,0 +1,70 @@
+# python3
+import numpy as np
+
+from csr_graph import CSRGraph
+
+'''
+Compacted de Bruijn graph.
+
+Most of a de Bruijn graph is made of non-branching chains
+    A -> B -> C -> D    (B and C have exactly one incoming and one outgoing edge)
+and every later stage walks them node by node.
+Compaction merges each maximal non-branching path into a single unitig edge A -> D which carries
+    * the sequence it spells (the bases it adds after A)
+    * its length in k-mers
+    * its mean coverage
+so only the junction nodes (in != 1 or out != 1) are left.
+An isolated cycle (every node in = out = 1, like a fully cleaned circular genome) becomes a single self loop.
+
+Lengths are counted in k-mers, so tip and bubble thresholds keep their meaning on the compacted graph.
+The compacted graph is a CSRGraph again, and can be compacted again after cleanup exposes new chains.
+'''
+
+
+def compact_graph(graph):
+    """
+    :return CSRGraph with one edge per maximal non-branching path of the live edges of graph
+    """
+    out_degree, in_degree = graph.out_degree, graph.in_degree
+    simple = ((out_degree == 1) & (in_degree == 1)).tolist()
+    visited = bytearray(len(graph.targets))
+    lengths, coverage = graph.lengths, graph.coverage
+
+    node_ids = {}  # node of graph -> node of the compacted graph
+    unitig_sources, unitig_targets, unitig_lengths, unitig_coverage, unitig_sequences = [], [], [], [], []
+
+    def add_unitig(start, edge):
+        chain, node = [], start
+        while True:
+            visited[edge] = 1
+            chain.append(edge)
+            node = int(graph.targets[edge])
+            if not simple[node] or node == start:
+                break
+            edge = next(graph.out_edges(node))
+
+        length = sum(int(lengths[edge]) for edge in chain)
+        unitig_sources.append(node_ids.setdefault(start, len(node_ids)))
+        unitig_targets.append(node_ids.setdefault(node, len(node_ids)))
+        unitig_lengths.append(length)
+        unitig_coverage.append(sum(float(coverage[edge]) * int(lengths[edge]) for edge in chain) / length)
+        unitig_sequences.append(''.join(graph.edge_sequence(edge) for edge in chain))
+
+    # 1. every unitig starts at a junction
+    for junction in np.flatnonzero((out_degree > 0) & ((out_degree != 1) | (in_degree != 1))).tolist():
+        for edge in graph.out_edges(junction):
+            add_unitig(junction, edge)
+
+    # 2. whatever is left are isolated cycles
+    for edge in np.flatnonzero(graph.live_edges()).tolist():
+        if not visited[edge]:
+            add_unitig(int(graph.sources[edge]), edge)
+
+    labels = None
+    if graph.labels is not None:
+        old_ids = np.empty(len(node_ids), dtype=np.int64)
+        old_ids[list(node_ids.values())] = list(node_ids.keys())
+        labels = graph.labels[old_ids]
+
+    return CSRGraph(len(node_ids), unitig_sources, unitig_targets, np.array(unitig_coverage, dtype=np.float64),
+                    labels, unitig_lengths, unitig_sequences)
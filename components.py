@@ -0,0 +1,233 @@
+# python3
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bubble_popping import DEFAULT_MAX_VISITED, pop_bubbles
+from csr_graph import CSRGraph
+from kmer_engine import BASES
+from shared_graph import attach, graph_arena
+from tip_clipping import clip_tips
+
+'''
+Region decomposition of the de Bruijn graph, tips and bubbles of every region are cleaned on a process pool.
+
+A tip is a chain of at most `threshold` k-mers and both paths of a bubble are at most `threshold` k-mers long,
+so an edge longer than threshold (a long unitig) is never part of either. Cutting the graph at long edges
+    regions => weakly connected components of the live edges of at most threshold k-mers
+gives pieces whose cleanup is independent: separate components, and separate regions between long unitigs.
+
+Every worker gets a small CSRGraph holding a few regions
+    * short edges of its regions, node ids renumbered in the original order
+    * a long edge leaving / entering one of its nodes becomes a stub to / from a placeholder node,
+      so every real node keeps its true degrees (tips and bubbles are decided on degrees)
+and sends back only the ids of the edges it removed, the parent applies them to the full graph.
+The graph and the partition are put in a shared memory arena once (see shared_graph), a task is just the
+arena layout and a part number => workers build their part from the shared arrays without any pickled graph.
+The tips / bubbles found are the ones the serial clip_tips / pop_bubbles find.
+
+Components are found with vectorized hooking + pointer jumping (min label propagation), regions are spread
+over the workers largest first, each to the least loaded worker (by number of edges).
+'''
+
+PARTS_PER_WORKER = 4
+
+
+def weakly_connected_components(num_nodes, sources, targets):
+    """:return component of every node, the smallest node id of its component"""
+    labels = np.arange(num_nodes)
+    sources, targets = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+    while True:
+        smallest = np.minimum(labels[sources], labels[targets])
+        hooked = labels.copy()
+        np.minimum.at(hooked, sources, smallest)
+        np.minimum.at(hooked, targets, smallest)
+        # pointer jumping => every node points straight to the root of its tree
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
+
+
+def _assign_regions(region_sizes, parts):
+    """Largest region first, each to the part with the fewest edges so far"""
+    assignment = np.empty(len(region_sizes), dtype=np.int64)
+    loads = [(0, part) for part in range(parts)]
+    for region in np.argsort(-region_sizes, kind='stable').tolist():
+        load, part = heapq.heappop(loads)
+        assignment[region] = part
+        heapq.heappush(loads, (load + int(region_sizes[region]), part))
+    return assignment
+
+
+def region_plan(graph, threshold, parts):
+    """
+    Split the live graph into at most `parts` worker graphs
+    :return dict of arrays, part p => edges part_edges[part_bounds[p]:part_bounds[p + 1]] (global ids),
+            from local_sources to local_targets (same slice) among num_local[p] local nodes, None if nothing to clean
+    """
+    sources, targets = graph.sources.astype(np.int64), graph.targets.astype(np.int64)
+    live = graph.live_edges()
+    short = live & (graph.lengths <= threshold)
+    short_edges = np.flatnonzero(short)
+    if not len(short_edges):
+        return None
+
+    component = weakly_connected_components(graph.num_nodes, sources[short_edges], targets[short_edges])
+    regions, region_of_edge = np.unique(component[sources[short_edges]], return_inverse=True)
+    sizes = np.bincount(region_of_edge.ravel(), minlength=len(regions))
+    parts = min(parts, len(regions))
+    assignment = _assign_regions(sizes, parts)
+
+    # part of every node, -1 for nodes without short edges (nothing to clean there)
+    part_of_node = np.full(graph.num_nodes, -1, dtype=np.int64)
+    active = np.zeros(graph.num_nodes, dtype=bool)
+    active[sources[short_edges]] = active[targets[short_edges]] = True
+    part_of_node[active] = assignment[np.searchsorted(regions, component[active])]
+
+    # local id of a node => its rank among the nodes of its part, in the original order
+    nodes = np.flatnonzero(active)
+    node_order = nodes[np.argsort(part_of_node[nodes], kind='stable')]
+    part_starts = np.searchsorted(part_of_node[node_order], np.arange(parts + 1))
+    local_id = np.full(graph.num_nodes, -1, dtype=np.int64)
+    local_id[node_order] = np.arange(len(node_order)) - part_starts[part_of_node[node_order]]
+
+    # every live edge goes to the part of its source and, if that's another part, to the part of its target
+    edges = np.flatnonzero(live)
+    source_part, target_part = part_of_node[sources[edges]], part_of_node[targets[edges]]
+    entries_edge = np.concatenate((edges[source_part >= 0], edges[(target_part >= 0) & (target_part != source_part)]))
+    entries_part = np.concatenate((source_part[source_part >= 0],
+                                   target_part[(target_part >= 0) & (target_part != source_part)]))
+    order = np.argsort(entries_part, kind='stable')
+    entries_edge, entries_part = entries_edge[order], entries_part[order]
+    bounds = np.searchsorted(entries_part, np.arange(parts + 1))
+
+    part_edges, local_sources, local_targets, num_local = [], [], [], []
+    for part in range(parts):
+        edges = entries_edge[bounds[part]:bounds[part + 1]]
+        num_real = int(part_starts[part + 1] - part_starts[part])
+        edge_sources, edge_targets = local_id[sources[edges]], local_id[targets[edges]]
+        # an end in another part (or in no part) becomes a placeholder node of its own
+        outside_source = part_of_node[sources[edges]] != part
+        outside_target = part_of_node[targets[edges]] != part
+        edge_sources[outside_source] = num_real + np.arange(outside_source.sum())
+        edge_targets[outside_target] = num_real + outside_source.sum() + np.arange(outside_target.sum())
+        num_local.append(num_real + int(outside_source.sum() + outside_target.sum()))
+
+        order = np.lexsort((edge_targets, edge_sources))
+        part_edges.append(edges[order])
+        local_sources.append(edge_sources[order])
+        local_targets.append(edge_targets[order])
+    plan = {'part_edges': np.concatenate(part_edges), 'part_bounds': bounds,
+            'local_sources': np.concatenate(local_sources), 'local_targets': np.concatenate(local_targets),
+            'num_local': np.array(num_local, dtype=np.int64)}
+    first_bases = _first_bases(graph, plan['part_edges'])
+    if first_bases is not None:
+        plan['first_bases'] = first_bases
+    return plan
+
+
+def _first_bases(graph, edges):
+    """ASCII code of the first base every edge adds, bubble branches are ordered by it (see bubble_popping)"""
+    if graph.sequence_data is not None:
+        return np.frombuffer(bytes(graph.sequence_data), dtype=np.uint8)[graph.sequence_offsets[edges]]
+    if graph.labels is not None:
+        codes = np.frombuffer(BASES.encode('ascii'), dtype=np.uint8)
+        return codes[(graph.labels[graph.targets[edges]] & 3).astype(np.int64)]
+    return None
+
+
+def part_subgraph(coverage, lengths, plan, part):
+    """
+    :return (CSRGraph of a part of region_plan, global id of every local edge)
+    the sequence of a local edge is only its first base, all the bubble search needs
+    """
+    start, end = plan['part_bounds'][part], plan['part_bounds'][part + 1]
+    edges = plan['part_edges'][start:end]
+    sequences = None
+    if 'first_bases' in plan:
+        sequences = list(plan['first_bases'][start:end].tobytes().decode('ascii'))
+    subgraph = CSRGraph(int(plan['num_local'][part]), plan['local_sources'][start:end],
+                        plan['local_targets'][start:end], coverage[edges], lengths=lengths[edges], sequences=sequences)
+    return subgraph, edges
+
+
+def _clip_region_tips(subgraph, threshold):
+    counters = {}
+    clip_tips(subgraph, threshold, counters=counters)
+    return counters
+
+
+def _pop_region_bubbles(subgraph, threshold, max_visited):
+    counters = {}
+    pop_bubbles(subgraph, threshold, max_visited, counters)
+    return counters
+
+
+def _clean_part(task):
+    """
+    Worker => attach to the arena (no copy), build the part, clean it
+    :return global ids of the removed edges, counters
+    """
+    layout, part, clean, options = task
+    arrays = attach(layout)
+    subgraph, edges = part_subgraph(arrays['coverage'], arrays['lengths'], arrays, part)
+    counters = clean(subgraph, *options)
+    return edges[~subgraph.live_edges()], counters
+
+
+def _run_regions(graph, threshold, workers, clean, extra, counters):
+    """Clean every part on the pool, apply the removed edges to graph and merge the counters"""
+    plan = region_plan(graph, threshold, workers * PARTS_PER_WORKER)
+    parts = 0 if plan is None else len(plan['num_local'])
+    results = []
+    if workers > 1 and parts > 1:
+        # graph and plan are shared once, a task is the arena layout and a part number
+        with graph_arena(graph, plan) as arena:
+            tasks = [(arena.layout, part, clean, (threshold,) + extra) for part in range(parts)]
+            with ProcessPoolExecutor(min(workers, parts)) as executor:
+                results = list(executor.map(_clean_part, tasks))
+    else:
+        for part in range(parts):
+            subgraph, edges = part_subgraph(graph.coverage, graph.lengths, plan, part)
+            part_counters = clean(subgraph, threshold, *extra)
+            results.append((edges[~subgraph.live_edges()], part_counters))
+
+    # the workers only return deltas, the parent applies them
+    for removed, part_counters in results:
+        for edge in removed.tolist():
+            graph.remove_edge(edge)
+        if counters is not None:
+            for name, value in part_counters.items():
+                counters[name] = counters.get(name, 0) + value
+    if counters is not None:
+        counters['regions'] = counters.get('regions', 0) + parts
+    return results
+
+
+def parallel_clip_tips(graph, threshold, workers, counters=None):
+    """
+    clip_tips region by region on `workers` processes
+    :return number of k-mer edges removed
+    """
+    before = int(graph.lengths[graph.live_edges()].sum())
+    _run_regions(graph, threshold, workers, _clip_region_tips, (), counters)
+    return before - int(graph.lengths[graph.live_edges()].sum())
+
+
+def parallel_pop_bubbles(graph, threshold, workers, max_visited=DEFAULT_MAX_VISITED, counters=None):
+    """
+    pop_bubbles region by region on `workers` processes
+    :return number of bubbles popped
+    """
+    local_counters = {}
+    _run_regions(graph, threshold, workers, _pop_region_bubbles, (max_visited,), local_counters)
+    if counters is not None:
+        for name, value in local_counters.items():
+            counters[name] = counters.get(name, 0) + value
+    return local_counters.get('bubbles_popped', 0)
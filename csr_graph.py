@@ -0,0 +1,207 @@
+# python3
+import numpy as np
+
+from kmer_engine import BASES, kmer_counts_to_edges
+
+'''
+Compact (CSR) representation of the de Bruijn graph.
+
+Instead of {node: [set(outgoing), indegree]} (a dict entry, a list and a set per node => hundreds of bytes)
+nodes are the integers 0 .. num_nodes - 1 and everything lives in flat arrays:
+
+    out_offsets[v] .. out_offsets[v + 1]  => ids of the edges leaving v (edges are sorted by source)
+    sources[e], targets[e], coverage[e]   => edge e
+    lengths[e]                            => number of k-mers edge e stands for (1 unless the graph is compacted)
+    in_offsets[v] .. in_offsets[v + 1]    => positions in in_edges of the edges entering v
+    out_degree[v], in_degree[v]           => live degrees (deleted edges are not counted)
+    deleted                               => 1 bit per edge, set once the edge is removed
+    labels[v]                             => packed (k-1)-mer of node v (optional, uint64 or Python ints if k > 32)
+    sequence_data[sequence_offsets[e] ..] => bases edge e adds after its source node (compacted graphs only)
+
+Edges are never moved, tip clipping and bubble popping only flip bits in `deleted`
+and decrement the degree arrays, so removal is O(1) and traversals skip deleted edges.
+insert_edges (incremental assembly) merges new edges into the sorted arrays, node ids stay, edge ids shift.
+'''
+
+
+class CSRGraph(object):
+
+    def __init__(self, num_nodes, sources, targets, coverage=None, labels=None, lengths=None, sequences=None):
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if coverage is None:
+            coverage = np.ones(len(sources), dtype=np.int64)
+
+        # sort edges by (source, target) => edge ids of a node are contiguous
+        order = np.lexsort((targets, sources))
+        self.num_nodes = num_nodes
+        self.sources = sources[order].astype(np.int32)
+        self.targets = targets[order].astype(np.int32)
+        coverage = np.asarray(coverage)[order]
+        # k-mer counts are integers, unitigs carry their mean coverage
+        self.coverage = coverage.astype(np.float32 if coverage.dtype.kind == 'f' else np.int32)
+        self.labels = None if labels is None else np.asarray(labels)
+        if self.labels is not None and self.labels.dtype != object:
+            self.labels = self.labels.astype(np.uint64)  # (k-1)-mers longer than 32 bases stay Python ints
+        if lengths is None:
+            self.lengths = np.ones(len(order), dtype=np.int32)
+        else:
+            self.lengths = np.asarray(lengths, dtype=np.int64)[order].astype(np.int32)
+
+        self.sequence_offsets = self.sequence_data = None
+        if sequences is not None:
+            sequences = [sequences[edge] for edge in order.tolist()]
+            self.sequence_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+            np.cumsum([len(sequence) for sequence in sequences], out=self.sequence_offsets[1:])
+            self.sequence_data = ''.join(sequences).encode('ascii')
+
+        self.out_offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.sources, minlength=num_nodes), out=self.out_offsets[1:])
+        self.in_offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.targets, minlength=num_nodes), out=self.in_offsets[1:])
+        self.in_edges = np.argsort(self.targets, kind='stable').astype(np.int32)
+
+        self.out_degree = np.diff(self.out_offsets).astype(np.int32)
+        self.in_degree = np.diff(self.in_offsets).astype(np.int32)
+        self.deleted = bytearray((len(self.targets) + 7) // 8)
+        self.num_edges = len(self.targets)
+
+    @classmethod
+    def from_kmer_counts(cls, kmers, counts, k):
+        """
+        de Bruijn graph of distinct packed k-mers, k-mer => edge left (k-1)-mer -> right (k-1)-mer
+        node ids are given in sorted order of the packed (k-1)-mers
+        """
+        left, right, coverage = kmer_counts_to_edges(kmers, counts, k)
+        labels, ids = np.unique(np.concatenate((left, right)), return_inverse=True)
+        ids = ids.ravel()
+        return cls(len(labels), ids[:len(left)], ids[len(left):], coverage, labels)
+
+    def is_deleted(self, edge):
+        return self.deleted[edge >> 3] >> (edge & 7) & 1
+
+    def remove_edge(self, edge):
+        if self.is_deleted(edge):
+            return False
+        self.deleted[edge >> 3] |= 1 << (edge & 7)
+        self.out_degree[self.sources[edge]] -= 1
+        self.in_degree[self.targets[edge]] -= 1
+        self.num_edges -= 1
+        return True
+
+    def restore_edge(self, edge):
+        """Undo remove_edge, e.g. when new reads support an edge cleanup removed"""
+        if not self.is_deleted(edge):
+            return False
+        self.deleted[edge >> 3] &= ~(1 << (edge & 7)) & 0xFF
+        self.out_degree[self.sources[edge]] += 1
+        self.in_degree[self.targets[edge]] += 1
+        self.num_edges += 1
+        return True
+
+    def insert_edges(self, sources, targets, coverage, labels=None):
+        """
+        Add live k-mer edges, ids from num_nodes on are new nodes carrying `labels`.
+        Old edges keep their order and deleted flags (ids after an insertion point shift), the arrays are merged
+        with vectorized inserts and the degrees only change at the ends of the new edges.
+        :return new id of every old edge, new id of every inserted edge (in the given order)
+        """
+        if self.sequence_data is not None:
+            raise ValueError('edges can only be inserted into a graph which is not compacted')
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        num_nodes = self.num_nodes + (0 if labels is None else len(labels))
+        num_old = len(self.targets)
+
+        # merge point of every new edge in the (source, target) order, old edge ids => shifted by the edges before
+        order = np.lexsort((targets, sources))
+        old_keys = self.sources.astype(np.int64) * num_nodes + self.targets
+        positions = np.searchsorted(old_keys, sources[order] * num_nodes + targets[order], side='right')
+        new_ids = np.empty(len(order), dtype=np.int64)
+        new_ids[order] = positions + np.arange(len(order))
+        old_ids = np.arange(num_old) + np.searchsorted(positions, np.arange(num_old), side='right')
+
+        self.sources = np.insert(self.sources, positions, sources[order].astype(np.int32))
+        self.targets = np.insert(self.targets, positions, targets[order].astype(np.int32))
+        self.coverage = np.insert(self.coverage, positions, np.asarray(coverage)[order].astype(self.coverage.dtype))
+        self.lengths = np.insert(self.lengths, positions, np.ones(len(order), dtype=np.int32))
+        bits = np.unpackbits(np.frombuffer(bytes(self.deleted), dtype=np.uint8), bitorder='little')[:num_old]
+        self.deleted = bytearray(np.packbits(np.insert(bits, positions, 0), bitorder='little').tobytes())
+
+        added = num_nodes - self.num_nodes
+        out_counts = np.append(np.diff(self.out_offsets), np.zeros(added, dtype=np.int64))
+        in_counts = np.append(np.diff(self.in_offsets), np.zeros(added, dtype=np.int64))
+        out_counts += np.bincount(sources, minlength=num_nodes)
+        in_counts += np.bincount(targets, minlength=num_nodes)
+        self.out_offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(out_counts, out=self.out_offsets[1:])
+        self.in_offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(in_counts, out=self.in_offsets[1:])
+
+        # in_edges stays sorted by (target, edge id), the renumbering is monotonic
+        in_edges = old_ids[self.in_edges]
+        incoming = new_ids[np.lexsort((new_ids, targets))]
+        total = len(self.targets)
+        at = np.searchsorted(self.targets[in_edges].astype(np.int64) * total + in_edges,
+                             self.targets[incoming].astype(np.int64) * total + incoming)
+        self.in_edges = np.insert(in_edges, at, incoming).astype(np.int32)
+
+        self.out_degree = np.append(self.out_degree, np.zeros(added, dtype=np.int32))
+        self.in_degree = np.append(self.in_degree, np.zeros(added, dtype=np.int32))
+        np.add.at(self.out_degree, sources, 1)
+        np.add.at(self.in_degree, targets, 1)
+        if labels is not None and self.labels is not None:
+            self.labels = np.concatenate((self.labels, np.asarray(labels, dtype=self.labels.dtype)))
+        self.num_nodes = num_nodes
+        self.num_edges += len(order)
+        return old_ids, new_ids
+
+    def out_edges(self, node):
+        """ids of the live edges leaving node"""
+        deleted = self.deleted
+        for edge in range(self.out_offsets[node], self.out_offsets[node + 1]):
+            if not deleted[edge >> 3] >> (edge & 7) & 1:
+                yield edge
+
+    def incoming_edges(self, node):
+        """ids of the live edges entering node"""
+        deleted = self.deleted
+        for edge in self.in_edges[self.in_offsets[node]:self.in_offsets[node + 1]].tolist():
+            if not deleted[edge >> 3] >> (edge & 7) & 1:
+                yield edge
+
+    def successors(self, node):
+        targets = self.targets
+        for edge in self.out_edges(node):
+            yield int(targets[edge])
+
+    def predecessors(self, node):
+        sources = self.sources
+        for edge in self.incoming_edges(node):
+            yield int(sources[edge])
+
+    def find_edge(self, source, target):
+        """id of the live edge source -> target, -1 if there is none"""
+        for edge in self.out_edges(source):
+            if self.targets[edge] == target:
+                return edge
+        return -1
+
+    def edge_sequence(self, edge):
+        """Bases edge adds to the sequence spelled by its source node"""
+        if self.sequence_data is None:
+            # k-mer edge => last base of the target (k-1)-mer
+            return BASES[int(self.labels[self.targets[edge]]) & 3]
+        start, end = self.sequence_offsets[edge], self.sequence_offsets[edge + 1]
+        return bytes(self.sequence_data[start:end]).decode('ascii')  # bytes, mmap or shared memoryview
+
+    def live_edges(self):
+        """boolean mask over edge ids, False for deleted edges"""
+        bits = np.unpackbits(np.frombuffer(bytes(self.deleted), dtype=np.uint8), bitorder='little')
+        return bits[:len(self.targets)] == 0
+
+    def nbytes(self):
+        arrays = [self.sources, self.targets, self.coverage, self.lengths, self.out_offsets, self.in_offsets,
+                  self.in_edges, self.out_degree, self.in_degree]
+        arrays += [a for a in (self.labels, self.sequence_offsets) if a is not None]
+        return sum(a.nbytes for a in arrays) + len(self.deleted) + len(self.sequence_data or b'')
@@ -1,12 +1,14 @@
 # python2
 import sys
 
+from csr_graph import CSRGraph
+from hierholzer import eulerian_cycle, path_nodes
+
+
 class EulerianCycle:
     def __init__(self):
-        self.numExploredEdges = 0  # number of explored edges
-        self.nodesWUE = dict()  # key: node with unused edges; value: the position of such node in the current path
         self.path = [] # final Path
-        self.adjList = [] # Graph as Adjacency list
+        self.graph = None # Graph in CSR form
 
         # Check if Eulerian Path can Exist
         is_balanced = self.read_input()
@@ -18,41 +20,9 @@ class EulerianCycle:
 
         self.print_path()
 
-    def explore(self, s):
-        self.path.append(s)
-        curPos = self.adjCurPos[s]
-        curMaxPos = self.outDegree[s]
-        while curPos < curMaxPos:
-            self.adjCurPos[s] = curPos + 1
-            if curPos + 1 < curMaxPos:
-                self.nodesWUE[s] = len(self.path) - 1
-            else:
-                if s in self.nodesWUE:
-                    del self.nodesWUE[s]
-            v = self.adjList[s][curPos]
-            self.path.append(v)
-            s = v
-            curPos = self.adjCurPos[s]
-            curMaxPos = self.outDegree[s]
-            self.numExploredEdges -= 1
-        return
-
-    def update_path(self, startPos):
-        l = len(self.path) - 1
-        self.path = self.path[startPos:l] + self.path[:startPos]
-        for node, pos in self.nodesWUE.items():
-            if pos < startPos:
-                self.nodesWUE[node] = pos + l - startPos
-            else:
-                self.nodesWUE[node] = pos - startPos
-        return
-
     def build_eulerian_cycle(self):
-        self.explore(1)
-        while self.numExploredEdges > 0:
-            node, pos = self.nodesWUE.popitem()
-            self.update_path(pos)
-            self.explore(node)
+        # stack based Hierholzer, O(Edges) (see hierholzer)
+        self.path = path_nodes(self.graph, eulerian_cycle(self.graph))
         return self.path
 
     def print_path(self):
@@ -60,29 +30,15 @@ class EulerianCycle:
 
     def read_input(self):
         data = list(sys.stdin.read().strip().split())
-        self.numVertex, self.numExploredEdges = int(data[0]), int(data[1])
-        self.adjList = [[] for _ in range(self.numVertex)]
-        self.unusedEdges = [[] for _ in range(self.numVertex)]
-
-        self.outDegree = [0] * self.numVertex
-        self.inDegree = [0] * self.numVertex
-        self.adjCurPos = [0] * self.numVertex
-
-        for i in range(self.numExploredEdges):
-            # find index of vertex
-            curFrom = int(data[2 * i + 2]) - 1
-            curTo = int(data[2 * i + 3]) - 1
+        self.numVertex, numEdges = int(data[0]), int(data[1])
 
-            self.adjList[curFrom].append(curTo)
-            self.outDegree[curFrom] += 1
-            self.inDegree[curTo] += 1
+        # find index of vertex
+        edges = [int(vertex) - 1 for vertex in data[2:2 + 2 * numEdges]]
+        self.graph = CSRGraph(self.numVertex, edges[0::2], edges[1::2])
 
         # Check In degree == Out degree
-        for i in range(self.numVertex):
-            if self.outDegree[i] != self.inDegree[i]:
-                return False
-        return True
+        return bool((self.graph.out_degree == self.graph.in_degree).all())
 
 
 if __name__ == "__main__":
-    EulerianCycle()
\ No newline at end of file
+    EulerianCycle()
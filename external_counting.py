@@ -0,0 +1,142 @@
+# python3
+import os
+import tempfile
+
+import numpy as np
+
+from kmer_engine import MAX_BULK_K, _count_chunk
+
+'''
+External memory (disk partitioned) k-mer counting, for read sets whose k-mers don't fit in RAM.
+
+    1. Reads are counted a chunk at a time with NumPy (see kmer_engine), the chunk is sized from the budget
+    2. The distinct (k-mer, count) records of the chunk are appended to one of 2^PARTITION_BITS files,
+       chosen by the leading bases of the packed k-mer
+    3. Every file is loaded and counted on its own, a file which is still too big for the budget
+       (low complexity regions all share a prefix) is split again on its next bases
+
+Partitions are ranges of packed k-mers, so counting them in file order gives the k-mers already sorted
+and only the distinct k-mers of the data set (16 bytes each) are ever held at once.
+'''
+
+RECORD = np.dtype([('kmer', np.uint64), ('count', np.int64)])
+PARTITION_BITS = 6  # 64 files, the first 3 bases of the k-mer
+SPLIT_BITS = 2  # an oversized partition is split on one more base
+BYTES_PER_BASE = 48  # packed windows, sort and unique copies while counting a chunk of reads
+LOAD_FACTOR = 4  # a partition needs about 4x its file size in memory to be counted
+DEFAULT_MEMORY_BUDGET = 1 << 30
+
+
+def _prefix_ids(kmers, k, used_bits, bits):
+    """Value of the `bits` bits following the first `used_bits` bits of every packed k-mer"""
+    shift = np.uint64(2 * k - used_bits - bits)
+    return ((kmers >> shift) & np.uint64((1 << bits) - 1)).astype(np.int64)
+
+
+def _append_partitions(records, ids, handles):
+    order = np.argsort(ids, kind='stable')
+    bounds = np.searchsorted(ids[order], np.arange(len(handles) + 1))
+    records = records[order]
+    for partition, handle in enumerate(handles):
+        if bounds[partition] < bounds[partition + 1]:
+            records[bounds[partition]:bounds[partition + 1]].tofile(handle)
+
+
+def _spill(reads, k, bits, directory, memory_budget):
+    """Count the reads chunk by chunk and append the records to their partition file"""
+    paths = [os.path.join(directory, '%d.bin' % partition) for partition in range(1 << bits)]
+    handles = [open(path, 'wb') for path in paths]
+    try:
+        chunk, bases = [], 0
+        for read in reads:
+            chunk.append(read)
+            bases += len(read)
+            if bases * BYTES_PER_BASE >= memory_budget:
+                _spill_chunk(chunk, k, bits, handles)
+                chunk, bases = [], 0
+        if chunk:
+            _spill_chunk(chunk, k, bits, handles)
+    finally:
+        for handle in handles:
+            handle.close()
+    return paths
+
+
+def _spill_chunk(chunk, k, bits, handles):
+    kmers, counts = _count_chunk(chunk, k)
+    records = np.empty(len(kmers), dtype=RECORD)
+    records['kmer'], records['count'] = kmers, counts
+    _append_partitions(records, _prefix_ids(kmers, k, 0, bits), handles)
+
+
+def _count_partition(path, k, used_bits, memory_budget):
+    """Yield the sorted counts of one partition file, splitting it first if it doesn't fit in the budget"""
+    if os.path.getsize(path) * LOAD_FACTOR <= memory_budget or used_bits + SPLIT_BITS > 2 * k:
+        records = np.fromfile(path, dtype=RECORD)
+        os.remove(path)
+        kmers, inverse = np.unique(records['kmer'], return_inverse=True)
+        yield kmers, np.bincount(inverse.ravel(), weights=records['count'], minlength=len(kmers)).astype(np.int64)
+        return
+
+    parts = ['%s.%d' % (path, part) for part in range(1 << SPLIT_BITS)]
+    handles = [open(part, 'wb') for part in parts]
+    block = max(1, memory_budget // (LOAD_FACTOR * RECORD.itemsize))
+    try:
+        with open(path, 'rb') as source:
+            while True:
+                records = np.fromfile(source, dtype=RECORD, count=block)
+                if not len(records):
+                    break
+                _append_partitions(records, _prefix_ids(records['kmer'], k, used_bits, SPLIT_BITS), handles)
+    finally:
+        for handle in handles:
+            handle.close()
+    os.remove(path)
+
+    for part in parts:
+        for counted in _count_partition(part, k, used_bits + SPLIT_BITS, memory_budget):
+            yield counted
+
+
+def iter_partition_counts(reads, k, memory_budget=DEFAULT_MEMORY_BUDGET, directory=None):
+    """
+    Yield (kmers, counts) of every partition in ascending k-mer order, the partitions are disjoint
+    :param memory_budget: bytes used while counting (distinct k-mers excluded)
+    :param directory: where temporary partition files go, the system temp directory by default
+    """
+    if k > MAX_BULK_K:
+        raise ValueError('bulk k-mer counting supports k <= %d, got %d' % (MAX_BULK_K, k))
+    bits = min(PARTITION_BITS, 2 * k)
+    with tempfile.TemporaryDirectory(prefix='kmers-', dir=directory) as workspace:
+        for path in _spill(reads, k, bits, workspace, memory_budget):
+            for counted in _count_partition(path, k, bits, memory_budget):
+                yield counted
+
+
+def count_kmers_external(reads, k, memory_budget=DEFAULT_MEMORY_BUDGET, directory=None):
+    """
+    Same result as count_kmers_bulk, counted through temporary partition files
+    :return sorted distinct packed k-mers (uint64) and the number of times each one occurs in the reads
+    """
+    kmers, counts = [np.empty(0, dtype=np.uint64)], [np.empty(0, dtype=np.int64)]
+    for partition_kmers, partition_counts in iter_partition_counts(reads, k, memory_budget, directory):
+        kmers.append(partition_kmers)
+        counts.append(partition_counts)
+    return np.concatenate(kmers), np.concatenate(counts)
+
+
+def parse_size(text):
+    """'512M' => bytes, K / M / G suffixes are powers of 1024"""
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    text = text.strip().upper()
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def memory_budget_from_argv(argv):
+    """Memory budget given as --memory=SIZE, None (everything in memory) if there is none"""
+    for arg in argv:
+        if arg.startswith('--memory='):
+            return parse_size(arg.split('=', 1)[1])
+    return None
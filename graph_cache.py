@@ -0,0 +1,136 @@
+# python3
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from csr_graph import CSRGraph
+
+'''
+Persistent binary graph cache, keyed by a digest of the reads and k.
+
+Tuning tip / bubble thresholds re-runs the same construction over and over,
+so a CSRGraph is written once as one raw .npy file per array
+
+    <cache dir>/<reads digest>-k<k>[-<options>]/<stage>/sources.npy, targets.npy, coverage.npy ...
+
+and later runs memory-map it instead of counting k-mers again:
+    * read-only arrays (edges, offsets, labels, unitig bases) are mapped read-only
+    * degree arrays are mapped copy-on-write, so cleaning a loaded graph never touches the cache
+    * the deleted-edge bitmap is small and copied into a bytearray
+    * labels of k > 32 (Python ints) are stored as 64-bit words, lowest first, and rebuilt on load
+Stages => 'graph' after construction, snapshots after tip removal and after bubble removal
+are stored under names carrying the parameters which produced them.
+Every stage is written to a temporary directory which is then renamed, so a killed run never leaves half a graph.
+'''
+
+_ARRAYS = ('sources', 'targets', 'coverage', 'lengths', 'out_offsets', 'in_offsets', 'in_edges')
+_MUTABLE_ARRAYS = ('out_degree', 'in_degree')
+_OPTIONAL_ARRAYS = ('labels', 'sequence_offsets')
+
+
+def reads_digest(reads):
+    """sha256 of the reads, in order, newline terminated"""
+    digest = hashlib.sha256()
+    for read in reads:
+        digest.update(read.encode('ascii'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def _label_words(labels):
+    """(nodes x words) uint64 array of Python int labels, lowest 64 bits first"""
+    words = max(1, -(-max(int(label).bit_length() for label in labels) // 64)) if len(labels) else 1
+    mask = (1 << 64) - 1
+    return np.array([[(int(label) >> 64 * word) & mask for word in range(words)] for label in labels],
+                    dtype=np.uint64).reshape(len(labels), words)
+
+
+def _words_label(words):
+    labels = np.empty(len(words), dtype=object)
+    labels[:] = [sum(int(word) << 64 * i for i, word in enumerate(row)) for row in words.tolist()]
+    return labels
+
+
+def save_graph(graph, directory):
+    """Write every array of a CSRGraph to its own .npy file in directory (replaced if it exists)"""
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=parent)
+    try:
+        for name in _ARRAYS + _MUTABLE_ARRAYS + _OPTIONAL_ARRAYS:
+            array = getattr(graph, name)
+            if array is not None and array.dtype == object:
+                np.save(os.path.join(staging, name + '_words.npy'), _label_words(array))
+            elif array is not None:
+                np.save(os.path.join(staging, name + '.npy'), np.ascontiguousarray(array))
+        np.save(os.path.join(staging, 'deleted.npy'), np.frombuffer(bytes(graph.deleted), dtype=np.uint8))
+        np.save(os.path.join(staging, 'header.npy'), np.array([graph.num_nodes, graph.num_edges], dtype=np.int64))
+        if graph.sequence_data is not None:
+            with open(os.path.join(staging, 'sequence_data.bin'), 'wb') as handle:
+                handle.write(graph.sequence_data)
+
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.rename(staging, directory)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def _map_bytes(path):
+    with open(path, 'rb') as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def load_graph(directory):
+    """CSRGraph memory-mapped from a directory written by save_graph"""
+    graph = CSRGraph.__new__(CSRGraph)
+    path = lambda name: os.path.join(directory, name)
+    graph.num_nodes, graph.num_edges = np.load(path('header.npy')).tolist()
+    for name in _ARRAYS:
+        setattr(graph, name, np.load(path(name + '.npy'), mmap_mode='r'))
+    for name in _MUTABLE_ARRAYS:
+        setattr(graph, name, np.load(path(name + '.npy'), mmap_mode='c'))
+    for name in _OPTIONAL_ARRAYS:
+        setattr(graph, name, np.load(path(name + '.npy'), mmap_mode='r') if os.path.exists(path(name + '.npy')) else None)
+        if os.path.exists(path(name + '_words.npy')):
+            setattr(graph, name, _words_label(np.load(path(name + '_words.npy'))))
+    graph.deleted = bytearray(np.load(path('deleted.npy')).tobytes())
+    graph.sequence_data = _map_bytes(path('sequence_data.bin')) if os.path.exists(path('sequence_data.bin')) else None
+    return graph
+
+
+class GraphCache(object):
+
+    def __init__(self, directory, digest, k, options=''):
+        """:param options: construction settings which change the graph (e.g. a coverage cutoff)"""
+        name = '%s-k%d' % (digest[:32], k) + ('-' + options if options else '')
+        self.directory = os.path.join(directory, name)
+
+    def path(self, stage):
+        return os.path.join(self.directory, stage)
+
+    def __contains__(self, stage):
+        return os.path.isfile(os.path.join(self.path(stage), 'header.npy'))
+
+    def load(self, stage):
+        """Memory-mapped graph of a stage, None if it was never stored"""
+        return load_graph(self.path(stage)) if stage in self else None
+
+    def store(self, stage, graph):
+        save_graph(graph, self.path(stage))
+        return graph
+
+
+def cache_dir_from_argv(argv):
+    """Graph cache directory given as --cache=DIR, None (no cache) if there is none"""
+    for arg in argv:
+        if arg.startswith('--cache='):
+            return arg.split('=', 1)[1]
+    return None
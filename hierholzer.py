@@ -0,0 +1,69 @@
+# python3
+import numpy as np
+
+'''
+Shared Eulerian cycle engine => stack based Hierholzer over a CSRGraph, O(E) time.
+
+Hierholzer's Algorithm:
+    Follow unused edges from the start node, pushing every node on a stack.
+    When the node on top of the stack has no unused edge left, pop it and prepend the edge that led to it
+    to the circuit. Sub-tours found later are spliced in place by the stack itself, so the path is never
+    rotated or copied.
+
+Implementation Details:
+*   cursor[v] => position of the next unused edge of v in the CSR target array, so every edge is looked at once
+*   deleted edges (tip clipping, bubble popping) are skipped
+*   arrays are read through memoryviews => plain Python ints, no per-edge object allocation
+'''
+
+
+def find_start(graph):
+    """Node with one more outgoing than incoming edge if there is one (Eulerian path), else any node with edges"""
+    surplus = np.flatnonzero(graph.out_degree > graph.in_degree)
+    if len(surplus):
+        return int(surplus[0])
+    return int(np.flatnonzero(graph.out_degree > 0)[0])
+
+
+def eulerian_cycle(graph, start=None):
+    """
+    Walk every live edge exactly once, the graph is left untouched.
+    :return edge ids in walking order (an Eulerian cycle if the graph is balanced, otherwise the path from start)
+    """
+    if graph.num_edges == 0:
+        return []
+    if start is None:
+        start = find_start(graph)
+
+    cursor_array = graph.out_offsets[:-1].copy()
+    cursor, ends = memoryview(cursor_array), memoryview(graph.out_offsets[1:])
+    targets, deleted = memoryview(graph.targets), graph.deleted
+
+    node_stack, edge_stack = [start], [-1]
+    circuit = []
+    while node_stack:
+        node = node_stack[-1]
+        position, end = cursor[node], ends[node]
+        while position < end and deleted[position >> 3] >> (position & 7) & 1:
+            position += 1
+
+        if position < end:
+            cursor[node] = position + 1
+            node_stack.append(targets[position])
+            edge_stack.append(position)
+        else:
+            cursor[node] = position
+            node_stack.pop()
+            edge = edge_stack.pop()
+            if edge != -1:
+                circuit.append(edge)
+
+    circuit.reverse()
+    return circuit
+
+
+def path_nodes(graph, edges):
+    """Nodes visited by a walk given as edge ids, the last node of a cycle is its first node again"""
+    if not edges:
+        return []
+    return graph.sources[edges].tolist() + [int(graph.targets[edges[-1]])]
@@ -0,0 +1,150 @@
+# python3
+import numpy as np
+
+from bubble_popping import DEFAULT_MAX_VISITED, pop_bubbles
+from compaction import compact_graph
+from hierholzer import eulerian_cycle
+from kmer_engine import MAX_BULK_K, count_kmers_bulk, count_packed_kmers, kmer_counts_to_edges
+from phiX174_error_prone import PhiX174GenomeAssembler
+from tip_clipping import clip_tips, is_dead_end
+
+'''
+Incremental assembly => reads arrive in batches, the graph is updated instead of rebuilt.
+
+The k-mer graph (not compacted) is the master copy, it is cleaned once when built, then for every batch:
+    1. count the k-mers of the batch only
+    2. k-mers already in the graph => coverage += count in place, an edge cleanup removed earlier is brought back
+       if new reads support it, the decision is taken again below
+       new k-mers => their edges are merged into the CSR arrays (CSRGraph.insert_edges, vectorized), node ids stay,
+       new nodes are numbered after the old ones, deleted flags and degrees of the old edges are carried over
+    3. the end nodes of every edge of the batch are the touched nodes
+    4. tips and bubbles are looked for only around them => dead ends and branching nodes within `threshold`
+       k-mers of a touched node seed clip_tips and pop_bubbles, a tip or bubble further away can't have changed
+Nodes are looked up by binary search in the sorted order of their labels, kept up to date by inserting the new
+nodes into it, instead of rebuilding the static node index (see node_index) for every batch.
+An assembly compacts a copy of the master graph and walks it, the master keeps taking reads.
+'''
+
+
+class SortedKeys(object):
+    """ids sorted by key => binary search lookups, new keys are merged in without sorting the old ones again"""
+
+    def __init__(self, keys):
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+
+    def find(self, keys):
+        """:return (id of every key, -1 if it is unknown), mask of the known ones"""
+        if not len(self.keys):
+            return np.full(len(keys), -1, dtype=np.int64), np.zeros(len(keys), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[positions] == keys
+        return np.where(found, self.order[positions], -1), found
+
+    def insert(self, keys, ids, renumber=None):
+        """
+        Add new keys with their ids
+        :param renumber: new id of every old id, if the ids moved (e.g. edge ids after CSRGraph.insert_edges)
+        """
+        if renumber is not None:
+            self.order = renumber[self.order]
+        sorter = np.argsort(keys, kind='stable')
+        at = np.searchsorted(self.keys, keys[sorter])
+        self.keys = np.insert(self.keys, at, keys[sorter])
+        self.order = np.insert(self.order, at, ids[sorter])
+
+
+class IncrementalAssembler(PhiX174GenomeAssembler):
+
+    def __init__(self, k, reads=(), max_visited=DEFAULT_MAX_VISITED, min_coverage=None, stats=None):
+        PhiX174GenomeAssembler.__init__(self, k, reads, max_visited=max_visited, min_coverage=min_coverage,
+                                        stats=stats)
+        self.remove_tips()
+        self.remove_bubbles()
+        graph = self.de_bruijn_graph
+        self.nodes = SortedKeys(graph.labels)  # (k-1)-mer => node id
+        self.edges = SortedKeys(self.edge_kmers(graph.sources, graph.targets))  # k-mer => edge id
+        self.node_index = None  # static, it wouldn't know the nodes added later => self.nodes
+
+    def edge_kmers(self, sources, targets):
+        """Packed k-mer of edges source -> target (source label + last base of the target)"""
+        labels = self.de_bruijn_graph.labels
+        return (labels[sources] << np.uint64(2)) | (labels[targets] & np.uint64(3))
+
+    def count_batch(self, reads):
+        if self.k <= MAX_BULK_K:
+            return count_kmers_bulk(reads, self.k)
+        return count_packed_kmers(self.reads_to_kmers(reads))
+
+    def add_reads(self, reads):
+        """
+        Add a batch of reads and clean the graph around the nodes it touched
+        :return number of touched nodes
+        """
+        with self.stage('add_reads') as counters:
+            kmers, counts = self.count_batch(reads)
+            left, right, coverage = kmer_counts_to_edges(kmers, counts, self.k)
+            edges, known = self.edges.find((left << np.uint64(2)) | (right & np.uint64(3)))
+
+            graph = self.de_bruijn_graph
+            edges = edges[known]
+            graph.coverage[edges] += coverage[known].astype(graph.coverage.dtype)
+            revived = sum(graph.restore_edge(edge) for edge in edges.tolist())
+
+            if not known.all():
+                self.add_edges(left[~known], right[~known], coverage[~known])
+            touched = np.unique(self.nodes.find(np.concatenate((left, right)))[0])
+
+            if counters is not None:
+                counters.update(new_kmers=int((~known).sum()), known_kmers=int(known.sum()), revived=revived,
+                                touched_nodes=len(touched))
+
+        self.reclean(touched.tolist())
+        return len(touched)
+
+    def add_edges(self, left, right, coverage):
+        """Insert the edges of new k-mers (left -> right (k-1)-mers), the old edges keep their deleted flags"""
+        graph = self.de_bruijn_graph
+        ends = np.concatenate((left, right))
+        ids, found = self.nodes.find(ends)
+        labels = np.unique(ends[~found])
+        ids[~found] = graph.num_nodes + np.searchsorted(labels, ends[~found])
+        self.nodes.insert(labels, graph.num_nodes + np.arange(len(labels)))
+
+        sources, targets = ids[:len(left)], ids[len(left):]
+        old_ids, new_ids = graph.insert_edges(sources, targets, coverage, labels)
+        self.edges.insert(self.edge_kmers(sources, targets), new_ids, renumber=old_ids)
+
+    def neighbourhood(self, nodes):
+        """Nodes at most `threshold` k-mers away from one of `nodes`, edges followed in both directions"""
+        graph = self.de_bruijn_graph
+        distance = dict.fromkeys(nodes, 0)
+        frontier = list(distance)
+        while frontier:
+            node = frontier.pop()
+            for edge in list(graph.out_edges(node)) + list(graph.incoming_edges(node)):
+                other = int(graph.targets[edge]) if graph.sources[edge] == node else int(graph.sources[edge])
+                reach = distance[node] + int(graph.lengths[edge])
+                if reach <= self.threshold and reach < distance.get(other, reach + 1):
+                    distance[other] = reach
+                    frontier.append(other)
+        return distance
+
+    def reclean(self, touched):
+        """Tip clipping and bubble popping seeded from the neighbourhood of the touched nodes only"""
+        graph = self.de_bruijn_graph
+        with self.stage('reclean') as counters:
+            nearby = sorted(self.neighbourhood(touched))
+            clip_tips(graph, self.threshold, [node for node in nearby if is_dead_end(graph, node)], counters)
+            pop_bubbles(graph, self.threshold, self.max_visited, counters,
+                        [node for node in nearby if graph.out_degree[node] > 1])
+
+    def assemble(self):
+        """Genome of the reads so far, the master graph is left as it is"""
+        graph = compact_graph(self.de_bruijn_graph)
+        # cut the edges into nodes without outgoing edges, they can't be on the cycle
+        for node in np.flatnonzero(graph.out_degree == 0).tolist():
+            for edge in list(graph.incoming_edges(node)):
+                graph.remove_edge(edge)
+        graph = compact_graph(graph)
+        return ''.join(graph.edge_sequence(edge) for edge in eulerian_cycle(graph))
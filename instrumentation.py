@@ -0,0 +1,104 @@
+# python3
+import contextlib
+import json
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+'''
+Per stage instrumentation of the assembly pipeline.
+
+A PipelineStats object is handed to the pipeline, every stage runs inside `stats.stage(name, graph)`:
+    * wall time of the stage
+    * peak traced memory during the stage (tracemalloc, NumPy arrays included) and the process max RSS after it
+    * live nodes and edges of the graph before and after
+    * counters the stage adds to the dict it is given (tips clipped, nodes visited, bubble candidates ...)
+Each finished stage is passed to the hook if there is one, and all of them can be dumped as JSON.
+
+Disabled (no stats object) the pipeline only pays an `is None` check per stage, and one per tip / bubble source
+in the cleanup loops.
+'''
+
+
+def graph_size(graph):
+    """(nodes with at least one live edge, live edges)"""
+    return int(np.count_nonzero((graph.out_degree > 0) | (graph.in_degree > 0))), int(graph.num_edges)
+
+
+def _max_rss_bytes():
+    # kilobytes on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class PipelineStats(object):
+
+    def __init__(self, hook=None, trace_memory=True):
+        """
+        :param hook: called with the record of every stage as soon as it finishes
+        :param trace_memory: peak memory through tracemalloc, which slows Python code down while it is on
+        """
+        self.hook = hook
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    @contextlib.contextmanager
+    def stage(self, name, graph_of):
+        """
+        Measure the code run inside the with block
+        :param graph_of: callable returning the current graph, stages may replace it (compaction, cache restore)
+        :return the counters dict of the stage
+        """
+        record = {'stage': name}
+        graph = graph_of()
+        if graph is not None:
+            record['nodes_before'], record['edges_before'] = graph_size(graph)
+        counters = {}
+
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        elif self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            if self.trace_memory:
+                record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+            record['max_rss_bytes'] = _max_rss_bytes()
+
+        graph = graph_of()
+        if graph is not None:
+            record['nodes_after'], record['edges_after'] = graph_size(graph)
+        record['counters'] = counters
+        self.stages.append(record)
+        if self.hook is not None:
+            self.hook(record)
+
+    def to_json(self):
+        return {'stages': self.stages, 'total_seconds': sum(record['seconds'] for record in self.stages)}
+
+    def write(self, path):
+        with open(path, 'w') as handle:
+            json.dump(self.to_json(), handle, indent=2)
+
+
+def counting(counters, name, amount=1):
+    """Add to a counter, nothing if instrumentation is off (counters is None)"""
+    if counters is not None:
+        counters[name] = counters.get(name, 0) + amount
+
+
+def stats_file_from_argv(argv):
+    """JSON stats file given as --stats=FILE, None (no instrumentation) if there is none"""
+    for arg in argv:
+        if arg.startswith('--stats='):
+            return arg.split('=', 1)[1]
+    return None
@@ -0,0 +1,296 @@
+# python3
+import re
+
+import numpy as np
+
+'''
+2-bit packed k-mer engine shared by the de Bruijn graph builders.
+
+Every nucleotide is encoded in 2 bits => A = 00, C = 01, G = 10, T = 11
+so a k-mer is just an integer of 2k bits, with the first base in the most significant bits.
+
+    ACGT => 00 01 10 11 => 27
+
+With k-mers as integers the (k-1)-mer nodes of the de Bruijn graph come for free:
+    prefix (left node)  => kmer >> 2                      (drop the last base)
+    suffix (right node) => kmer & ((1 << 2(k - 1)) - 1)   (drop the first base)
+and no substring is ever allocated while breaking reads into k-mers.
+'''
+
+BASES = 'ACGT'
+
+# Reads are translated to base-4 digits, so a whole read is parsed by int(digits, 4) in C
+_TO_DIGITS = str.maketrans('ACGTacgt', '01230123')
+# Runs of valid bases, anything else (N, IUPAC codes ...) breaks the read
+_VALID_RUNS = re.compile('[0-3]+')
+
+# Bulk mode => ASCII byte -> 2-bit code, 4 marks a base other than A/C/G/T
+_BYTE_CODES = np.full(256, 4, dtype=np.uint8)
+for _code, _base in enumerate(BASES):
+    _BYTE_CODES[ord(_base)] = _BYTE_CODES[ord(_base.lower())] = _code
+
+MAX_BULK_K = 32  # packed k-mers have to fit in an uint64, longer ones are kept as Python ints (object arrays)
+DEFAULT_CHUNK_SIZE = 1 << 16  # reads turned into one 2D array at a time
+
+
+def encode(sequence):
+    """Pack a nucleotide string into an integer, 2 bits per base"""
+    return int(sequence.translate(_TO_DIGITS), 4)
+
+
+def decode(code, length):
+    """Unpack an integer holding `length` bases back into a nucleotide string"""
+    bases = []
+    for _ in range(length):
+        bases.append(BASES[code & 3])
+        code >>= 2
+    return ''.join(reversed(bases))
+
+
+def packed_dtype(k):
+    """dtype of packed k-mer / (k-1)-mer arrays => uint64 up to MAX_BULK_K, Python ints above"""
+    return np.uint64 if k <= MAX_BULK_K else object
+
+
+def packed_array(values):
+    """Sorted packed values as an uint64 array, or an object array if the largest one needs more than 64 bits"""
+    return np.array(values, dtype=object if values and values[-1] >> 64 else np.uint64)
+
+
+def packed_constant(array, value):
+    """value in the dtype of a packed array, so masks keep uint64 arithmetic in uint64"""
+    return value if array.dtype == object else np.uint64(value)
+
+
+class KmerEngine(object):
+
+    def __init__(self, k):
+        self.k = k
+        self.kmer_mask = (1 << 2 * k) - 1
+        self.node_mask = (1 << 2 * (k - 1)) - 1
+
+    def kmers(self, read):
+        """
+        Yield the packed k-mers of a read from left to right.
+        The read is packed once and every k-mer is cut out of it with a shift and a mask,
+        windows which contain a base other than A/C/G/T are skipped.
+        """
+        k, mask = self.k, self.kmer_mask
+        for run in _VALID_RUNS.findall(read.translate(_TO_DIGITS)):
+            packed = int(run, 4)
+            for shift in range(2 * (len(run) - k), -1, -2):
+                yield (packed >> shift) & mask
+
+    def reads_to_kmers(self, reads):
+        for read in reads:
+            for kmer in self.kmers(read):
+                yield kmer
+
+    def prefix(self, kmer):
+        # left (k-1)-mer
+        return kmer >> 2
+
+    def suffix(self, kmer):
+        # right (k-1)-mer
+        return kmer & self.node_mask
+
+    def edges(self, kmers):
+        """Yield (left, right) (k-1)-mer nodes of every k-mer"""
+        node_mask = self.node_mask
+        for kmer in kmers:
+            yield kmer >> 2, kmer & node_mask
+
+    def decode_kmer(self, kmer):
+        return decode(kmer, self.k)
+
+    def decode_node(self, node):
+        return decode(node, self.k - 1)
+
+
+'''
+Bulk (NumPy) mode
+Instead of one dict/set operation per k-mer:
+    1. Turn a chunk of reads into a 2D uint8 array of 2-bit codes (one row per read)
+    2. Pack every sliding window of k columns at once => k vectorized shift/or passes
+    3. np.unique(..., return_counts=True) gives the distinct k-mers (= edges) and their coverage
+Chunks are merged so the reads can come from a generator.
+'''
+
+
+def _window_grid(codes, k):
+    """
+    Packed k-mers of every window of a (reads x length) array of 2-bit codes, one row per read
+    :return (reads x windows) uint64 array, boolean mask of the windows without an invalid base (None if all are)
+    """
+    windows = codes.shape[1] - k + 1
+    packed = np.zeros((codes.shape[0], windows), dtype=np.uint64)
+    for i in range(k):
+        packed <<= 2
+        packed |= codes[:, i:i + windows] & 3
+
+    invalid = codes > 3
+    if not invalid.any():
+        return packed, None
+    # drop windows which contain at least one invalid base
+    invalid_so_far = np.zeros((codes.shape[0], codes.shape[1] + 1), dtype=np.int32)
+    np.cumsum(invalid, axis=1, out=invalid_so_far[:, 1:])
+    return packed, invalid_so_far[:, k:] == invalid_so_far[:, :windows]
+
+
+def _packed_windows(codes, k):
+    """Packed k-mers of every window of a (reads x length) array of 2-bit codes"""
+    if codes.shape[1] - k + 1 <= 0:
+        return np.empty(0, dtype=np.uint64)
+    packed, valid = _window_grid(codes, k)
+    return packed.ravel() if valid is None else packed[valid]
+
+
+def _merge_counts(kmers, counts, chunk_kmers, chunk_counts):
+    kmers, inverse = np.unique(np.concatenate((kmers, chunk_kmers)), return_inverse=True)
+    counts = np.bincount(inverse.ravel(), weights=np.concatenate((counts, chunk_counts)), minlength=len(kmers))
+    return kmers, counts.astype(np.int64)
+
+
+def _count_chunk(reads, k):
+    by_length = {}
+    for read in reads:
+        by_length.setdefault(len(read), []).append(read)
+
+    packed = []
+    for length, group in by_length.items():
+        if length < k:
+            continue
+        raw = np.frombuffer(''.join(group).encode('ascii'), dtype=np.uint8)
+        packed.append(_packed_windows(_BYTE_CODES[raw].reshape(len(group), length), k))
+
+    if not packed:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+    return np.unique(np.concatenate(packed), return_counts=True)
+
+
+def count_packed_kmers(kmers):
+    """
+    Serial counterpart of count_kmers_bulk => one dict update per packed k-mer
+    :return sorted distinct packed k-mers (uint64, Python ints if k > MAX_BULK_K) and the number of times
+            each one occurs
+    """
+    counts = {}
+    for kmer in kmers:
+        counts[kmer] = counts.get(kmer, 0) + 1
+    distinct = sorted(counts)
+    return packed_array(distinct), np.array([counts[kmer] for kmer in distinct], dtype=np.int64)
+
+
+def count_kmers_bulk(reads, k, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    :return sorted distinct packed k-mers (uint64) and the number of times each one occurs in the reads
+    """
+    if k > MAX_BULK_K:
+        raise ValueError('bulk k-mer counting supports k <= %d, got %d' % (MAX_BULK_K, k))
+
+    kmers, counts = np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+    chunk = []
+    for read in reads:
+        chunk.append(read)
+        if len(chunk) == chunk_size:
+            kmers, counts = _merge_counts(kmers, counts, *_count_chunk(chunk, k))
+            chunk = []
+    if chunk:
+        kmers, counts = _merge_counts(kmers, counts, *_count_chunk(chunk, k))
+    return kmers, counts
+
+
+def kmer_counts_to_edges(kmers, counts, k):
+    """
+    Every distinct k-mer is one de Bruijn edge left (k-1)-mer -> right (k-1)-mer,
+    edges where left == right (e.g. AAAA...A) are dropped like in the builders.
+    :return left, right, coverage arrays
+    """
+    left = kmers >> 2
+    right = kmers & packed_constant(kmers, (1 << 2 * (k - 1)) - 1)
+    keep = left != right
+    return left[keep], right[keep], counts[keep]
+
+
+'''
+Node discovery order
+A dict graph built k-mer by k-mer creates its nodes in the order they first show up in the reads
+(left (k-1)-mer before right one, self loop k-mers create none), and scans over such a graph visit them in that order.
+NodeDiscovery watches the reads on their way into any counter and keeps, for every (k-1)-mer,
+    2 * position of the first k-mer it shows up in (+ 1 if it was the right node of that k-mer)
+so a CSRGraph (any node numbering, compacted or not) can be visited in the same order.
+'''
+
+
+class NodeDiscovery(object):
+
+    def __init__(self, k, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.k = k
+        self.chunk_size = chunk_size
+        self.position = 0  # k-mer windows seen so far
+        self.nodes = np.empty(0, dtype=packed_dtype(k - 1))  # sorted (k-1)-mers
+        self.keys = np.empty(0, dtype=np.int64)  # discovery key of every one of them
+        self.first_seen = {}  # k > MAX_BULK_K => (k-1)-mer -> rank, in insertion order
+
+    def observe(self, reads):
+        """Yield the reads unchanged, recording where their nodes show up first"""
+        chunk = []
+        for read in reads:
+            yield read
+            chunk.append(read)
+            if len(chunk) == self.chunk_size:
+                self._add_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._add_chunk(chunk)
+
+    def add(self, reads):
+        for _ in self.observe(reads):
+            pass
+
+    def _add_chunk(self, reads):
+        if self.k > MAX_BULK_K:
+            engine, first_seen = KmerEngine(self.k), self.first_seen
+            for kmer in engine.reads_to_kmers(reads):
+                left, right = engine.prefix(kmer), engine.suffix(kmer)
+                if left != right:
+                    first_seen.setdefault(left, len(first_seen))
+                    first_seen.setdefault(right, len(first_seen))
+            return
+
+        lengths = np.array([len(read) for read in reads], dtype=np.int64)
+        windows = np.maximum(lengths - self.k + 1, 0)
+        starts = self.position + np.cumsum(windows) - windows
+        self.position += int(windows.sum())
+
+        nodes, keys = [self.nodes], [self.keys]
+        for length in np.unique(lengths[windows > 0]).tolist():
+            rows = np.flatnonzero(lengths == length)
+            raw = np.frombuffer(''.join(reads[row] for row in rows.tolist()).encode('ascii'), dtype=np.uint8)
+            kmers, valid = _window_grid(_BYTE_CODES[raw].reshape(len(rows), length), self.k)
+            positions = starts[rows][:, None] + np.arange(length - self.k + 1)
+            if valid is not None:
+                kmers, positions = kmers[valid], positions[valid]
+            kmers, positions = kmers.ravel(), positions.ravel()
+
+            left, right = kmers >> 2, kmers & np.uint64((1 << 2 * (self.k - 1)) - 1)
+            keep = left != right
+            nodes += [left[keep], right[keep]]
+            keys += [2 * positions[keep], 2 * positions[keep] + 1]
+
+        # earliest key of every (k-1)-mer
+        nodes, keys = np.concatenate(nodes), np.concatenate(keys)
+        order = np.lexsort((keys, nodes))
+        nodes, keys = nodes[order], keys[order]
+        first = np.concatenate(([True], nodes[1:] != nodes[:-1])) if len(nodes) else np.empty(0, dtype=bool)
+        self.nodes, self.keys = nodes[first], keys[first]
+
+    def ranks(self, labels):
+        """Discovery key of every node label, smaller => the node showed up earlier"""
+        if self.k > MAX_BULK_K:
+            return np.array([self.first_seen[int(label)] for label in labels], dtype=np.int64)
+        return self.keys[np.searchsorted(self.nodes, np.asarray(labels, dtype=np.uint64))]
+
+    def order(self, labels):
+        """Node ids sorted by discovery"""
+        return np.argsort(self.ranks(labels), kind='stable')
@@ -0,0 +1,135 @@
+# python3
+import numpy as np
+
+'''
+Static node index => minimal perfect hash over the packed (k-1)-mers of the graph.
+
+Built once from the distinct node set (BBHash style), instead of a kmer -> id dict plus an id -> kmer dict:
+    level 0 => hash every key into a bit array of GAMMA * n bits, keys alone in their slot set their bit
+    level i => the keys which collided are hashed again, with another seed, into a smaller bit array
+all levels are stored one after the other, so the id of a key is the rank of its bit
+(number of set bits before it) => ids are exactly 0 .. n - 1.
+
+Memory => about GAMMA * e^(1 / GAMMA) bits per node for the bit arrays + a 32 bit rank per 64 bit word
+(a few bits per node) and the id -> kmer direction is a plain uint64 array, 2 bits per base.
+A hash maps any key to some id, membership is checked against that array.
+'''
+
+GAMMA = 2.0  # bits per remaining key on every level, larger => faster build, fewer levels, more memory
+MAX_LEVELS = 32  # keys still colliding after that go to a small dict
+_MASK64 = (1 << 64) - 1
+_MULTIPLIER = 0x9E3779B97F4A7C15
+_POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+
+if hasattr(int, 'bit_count'):
+    _bit_count = int.bit_count  # Python >= 3.10, no string built per call
+else:
+    _POPCOUNT16 = _POPCOUNT[np.arange(1 << 16) & 255] + _POPCOUNT[np.arange(1 << 16) >> 8]
+
+    def _bit_count(word):
+        return int(_POPCOUNT16[word & 0xFFFF] + _POPCOUNT16[word >> 16 & 0xFFFF]
+                   + _POPCOUNT16[word >> 32 & 0xFFFF] + _POPCOUNT16[word >> 48])
+
+
+def _popcount_words(words):
+    return _POPCOUNT[words.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64)
+
+
+def _level_hash(keys, seed):
+    hashed = (keys ^ np.uint64(seed)) * np.uint64(_MULTIPLIER)
+    return hashed ^ (hashed >> np.uint64(29))
+
+
+def _level_hash_scalar(key, seed):
+    hashed = ((key ^ seed) * _MULTIPLIER) & _MASK64
+    return hashed ^ (hashed >> 29)
+
+
+def _seed(level):
+    return (level * 0xD6E8FEB86659FD93 + 0x165667B19E3779F9) & _MASK64
+
+
+class NodeIndex(object):
+
+    def __init__(self, kmers):
+        """:param kmers: distinct packed (k-1)-mers (uint64), every one gets an id in 0 .. len(kmers) - 1"""
+        keys = np.asarray(kmers, dtype=np.uint64)
+        self.num_nodes = len(keys)
+
+        levels, remaining = [], keys
+        while len(remaining) and len(levels) < MAX_LEVELS:
+            size = max(64, -(-int(GAMMA * len(remaining)) // 64) * 64)
+            slots = (_level_hash(remaining, _seed(len(levels))) % np.uint64(size)).astype(np.int64)
+            alone = np.bincount(slots, minlength=size) == 1
+            levels.append(alone)
+            remaining = remaining[~alone[slots]]
+
+        # all levels in one bit array, rank[w] => set bits in the words before w
+        self.level_offsets = np.zeros(len(levels) + 1, dtype=np.int64)
+        np.cumsum([len(level) for level in levels], out=self.level_offsets[1:])
+        bits = np.concatenate(levels) if levels else np.zeros(0, dtype=bool)
+        self.words = np.packbits(bits, bitorder='little').view(np.uint64)
+        self.rank = np.zeros(len(self.words) + 1, dtype=np.uint32)
+        np.cumsum(_popcount_words(self.words), out=self.rank[1:])
+
+        # keys which never found a slot of their own, numbered after the ranked ones
+        placed = int(self.rank[-1])
+        self.overflow = {key: placed + i for i, key in enumerate(remaining.tolist())}
+
+        self.labels = np.empty(self.num_nodes, dtype=np.uint64)
+        self.labels[self.lookup(keys)] = keys
+        self._words, self._rank = memoryview(self.words), memoryview(self.rank)
+        self._labels, self._offsets = memoryview(self.labels), self.level_offsets.tolist()
+
+    def lookup(self, kmers):
+        """Ids of an array of packed (k-1)-mers, which must all be in the index"""
+        kmers = np.asarray(kmers, dtype=np.uint64)
+        ids = np.full(len(kmers), -1, dtype=np.int64)
+        pending = np.arange(len(kmers))
+        for level in range(len(self.level_offsets) - 1):
+            if not len(pending):
+                break
+            size = self.level_offsets[level + 1] - self.level_offsets[level]
+            slots = self.level_offsets[level] + (
+                _level_hash(kmers[pending], _seed(level)) % np.uint64(size)).astype(np.int64)
+            words, offsets = self.words[slots >> 6], (slots & 63).astype(np.uint64)
+            hit = ((words >> offsets) & np.uint64(1)).astype(bool)
+
+            below = words[hit] & ((np.uint64(1) << offsets[hit]) - np.uint64(1))
+            ids[pending[hit]] = self.rank[slots[hit] >> 6] + _popcount_words(below)
+            pending = pending[~hit]
+
+        for position in pending.tolist():
+            ids[position] = self.overflow[int(kmers[position])]
+        return ids
+
+    def get(self, kmer, default=None):
+        """Id of one packed (k-1)-mer, default if it is not a node"""
+        words, rank, offsets = self._words, self._rank, self._offsets
+        node = None
+        for level in range(len(offsets) - 1):
+            slot = offsets[level] + _level_hash_scalar(kmer, _seed(level)) % (offsets[level + 1] - offsets[level])
+            word = words[slot >> 6]
+            if word >> (slot & 63) & 1:
+                node = rank[slot >> 6] + _bit_count(word & ((1 << (slot & 63)) - 1))
+                break
+        else:
+            node = self.overflow.get(kmer)
+        if node is None or self._labels[node] != kmer:
+            return default
+        return node
+
+    def __contains__(self, kmer):
+        return self.get(kmer) is not None
+
+    def __len__(self):
+        return self.num_nodes
+
+    def kmer(self, node):
+        """Packed (k-1)-mer of a node id"""
+        return self._labels[node]
+
+    def nbytes(self):
+        overflow = 16 * len(self.overflow)  # rough, almost always empty
+        return self.words.nbytes + self.rank.nbytes + self.level_offsets.nbytes + self.labels.nbytes + overflow
@@ -1,6 +1,10 @@
 # Uses python3
+import re
 import sys
 
+from kmer_engine import encode
+from read_io import iter_reads, source_from_argv
+
 # Solving the Imperfect Coverage Problem
 '''
 We are not guaranteed to be given every possible read at every position,
@@ -27,30 +31,59 @@ https://github.com/rrwick/Bandage/wiki/Effect-of-kmer-size
 '''
 
 
-def is_optimal(k, reads):
-    kmers = set()
+'''
+Incremental search => no k-mer set is rebuilt from the reads.
+The (k-1)-mers of the reads are exactly the prefixes and suffixes of their k-mers
+(plus the reads which are k-1 long), so walking k downwards each set is derived from the previous one:
+    prefixes(k) = {kmer >> 2}, suffixes(k) = {kmer & mask}    (2-bit packed k-mers, see kmer_engine)
+    k is balanced  <=> prefixes(k) == suffixes(k)
+    kmers(k - 1)   =  prefixes(k) | suffixes(k)
+'''
+
+
+def kmer_balance(reads):
+    """
+    Yield (k, balanced) from the longest read length down to 2,
+    balanced <=> every (k-1)-mer is a prefix of some k-mer as often as it is a suffix of one
+    """
+    # reads are broken at anything but A/C/G/T, each run is packed once
+    by_length = {}
     for read in reads:
-        for i in range(0, len(read) - k + 1):
-            kmers.add(read[i:i + k])
-    prefixes = set()
-    suffixes = set()
-    for kmer in kmers:
-        prefixes.add(kmer[:-1])
-        suffixes.add(kmer[1:])
-    return prefixes == suffixes
+        for run in re.findall('[ACGTacgt]+', read):
+            by_length.setdefault(len(run), set()).add(encode(run))
+    if not by_length:
+        return
 
+    kmers = set()
+    for k in range(max(by_length), 1, -1):
+        kmers |= by_length.get(k, set())
+        mask = (1 << 2 * (k - 1)) - 1
+        prefixes = {kmer >> 2 for kmer in kmers}
+        suffixes = {kmer & mask for kmer in kmers}
+        yield k, prefixes == suffixes
+        prefixes |= suffixes
+        kmers = prefixes
 
-def read_data():
-    input = []
-    for i in range(1618):
-        read = sys.stdin.readline().strip()
-        input.append(read)
-    return input
 
+def find_optimal_k(reads, report=False):
+    """
+    :return largest k whose de Bruijn graph is balanced (None if there is none),
+            with report=True also {k: balanced} for every k
+    """
+    optimal_k, balance = None, {}
+    for k, balanced in kmer_balance(reads):
+        balance[k] = balanced
+        if balanced and optimal_k is None:
+            optimal_k = k
+            if not report:
+                break
+    return (optimal_k, balance) if report else optimal_k
+
+
+def read_data():
+    # any number of reads, streamed from a file given on the command line or stdin
+    return iter_reads(source_from_argv(sys.argv[1:]))
 
-reads = read_data()
 
-for k in range(len(reads[2]), 1, -1):
-    if is_optimal(k, reads):
-        print(k)
-        break
+if __name__ == "__main__":
+    print(find_optimal_k(read_data()))
@@ -0,0 +1,84 @@
+# python3
+import numpy as np
+
+'''
+Packed overlap adjacency => CSR over reads with a NumPy structured edge array.
+
+A list of (index, length) tuples costs ~100 bytes per overlap (list slot, tuple, two int objects).
+Here an overlap is one OVERLAP record (target int32, overlap int16) => 6 bytes, plus 8 bytes of offsets per read
+    edges[offsets[a]:offsets[a + 1]] => overlaps of read a, longest first (ties by target)
+All edges are sorted at once (np.lexsort on source, -overlap, target) instead of one sort per read.
+adj[a] still gives the list of (index, length) tuples, so the layout and the string graph take either form.
+
+top keeps only the N longest overlaps of every read. build_overlap_graph applies it to each read's matches
+before they are stored, so the whole graph is never held in memory.
+'''
+
+OVERLAP = np.dtype([('target', np.int32), ('overlap', np.int16)])
+MAX_OVERLAP = np.iinfo(np.int16).max
+
+
+class OverlapAdjacency(object):
+
+    def __init__(self, offsets, edges):
+        self.offsets = offsets  # int64, num_reads + 1
+        self.edges = edges  # OVERLAP records grouped by source read
+
+    @classmethod
+    def from_arrays(cls, num_reads, sources, targets, overlaps, top=None):
+        """
+        :param sources, targets, overlaps: one entry per overlap, any order
+        :param top: keep only the `top` longest overlaps of every read
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        overlaps = np.asarray(overlaps, dtype=np.int64)
+        if len(overlaps) and overlaps.max() > MAX_OVERLAP:
+            raise ValueError('overlaps longer than %d bases do not fit the packed adjacency' % MAX_OVERLAP)
+        order = np.lexsort((targets, -overlaps, sources))
+        sources = sources[order]
+
+        counts = np.bincount(sources, minlength=num_reads)
+        offsets = np.zeros(num_reads + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        if top is not None:
+            keep = np.arange(len(sources)) - offsets[sources] < top
+            order, counts = order[keep], np.minimum(counts, top)
+            np.cumsum(counts, out=offsets[1:])
+
+        edges = np.empty(len(order), dtype=OVERLAP)
+        edges['target'] = np.asarray(targets)[order]
+        edges['overlap'] = overlaps[order]
+        return cls(offsets, edges)
+
+    @classmethod
+    def from_lists(cls, adj, top=None):
+        """Pack an adjacency given as lists of (index, length) tuples"""
+        sources = np.fromiter((a for a, neighbors in enumerate(adj) for _ in neighbors), dtype=np.int64)
+        targets = np.fromiter((b for neighbors in adj for b, _ in neighbors), dtype=np.int64)
+        overlaps = np.fromiter((length for neighbors in adj for _, length in neighbors), dtype=np.int64)
+        return cls.from_arrays(len(adj), sources, targets, overlaps, top)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def neighbors(self, read):
+        """OVERLAP records of a read, a view into the edge array"""
+        return self.edges[self.offsets[read]:self.offsets[read + 1]]
+
+    def __getitem__(self, read):
+        return self.neighbors(read).tolist()  # structured records => (target, overlap) tuples
+
+    def __iter__(self):
+        for read in range(len(self)):
+            yield self[read]
+
+    @property
+    def num_edges(self):
+        return len(self.edges)
+
+    def sources(self):
+        """Source read of every edge"""
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.offsets))
+
+    def nbytes(self):
+        return self.offsets.nbytes + self.edges.nbytes
@@ -1,121 +1,106 @@
 # Uses python3
+import heapq
+import sys
+from array import array
+
+from approximate_overlaps import approximate_overlap_graph, distinct_reads, tolerant_suffix_prefix_overlap
+from overlap_adjacency import OverlapAdjacency
+from overlap_index import OverlapIndex
+from overlap_layout import layout_path, suffix_prefix_overlap
+from parallel_counting import workers_from_argv
+from read_io import iter_reads, source_from_argv
+from string_graph import string_graph
 
-DEFAULT_READS_NUMBER = 1618  # num reads
 DEFAULT_MIN_OVERLAP_LENGTH = 70  # minimum overlap needed
-LENGTH_OF_READ = 100  # number of bases in read
 
 
-class TrieNode(object):
-    def __init__(self):
-        # children map
-        self.children = {}
-        # index from reads array that this node represents
-        self.indexes = []
-
+def overlap_value_bw_strings(s, t):
+    # longest suffix of s which is a prefix of t, linear time (see overlap_layout)
+    return suffix_prefix_overlap(s, t)
 
-# Trie of Prefix of Strings, But only above certain length
-class PrefixTrie(object):
-    def __init__(self):
-        self.root = TrieNode()
 
-    def add(self, read, index):
-        # For Prefixes of length min_overlap and above only
-        for end in range(DEFAULT_MIN_OVERLAP_LENGTH, len(read)):
-            rev_prefix = read[:end][::-1]
+def build_overlap_graph(reads, top=None):
+    # FM-index over all reads, memory linear in the total read length (see overlap_index)
+    overlapIndex = OverlapIndex(reads, DEFAULT_MIN_OVERLAP_LENGTH)
 
-            # Add prefix into trie
-            self.add_to_trie(index, rev_prefix)
+    # packed arrays instead of lists of tuples, sorted in one pass at the end (see overlap_adjacency)
+    sources, targets, overlaps = array('l'), array('l'), array('l')
+    for index in range(len(reads)):
+        # get Reads that are neighbors to this read from the overlap index (by increasing length)
+        neighbors = overlapIndex.match(index)
+        if top is not None and len(neighbors) > top:
+            # only the longest ones are ever stored
+            neighbors = heapq.nsmallest(top, neighbors, key=lambda neighbor: (-neighbor[1], neighbor[0]))
+        sources.extend([index] * len(neighbors))
+        targets.extend(other for other, _ in neighbors)
+        overlaps.extend(length for _, length in neighbors)
 
-    def add_to_trie(self, index, rev_prefix):
-        node = self.root
-        for char in rev_prefix:
-            if char not in node.children:
-                node.children[char] = TrieNode()
-            node = node.children[char]
+    return OverlapAdjacency.from_arrays(len(reads), sources, targets, overlaps)
 
-        # add index of the read to node
-        node.indexes.append(index)
 
-    def match(self, string):
-        """
-        Traverse the Trie and match strings above default overlap threshold
-        :return list of match tuples (index, length)
-        """
-        adjacent = []
-        node = self.root
-        length = 0
+def build_overlap_graph_tolerant(reads, workers=1, top=None):
+    # minimizer seeds + bounded mismatch verification on `workers` processes (see approximate_overlaps)
+    return approximate_overlap_graph(reads, DEFAULT_MIN_OVERLAP_LENGTH, workers=workers, top=top)
 
-        for char in string[::-1]:
-            if char not in node.children:
-                break
-            node = node.children[char]
-            length += 1
 
-            if length >= DEFAULT_MIN_OVERLAP_LENGTH and node.indexes:
-                for index in node.indexes:
-                    adjacent.append((index, length))
-        return adjacent
+def reduce_overlap_graph(adj, reads):
+    # drop transitive overlaps (Myers string graph), about one edge per read is left (see string_graph)
+    return string_graph(adj, reads)
 
 
-def overlap_value_bw_strings(s, t):
-    for i in range(LENGTH_OF_READ, 0, -1):
-        if s[LENGTH_OF_READ - i:] == t[:i]:
-            return i
-    return 0
+def overlap_value_tolerant(s, t):
+    # reads with errors have no exact overlap, allow a few mismatches (see approximate_overlaps)
+    return tolerant_suffix_prefix_overlap(s, t)
 
 
-def build_overlap_graph(reads):
-    prefixTrie = PrefixTrie()
-    for index, read in enumerate(reads):
-        prefixTrie.add(read, index)
+def build_hamiltonian_path_greedy(adj, reads, overlap=overlap_value_bw_strings):
+    # longest overlaps first under degree and union-find constraints, O(E log E) (see overlap_layout)
+    return layout_path(adj, reads, overlap)
 
-    overlap_graph = [[] for _ in range(len(reads))]
-    for index, read in enumerate(reads):
-        # get Reads that are neighbors to this read from prefix trie
-        overlap_graph[index] = prefixTrie.match(read)
-        # sort the neighbors based on overlap length
-        overlap_graph[index].sort(key=lambda neighbor: neighbor[1], reverse=True)
 
-    return overlap_graph
+def assemble_genome(hamiltonian_path, reads, overlap=overlap_value_bw_strings):
+    # single join, the genome is circular => drop what the last read overlaps with the first one
+    genome = ''.join(reads[node][length:] for node, length in hamiltonian_path)
+    last, first = hamiltonian_path[-1][0], hamiltonian_path[0][0]
+    return genome[:len(genome) - overlap(reads[last], reads[first])]
 
 
-def build_hamiltonian_path_greedy(adj):
-    current = 0
-    added = {0}
-    path = [(0, 0)]
-    while len(added) < len(adj):
-        for i, link in enumerate(adj[current]):
-            if link[0] not in added:
-                added.add(link[0])
-                current = link[0]
-                path.append(link)
-                break
-    return path
+def read_inputs():
+    # any number of reads, duplicates dropped (first occurrence kept, so the output is deterministic)
+    reads = iter_reads(source_from_argv(sys.argv[1:]))
+    return list(dict.fromkeys(reads))
 
 
-def assemble_genome(hamiltonian_path, reads):
-    genome = ""
-    for node in hamiltonian_path:
-        genome += reads[node[0]][node[1]:]
-    genome = genome[:-overlap_value_bw_strings(reads[hamiltonian_path[-1][0]], reads[0])]
-    return genome
+def tolerant_from_argv(argv):
+    # --errors => reads with sequencing errors, overlaps up to a few mismatches
+    return '--errors' in argv
 
 
-def read_inputs():
-    reads = []
-    for i in range(DEFAULT_READS_NUMBER):
-        reads.append(input())
-    reads = list(set(reads))
-    return reads
+def top_from_argv(argv):
+    # --top=N => keep only the N longest overlaps of every read
+    for arg in argv:
+        if arg.startswith('--top='):
+            return int(arg.split('=', 1)[1])
+    return None
 
 '''
 Step 1: Build Overlap Graph
-Step 2: Build Hamiltonian Path in Greedy Fashion 
+Step 2: Transitive Reduction => only the overlaps not implied by two others are kept
+Step 3: Build Hamiltonian Path in Greedy Fashion 
 (This doesn't get optimal solution as Hamiltonian Path has no polynomial time solution)
+Longest overlaps are taken first, a read gets at most one successor / predecessor and no cycle is closed early
 '''
-reads = read_inputs()
-overlap_graph = build_overlap_graph(reads)
-hamiltonian_path = build_hamiltonian_path_greedy(overlap_graph)
-
-genome = assemble_genome(hamiltonian_path, reads)
-print(genome)
+if __name__ == "__main__":
+    reads = read_inputs()
+    top = top_from_argv(sys.argv[1:])
+    if tolerant_from_argv(sys.argv[1:]):
+        workers = workers_from_argv(sys.argv[1:])
+        reads = distinct_reads(reads, workers)
+        overlap_graph = reduce_overlap_graph(build_overlap_graph_tolerant(reads, workers, top), reads)
+        hamiltonian_path = build_hamiltonian_path_greedy(overlap_graph, reads, overlap_value_tolerant)
+        genome = assemble_genome(hamiltonian_path, reads, overlap_value_tolerant)
+    else:
+        overlap_graph = reduce_overlap_graph(build_overlap_graph(reads, top), reads)
+        hamiltonian_path = build_hamiltonian_path_greedy(overlap_graph, reads)
+        genome = assemble_genome(hamiltonian_path, reads)
+    print(genome)
@@ -0,0 +1,103 @@
+# python3
+import numpy as np
+
+'''
+FM-index over all reads for suffix-prefix overlaps.
+
+A prefix trie of every prefix of every read costs O(L^2) characters and a dict per trie node per read.
+Instead all reads go into one text, each read preceded by a separator, with a unique terminator at the end
+    T = $read_0$read_1 ... $read_n-1#        (# < $ < A < C < G < T)
+and we keep its suffix array (SA), Burrows-Wheeler transform (BWT) and rank (occurrence) tables => O(|T|) memory.
+
+Backward search matches a pattern right to left, keeping the SA interval of the suffixes which start with it:
+    lo, hi = C[c] + Occ(c, lo), C[c] + Occ(c, hi)
+Reading a read backwards, after l characters the interval holds the suffixes starting with its last l bases.
+One more step with $ keeps only those preceded by a separator, i.e. the reads whose prefix of length l
+equals that suffix => all overlaps of a read in O(L) steps plus the number of overlaps reported.
+'''
+
+TERMINATOR, SEPARATOR = '#', '$'
+
+
+def suffix_array(text):
+    """Suffix array of an integer array whose last symbol is unique and smallest (prefix doubling)"""
+    n = len(text)
+    rank = text.astype(np.int64)
+    sa = np.argsort(rank, kind='stable')
+    step = 1
+    while step < n:
+        second = np.full(n, -1, dtype=np.int64)
+        second[:n - step] = rank[step:]
+        sa = np.lexsort((second, rank))
+
+        # equal (rank, second) pairs keep the same rank
+        changed = (rank[sa][1:] != rank[sa][:-1]) | (second[sa][1:] != second[sa][:-1])
+        rank = np.empty(n, dtype=np.int64)
+        rank[sa] = np.concatenate(([0], np.cumsum(changed)))
+        if rank[sa[-1]] == n - 1:
+            break
+        step *= 2
+    return sa
+
+
+class OverlapIndex(object):
+
+    def __init__(self, reads, min_overlap):
+        self.reads = reads
+        self.min_overlap = min_overlap
+        self.read_lengths = [len(read) for read in reads]
+
+        text = ''.join(SEPARATOR + read for read in reads) + TERMINATOR
+        alphabet = sorted(set(text))  # TERMINATOR and SEPARATOR sort first
+        self.codes = {char: code for code, char in enumerate(alphabet)}
+        raw = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+        lookup = np.zeros(256, dtype=np.uint8)
+        lookup[[ord(char) for char in alphabet]] = np.arange(len(alphabet))
+        encoded = lookup[raw]
+
+        sa = suffix_array(encoded)
+        bwt = encoded[sa - 1]  # sa - 1 == -1 wraps around to the terminator
+
+        # C[c] => number of characters smaller than c, occ[c][i] => occurrences of c in bwt[:i]
+        counts = np.bincount(encoded, minlength=len(alphabet))
+        self.C = np.concatenate(([0], np.cumsum(counts)[:-1])).tolist()
+        self.occ = []
+        for code in range(len(alphabet)):
+            occ = np.zeros(len(bwt) + 1, dtype=np.int32)
+            np.cumsum(bwt == code, out=occ[1:])
+            self.occ.append(memoryview(occ))
+
+        self.sa = sa.astype(np.int32)
+        # position of the separator in front of every read
+        self.read_starts = np.cumsum([0] + [length + 1 for length in self.read_lengths[:-1]])
+
+    def match(self, index):
+        """
+        Reads with a prefix equal to a suffix of reads[index], at least min_overlap long and shorter than
+        the read it is a prefix of
+        :return list of match tuples (index, length), by increasing length
+        """
+        C, occ, codes = self.C, self.occ, self.codes
+        separator = codes[SEPARATOR]
+        lo, hi = 0, len(self.sa)
+
+        adjacent = []
+        length = 0
+        for char in reversed(self.reads[index]):
+            code = codes[char]
+            lo, hi = C[code] + occ[code][lo], C[code] + occ[code][hi]
+            if lo >= hi:
+                break
+            length += 1
+
+            if length >= self.min_overlap:
+                start, end = C[separator] + occ[separator][lo], C[separator] + occ[separator][hi]
+                if start < end:
+                    found = np.searchsorted(self.read_starts, self.sa[start:end])
+                    for other in sorted(found.tolist()):
+                        if length < self.read_lengths[other]:
+                            adjacent.append((other, length))
+        return adjacent
+
+    def nbytes(self):
+        return self.sa.nbytes + sum(occ.nbytes for occ in self.occ) + self.read_starts.nbytes
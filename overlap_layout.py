@@ -0,0 +1,141 @@
+# python3
+import numpy as np
+
+from overlap_adjacency import OverlapAdjacency
+
+'''
+Greedy overlap layout => O(E log E) for E overlaps, always terminates.
+
+    1. Sort every overlap edge (read -> read, length) once, longest first
+       (ties by source read, then target read, so the layout is deterministic)
+    2. Walk the sorted edges and take an edge a -> b when
+           a has no successor yet, b has no predecessor yet (in / out degree at most 1)
+           a and b are in different chains (union-find), so no cycle is closed early
+       every accepted edge joins two chains, after n - 1 of them there is a single Hamiltonian path
+    3. Chains left when the overlaps run out (overlaps shorter than the minimum, missed ones) are joined head to
+       tail by the same greedy rule over the overlap of every chain tail with every other chain head, computed
+       directly (exactly, or allowing mismatches for reads with errors) => O(C^2) overlaps for C chains.
+       Past MAX_ORDERED_CHAINS chains only the heads whose first CHAIN_SEED bases occur in a tail are candidates,
+       the chains those overlaps still don't connect are joined in read order.
+
+The overlap of two strings (longest suffix of s which is a prefix of t) comes from the prefix function
+of t + separator + s => O(|s| + |t|) instead of comparing every candidate length.
+'''
+
+MAX_ORDERED_CHAINS = 128  # more chains are joined by the overlaps of seeded candidates instead of all pairs
+CHAIN_SEED = 12  # bases at the start of a chain head looked up in the tails
+
+
+def suffix_prefix_overlap(s, t, separator='\x00'):
+    """Length of the longest suffix of s which is also a prefix of t (shorter than both)"""
+    if not s or not t:
+        return 0
+    text = t + separator + s
+    border = [0] * len(text)
+    for i in range(1, len(text)):
+        length = border[i - 1]
+        while length and text[i] != text[length]:
+            length = border[length - 1]
+        if text[i] == text[length]:
+            length += 1
+        border[i] = length
+    # s == t (or a suffix of s equal to all of t) => next shorter border, every border is a verified overlap
+    length = border[-1]
+    while length >= min(len(s), len(t)):
+        length = border[length - 1]
+    return length
+
+
+def _find(parent, node):
+    while parent[node] != node:
+        parent[node] = parent[parent[node]]  # path halving
+        node = parent[node]
+    return node
+
+
+def greedy_layout(adj, num_reads=None):
+    """
+    :param adj: OverlapAdjacency, or adj[a] => list of (b, overlap length) for every read b whose prefix
+                overlaps a suffix of a
+    :return list of chains, a chain => [(read, overlap with the previous read of the chain)], first overlap 0
+    """
+    num_reads = len(adj) if num_reads is None else num_reads
+    if not isinstance(adj, OverlapAdjacency):
+        adj = OverlapAdjacency.from_lists(adj)
+    sources, targets, lengths = adj.sources(), adj.edges['target'], adj.edges['overlap'].astype(np.int64)
+    order = np.argsort(-lengths, kind='stable')
+
+    successor = [-1] * num_reads
+    overlap_in = [0] * num_reads
+    has_predecessor = [False] * num_reads
+    parent = list(range(num_reads))
+
+    joined = 0
+    for a, b, length in zip(sources[order].tolist(), targets[order].tolist(), lengths[order].tolist()):
+        if joined == num_reads - 1:
+            break
+        if successor[a] != -1 or has_predecessor[b]:
+            continue
+        root_a, root_b = _find(parent, a), _find(parent, b)
+        if root_a == root_b:
+            continue
+        parent[root_a] = root_b
+        successor[a], has_predecessor[b], overlap_in[b] = b, True, length
+        joined += 1
+
+    chains = []
+    for head in range(num_reads):
+        if has_predecessor[head]:
+            continue
+        chain, node = [(head, 0)], successor[head]
+        while node != -1:
+            chain.append((node, overlap_in[node]))
+            node = successor[node]
+        chains.append(chain)
+    return chains
+
+
+def layout_path(adj, reads, overlap=suffix_prefix_overlap):
+    """
+    Single path through every read, chains the overlaps didn't connect are joined by their direct overlap
+    :param overlap: overlap(s, t) => length of the overlap used to join chains, exact by default
+    :return [(read, overlap with the previous read)], first overlap 0
+    """
+    chains = greedy_layout(adj, len(reads))
+    if len(chains) > 1:
+        # chain i -> chain j weighted by the overlap of the tail of i with the head of j (any length),
+        # the same greedy layout over those orders the chains
+        if len(chains) <= MAX_ORDERED_CHAINS:
+            links = [[(j, overlap(reads[tail[-1][0]], reads[head[0][0]])) for j, head in enumerate(chains) if j != i]
+                     for i, tail in enumerate(chains)]
+        else:
+            links = _seeded_links(chains, reads, overlap)
+        ordered = []
+        for group in greedy_layout(links, len(chains)):
+            for position, (i, length) in enumerate(group):
+                chain = chains[i]
+                if not position and ordered:
+                    # no candidate overlap between the groups, joined in read order
+                    length = overlap(reads[ordered[-1][-1][0]], reads[chain[0][0]])
+                chain[0] = (chain[0][0], length)
+                ordered.append(chain)
+        chains = ordered
+    return [step for chain in chains for step in chain]
+
+
+def _seeded_links(chains, reads, overlap, seed=CHAIN_SEED):
+    """
+    Links chain i -> chain j of the chains whose head starts with CHAIN_SEED bases found in the tail of i,
+    an overlap of at least CHAIN_SEED bases always has one => O(C * read length) lookups instead of O(C^2) overlaps
+    """
+    heads = {}
+    for j, chain in enumerate(chains):
+        heads.setdefault(reads[chain[0][0]][:seed], []).append(j)
+    links = []
+    for i, chain in enumerate(chains):
+        tail = reads[chain[-1][0]]
+        candidates = {j for start in range(1, len(tail) - seed + 1) for j in heads.get(tail[start:start + seed], ())}
+        candidates.discard(i)
+        lengths = ((j, overlap(tail, reads[chains[j][0][0]])) for j in sorted(candidates))
+        links.append([(j, length) for j, length in lengths if length])
+    return links
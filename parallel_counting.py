@@ -0,0 +1,126 @@
+# python3
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from kmer_engine import DEFAULT_CHUNK_SIZE, MAX_BULK_K, _count_chunk, _merge_counts, count_kmers_bulk
+
+'''
+Minimizer partitioned k-mer counting on a process pool.
+
+The minimizer of a k-mer is its smallest m-mer (m < k) under a hash, every k-mer has exactly one
+so bucket = minimizer % partitions sends all the copies of a k-mer to the same bucket, and
+buckets can be counted independently without any shared table.
+
+    map    => every worker takes a chunk of reads, counts it with NumPy (see kmer_engine) and splits
+              the distinct k-mers of the chunk into buckets by minimizer
+    reduce => every worker merges the chunk counts of one bucket
+    the buckets are disjoint, so concatenating and sorting them gives exactly the serial result
+
+Consecutive k-mers of a read mostly share their minimizer, so the buckets are balanced by the hash
+and the work of a read is spread over few buckets.
+Chunks are sized so every worker gets a few of them: CHUNKS_PER_WORKER per worker for a list of reads,
+STREAM_CHUNK_SIZE reads for a stream of unknown length.
+'''
+
+DEFAULT_MINIMIZER_LENGTH = 11
+CHUNKS_PER_WORKER = 4
+MIN_CHUNK_SIZE = 256  # fewer reads per chunk and the NumPy passes cost less than the process round trip
+STREAM_CHUNK_SIZE = 1 << 13
+PARTITIONS_PER_WORKER = 4
+_MIX = np.uint64(0x9E3779B97F4A7C15)  # Fibonacci hashing, AAA..A must not be everybody's minimizer
+
+
+def minimizers(kmers, k, m):
+    """Hashed minimizer of every packed k-mer, the smallest hash over its k - m + 1 m-mers"""
+    mmer_mask = np.uint64((1 << 2 * m) - 1)
+    smallest = np.full(len(kmers), np.iinfo(np.uint64).max, dtype=np.uint64)
+    for shift in range(0, 2 * (k - m) + 1, 2):
+        hashed = ((kmers >> np.uint64(shift)) & mmer_mask) * _MIX
+        hashed ^= hashed >> np.uint64(29)
+        np.minimum(smallest, hashed, out=smallest)
+    return smallest
+
+
+def _count_partitioned(reads, k, m, partitions):
+    """map => counts of a chunk of reads, split into partitions by minimizer"""
+    kmers, counts = _count_chunk(reads, k)
+    buckets = minimizers(kmers, k, m) % np.uint64(partitions)
+    order = np.argsort(buckets, kind='stable')  # k-mers stay sorted inside a bucket
+    bounds = np.searchsorted(buckets[order], np.arange(partitions + 1, dtype=np.uint64))
+    kmers, counts = kmers[order], counts[order]
+    return [(kmers[bounds[b]:bounds[b + 1]], counts[bounds[b]:bounds[b + 1]]) for b in range(partitions)]
+
+
+def _merge_partition(parts):
+    """reduce => counts of one partition over every chunk"""
+    kmers, counts = np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+    if parts:
+        kmers, counts = _merge_counts(kmers, counts, np.concatenate([part[0] for part in parts]),
+                                      np.concatenate([part[1] for part in parts]))
+    return kmers, counts
+
+
+def _chunks(reads, chunk_size):
+    chunk = []
+    for read in reads:
+        chunk.append(read)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def chunk_size_for(reads, workers):
+    """Reads per chunk, so that the chunks of the reads keep `workers` processes busy"""
+    if not hasattr(reads, '__len__'):
+        return STREAM_CHUNK_SIZE
+    size = -(-len(reads) // (workers * CHUNKS_PER_WORKER))
+    return min(max(size, MIN_CHUNK_SIZE), DEFAULT_CHUNK_SIZE)
+
+
+def count_kmers_parallel(reads, k, workers=None, partitions=None, chunk_size=None,
+                         minimizer_length=DEFAULT_MINIMIZER_LENGTH):
+    """
+    Same result as count_kmers_bulk, counted by `workers` processes (all cores by default)
+    :param chunk_size: reads counted by a worker at a time, sized from the reads and workers by default
+    :return sorted distinct packed k-mers (uint64) and the number of times each one occurs in the reads
+    """
+    if k > MAX_BULK_K:
+        raise ValueError('bulk k-mer counting supports k <= %d, got %d' % (MAX_BULK_K, k))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return count_kmers_bulk(reads, k, chunk_size or DEFAULT_CHUNK_SIZE)
+    chunk_size = chunk_size or chunk_size_for(reads, workers)
+    partitions = partitions or workers * PARTITIONS_PER_WORKER
+    m = min(minimizer_length, k)
+
+    buckets = [[] for _ in range(partitions)]
+    with ProcessPoolExecutor(workers) as executor:
+        # at most 2 chunks per worker in flight, so a read generator is never loaded at once
+        pending = []
+        for chunk in _chunks(reads, chunk_size):
+            pending.append(executor.submit(_count_partitioned, chunk, k, m, partitions))
+            if len(pending) >= 2 * workers:
+                for bucket, part in zip(buckets, pending.pop(0).result()):
+                    bucket.append(part)
+        for future in pending:
+            for bucket, part in zip(buckets, future.result()):
+                bucket.append(part)
+
+        merged = list(executor.map(_merge_partition, buckets))
+
+    kmers = np.concatenate([part[0] for part in merged])
+    counts = np.concatenate([part[1] for part in merged])
+    order = np.argsort(kmers)
+    return kmers[order], counts[order]
+
+
+def workers_from_argv(argv):
+    """Number of worker processes given as --workers=N, 1 (serial) if there is none"""
+    for arg in argv:
+        if arg.startswith('--workers='):
+            return int(arg.split('=', 1)[1])
+    return 1
@@ -11,214 +11,229 @@ in order to simulate the 1% error rate of Illumina sequencing machines.
 You are not given the 100-mer composition of the genome
 '''
 
+import contextlib
 import sys
-from collections import deque
+
+import numpy as np
+
+from bubble_popping import DEFAULT_MAX_VISITED, pop_bubbles
+from compaction import compact_graph
+from components import parallel_clip_tips, parallel_pop_bubbles
+from csr_graph import CSRGraph
+from external_counting import count_kmers_external, memory_budget_from_argv
+from graph_cache import GraphCache, cache_dir_from_argv, reads_digest
+from hierholzer import eulerian_cycle
+from instrumentation import PipelineStats, counting, stats_file_from_argv
+from kmer_engine import MAX_BULK_K, KmerEngine, count_packed_kmers, kmer_counts_to_edges
+from node_index import NodeIndex
+from parallel_counting import count_kmers_parallel, workers_from_argv
+from read_correction import correct_reads
+from read_io import iter_reads, source_from_argv
+from solid_kmers import min_coverage_from_argv, solid_kmers
+from tip_clipping import clip_tips
 
 
 class DeBruijnGraph(object):
 
-    def __init__(self, k, reads):
+    def __init__(self, k, reads, bulk=False, workers=1, memory_budget=None, min_coverage=None, cache_dir=None,
+                 stats=None):
         self.k = k
+        self.stats = stats  # PipelineStats recording every stage, None => no instrumentation (see instrumentation)
+        self.workers = workers  # processes counting k-mers, 1 => serial
+        self.memory_budget = memory_budget  # bytes, k-mers are counted through temporary files if set
+        self.min_coverage = min_coverage  # k-mers seen fewer times are left out of the graph (see solid_kmers)
         self.threshold = self.k + 1
-        self.kmer_id_2Way_map = Kmer_Id_2Way_Map()
-        self.coverage = {}
-        self.de_bruijn_graph = {}
+        self.kmer_engine = KmerEngine(k)
+        # packed (k-1)-mer <-> node id of the k-mer graph, minimal perfect hash (see node_index)
+        # None for k > MAX_BULK_K (Python int labels) and once compaction renumbered the nodes
+        self.node_index = None
+
+        self.num_outgoing = lambda k: self.de_bruijn_graph.out_degree[k]
+        self.num_incoming = lambda k: self.de_bruijn_graph.in_degree[k]
+
+        # exact NumPy counts, or the count-min sketch estimates when a cutoff is applied to serially counted k-mers
+        bulk = bulk or workers > 1 or memory_budget
+        # a graph built before from the same reads, k, cutoff and counting mode is memory-mapped from the cache
+        # (see graph_cache), the sketch may let a few k-mers below the cutoff through where the exact counts don't
+        self.cache = None
+        if cache_dir:
+            reads = list(reads)  # hashed first, built from only on a cache miss
+            options = 'c%d-%s' % (min_coverage, 'exact' if bulk else 'sketch') if min_coverage else ''
+            self.cache = GraphCache(cache_dir, reads_digest(reads), k, options)
+        if self.restore('graph'):
+            return
 
-        self.num_outgoing = lambda k: len(self.de_bruijn_graph[k][0])
-        self.num_incoming = lambda k: self.de_bruijn_graph[k][1]
+        # CSR graph => edge coverage, out/in degree arrays and a deleted-edge bitmap (see csr_graph)
+        self.de_bruijn_graph = None
+        with self.stage('build'):
+            if bulk:
+                self.de_bruijn_graph = self.build_de_bruijn_graph_bulk(reads)
+            elif min_coverage:
+                # two passes over the reads => a streamed input is kept, it is far smaller than its k-mers
+                self.de_bruijn_graph = self.build_de_bruijn_graph(self.solid_kmers(list(reads)))
+            else:
+                self.de_bruijn_graph = self.build_de_bruijn_graph(self.reads_to_kmers(reads))
+        self.snapshot('graph')
 
-        self.build_de_bruijn_graph(self.reads_to_kmers(reads))
+    def stage(self, name):
+        """Context measuring a pipeline stage, gives the counters dict of the stage (None when not instrumented)"""
+        if self.stats is None:
+            return contextlib.nullcontext()
+        return self.stats.stage(name, lambda: self.de_bruijn_graph)
 
     def reads_to_kmers(self, reads):
-        break_read = lambda read: [read[j:j + self.k] for j in range(len(read) - self.k + 1)]
-        return [kmer for read in reads for kmer in break_read(read)]
-
-    def build_de_bruijn_graph(self, kmers):
-        for kmer in kmers:
-            left = self.kmer_id_2Way_map.insert(kmer[:-1])
-            right = self.kmer_id_2Way_map.insert(kmer[1:])
+        return self.kmer_engine.reads_to_kmers(reads)
 
-            if left != right:
-                self.de_bruijn_graph.setdefault(left, [set(), 0])
-                self.de_bruijn_graph.setdefault(right, [set(), 0])
-                self.coverage.setdefault((left, right), 0)
-                self.coverage[(left, right)] += 1
+    def solid_kmers(self, reads):
+        # count-min sketch pre-pass, only k-mers estimated at min_coverage or more get a node and a coverage entry
+        return solid_kmers(self.kmer_engine, reads, self.min_coverage)
 
-                if right not in self.de_bruijn_graph[left][0]:
-                    self.de_bruijn_graph[left][0].add(right)
-                    self.de_bruijn_graph[right][1] += 1
+    def build_de_bruijn_graph(self, kmers):
+        # one dict entry per distinct packed k-mer, its count is the coverage of its edge
+        return self.graph_from_counts(*count_packed_kmers(kmers))
+
+    def graph_from_counts(self, kmers, counts):
+        """
+        The distinct (k-1)-mers are known once every k-mer is counted => the node index is built once
+        from that static set, node ids are its minimal perfect hash values
+        """
+        if self.k > MAX_BULK_K:
+            # the (k-1)-mers don't fit a uint64 key => node ids are their sorted order (np.unique)
+            return CSRGraph.from_kmer_counts(kmers, counts, self.k)
+        left, right, coverage = kmer_counts_to_edges(kmers, counts, self.k)
+        self.node_index = NodeIndex(np.unique(np.concatenate((left, right))))
+        return CSRGraph(len(self.node_index), self.node_index.lookup(left), self.node_index.lookup(right),
+                        coverage, self.node_index.labels)
+
+    def build_de_bruijn_graph_bulk(self, reads):
+        # one NumPy pass gives every distinct edge together with its coverage (minimizer partitioned if workers > 1,
+        # through partition files on disk if there is a memory budget)
+        if self.memory_budget:
+            counted = count_kmers_external(reads, self.k, self.memory_budget)
+        elif self.k > MAX_BULK_K:
+            # too long for the 2-bit NumPy windows, exact counts of the Python int k-mers
+            counted = count_packed_kmers(self.reads_to_kmers(reads))
+        else:
+            counted = count_kmers_parallel(reads, self.k, self.workers)
+        if self.min_coverage:
+            # the counts are exact here, no sketch needed
+            kmers, counts = counted
+            counted = kmers[counts >= self.min_coverage], counts[counts >= self.min_coverage]
+        return self.graph_from_counts(*counted)
 
     def remove_leaves(self):
-        removable = [k for k, v in self.de_bruijn_graph.items() if len(v[0]) == 0]
-        for k in removable:
-            del self.de_bruijn_graph[k]
+        # nodes without outgoing edges can't be on the cycle, cut them off
+        graph = self.de_bruijn_graph
+        with self.stage('remove_leaves') as counters:
+            for node in np.flatnonzero(graph.out_degree == 0).tolist():
+                for edge in list(graph.incoming_edges(node)):
+                    graph.remove_edge(edge)
+                    counting(counters, 'edges_removed', int(graph.lengths[edge]))
+
+    def compact(self):
+        # merge non-branching paths into unitig edges (see compaction), later stages walk unitigs instead of k-mers
+        with self.stage('compact'):
+            self.de_bruijn_graph = compact_graph(self.de_bruijn_graph)
+            # unitigs renumber the nodes => the ids of the k-mer graph index are stale
+            self.node_index = None
+
+    def snapshot(self, stage):
+        # store the graph as it is after a stage, later runs can start from there
+        if self.cache:
+            self.cache.store(stage, self.de_bruijn_graph)
+
+    def restore(self, stage):
+        """:return True if the graph of that stage was found in the cache and is now the current graph"""
+        graph = self.cache.load(stage) if self.cache else None
+        if graph is None:
+            return False
+        self.de_bruijn_graph = graph
+        # cached graphs may be compacted, their ids aren't the minimal perfect hash values
+        self.node_index = None
+        return True
 
     def print_graph(self):
-        for k, v in self.de_bruijn_graph.items():
-            print(k, v)
+        for node in range(self.de_bruijn_graph.num_nodes):
+            print(node, [list(self.de_bruijn_graph.successors(node)), self.num_incoming(node)])
 
 
 class RemoveTips(DeBruijnGraph):
 
-    def __init__(self, k, reads):
-        DeBruijnGraph.__init__(self, k, reads)
+    def __init__(self, k, reads, bulk=False, workers=1, memory_budget=None, min_coverage=None, cache_dir=None,
+                 stats=None):
+        DeBruijnGraph.__init__(self, k, reads, bulk, workers, memory_budget, min_coverage, cache_dir, stats)
 
     def remove_tips(self):
-        for k, v in self.de_bruijn_graph.items():
-            find_and_remove = None
-
-            if self.num_outgoing(k) == 1 and self.num_incoming(k) == 0:
-                find_and_remove = self.remove_inward
-            elif self.num_outgoing(k) > 1:
-                find_and_remove = self.remove_outward
-            else:
-                continue
-
-            condition = True
-            while condition:
-                condition = False
-                for edge in v[0]:
-                    if find_and_remove(edge, 0):
-                        v[0].remove(edge)
-                        condition = True
-                        break
-
-    def remove_outward(self, current, depth):
-        if self.num_outgoing(current) > 1 or self.num_incoming(current) > 1:
-            return False
-
-        if depth == self.threshold:
-            return False
-
-        if self.num_outgoing(current) == 0:
-            return True
-
-        if self.remove_outward(next(iter(self.de_bruijn_graph[current][0])), depth + 1):
-            to = next(iter(self.de_bruijn_graph[current][0]))
-            self.de_bruijn_graph[current][0].pop()
-            self.de_bruijn_graph[to][1] -= 1
-            return True
-
-        return False
-
-    def remove_inward(self, current, depth):
-        if self.num_outgoing(current) == 0 or self.num_incoming(current) > 1:
-            return True
-
-        if depth == self.threshold:
-            return False
-
-        if self.remove_inward(next(iter(self.de_bruijn_graph[current][0])), depth + 1):
-            to = next(iter(self.de_bruijn_graph[current][0]))
-            self.de_bruijn_graph[current][0].pop()
-            self.de_bruijn_graph[to][1] -= 1
-            return True
-
-        return False
+        # iterative worklist clipping, tips exposed by a removal are handled in the same pass
+        # with several workers independent regions of the graph are clipped in parallel (see components)
+        with self.stage('remove_tips') as counters:
+            if self.workers > 1:
+                return parallel_clip_tips(self.de_bruijn_graph, self.threshold, self.workers, counters)
+            return clip_tips(self.de_bruijn_graph, self.threshold, counters=counters)
 
 
 class RemoveBubbles(RemoveTips):
 
-    def __init__(self, k, reads):
-        RemoveTips.__init__(self, k, reads)
-        self.paths = {}
+    def __init__(self, k, reads, bulk=False, max_visited=DEFAULT_MAX_VISITED, workers=1, memory_budget=None,
+                 min_coverage=None, cache_dir=None, stats=None):
+        RemoveTips.__init__(self, k, reads, bulk, workers, memory_budget, min_coverage, cache_dir, stats)
+        self.max_visited = max_visited
 
     def remove_bubbles(self):
-        for k, v in self.de_bruijn_graph.items():
-            if self.num_outgoing(k) > 1:
-                self.dfs(path=[k], current=k, depth=0)
-
-        for pair, candidates_list in self.paths.items():
-            source, target = pair[0], pair[1]
-            best_path = max(candidates_list, key=lambda item: item[1])[0]
-            for path, _ in candidates_list:
-                if best_path == path or not self.bubble_possible(source, target):
-                    continue
-                if self.paths_disjoint(best_path, path) and self.path_exists(path):
-                    self.remove_path(path)
-
-    def bubble_possible(self, source, target):
-        return len(self.de_bruijn_graph[source][0]) > 1 and self.de_bruijn_graph[target][1] > 1
-
-    def remove_path(self, path):
-        for j in range(len(path) - 1):
-            self.de_bruijn_graph[path[j]][0].remove(path[j + 1])
-            self.de_bruijn_graph[path[j + 1]][1] -= 1
-            del self.coverage[(path[j], path[j + 1])]
-
-    def paths_disjoint(self, a, b):
-        return len(set(a) & set(b)) == 2
-
-    def path_exists(self, path):
-        for j in range(len(path) - 1):
-            if path[j + 1] not in self.de_bruijn_graph[path[j]][0]:
-                return False
-        return True
-
-    def dfs(self, path, current, depth):
-        if current != path[0] and self.num_incoming(current) > 1:
-            weight = sum(self.coverage[(path[i], path[i + 1])] for i in range(len(path) - 1)) / len(path)
-            self.paths.setdefault((path[0], current), list()).append((path[:], weight))
-
-        if depth == self.threshold:
-            return
-
-        for next_ in self.de_bruijn_graph[current][0]:
-            if next_ not in path:
-                path.append(next_)
-                self.dfs(path, next_, depth + 1)
-                path.remove(next_)
+        # bounded BFS from every branching node, the path with the lower mean coverage is removed
+        with self.stage('remove_bubbles') as counters:
+            if self.workers > 1:
+                return parallel_pop_bubbles(self.de_bruijn_graph, self.threshold, self.workers, self.max_visited,
+                                            counters)
+            return pop_bubbles(self.de_bruijn_graph, self.threshold, self.max_visited, counters)
 
 
 class PhiX174GenomeAssembler(RemoveBubbles):
 
-    def __init__(self, k, reads):
-        RemoveBubbles.__init__(self, k, reads)
+    def __init__(self, k, reads, bulk=False, max_visited=DEFAULT_MAX_VISITED, workers=1, memory_budget=None,
+                 min_coverage=None, cache_dir=None, stats=None):
+        RemoveBubbles.__init__(self, k, reads, bulk, max_visited, workers, memory_budget, min_coverage, cache_dir,
+                               stats)
 
     def make_eulerian_cycle(self):
-        vertices = deque()
-        path = []
-        current = next(iter(self.de_bruijn_graph))
-        vertices.append(current)
-
-        while vertices:
-            current = vertices[0]
-            if len(self.de_bruijn_graph[current][0]) != 0:
-                t = next(iter(self.de_bruijn_graph[current][0]))
-                vertices.append(t)
-                self.de_bruijn_graph[current][0].remove(t)
-                continue
-            path.append(current)
-            vertices.popleft()
-
-        return path
+        # edge ids in walking order, stack based Hierholzer in O(E) (see hierholzer)
+        with self.stage('make_eulerian_cycle') as counters:
+            cycle = eulerian_cycle(self.de_bruijn_graph)
+            counting(counters, 'cycle_edges', len(cycle))
+        return cycle
 
     def assemble_genome(self):
-        self.remove_tips()
-        self.remove_leaves()
-        self.remove_bubbles()
+        # with a cache, start from the latest snapshot made with the same thresholds
+        tips = 'tips-t%d' % self.threshold
+        bubbles = '%s-bubbles-t%d-v%d' % (tips, self.threshold, self.max_visited)
+        if not self.restore(bubbles):
+            if not self.restore(tips):
+                self.compact()
+                self.remove_tips()
+                self.remove_leaves()
+                self.snapshot(tips)
+            self.remove_bubbles()
+            self.snapshot(bubbles)
+        # cleanup leaves new non-branching chains behind, a clean circular genome ends up as a single unitig
+        self.compact()
 
         cycle = self.make_eulerian_cycle()
-        circular_genome = self.kmer_id_2Way_map.id_to_kmer_map[cycle[0]]
-        for i in range(1, len(cycle) - (self.k - 1)):
-            circular_genome += self.kmer_id_2Way_map.id_to_kmer_map[cycle[i]][-1]
-
-        return circular_genome
-
-
-class Kmer_Id_2Way_Map:
-    def __init__(self):
-        self.num_ids = 0
-        self.kmer_to_id_map = {}
-        self.id_to_kmer_map = {}
-
-    def insert(self, kmer):
-        if kmer not in self.kmer_to_id_map:
-            self.kmer_to_id_map[kmer] = self.num_ids
-            self.id_to_kmer_map[self.num_ids] = kmer
-            self.num_ids += 1
-        return self.kmer_to_id_map[kmer]
+        # every edge spells the bases it adds after its source, around the cycle that is the whole genome
+        return ''.join(self.de_bruijn_graph.edge_sequence(edge) for edge in cycle)
 
 
 if __name__ == "__main__":
-    print(PhiX174GenomeAssembler(20, sys.stdin.read().split()).assemble_genome())
+    reads = iter_reads(source_from_argv(sys.argv[1:]))
+    # --stats=FILE => time, memory, graph size and counters of every stage as JSON
+    stats_file = stats_file_from_argv(sys.argv[1:])
+    stats = PipelineStats() if stats_file else None
+    if '--correct' in sys.argv[1:]:
+        # fix isolated mismatches from the k-mer spectrum first, far fewer erroneous k-mers reach the graph
+        reads = correct_reads(reads, 20)
+    assembler = PhiX174GenomeAssembler(20, reads, bulk='--bulk' in sys.argv[1:], workers=workers_from_argv(sys.argv[1:]),
+                                       memory_budget=memory_budget_from_argv(sys.argv[1:]),
+                                       min_coverage=min_coverage_from_argv(sys.argv[1:]),
+                                       cache_dir=cache_dir_from_argv(sys.argv[1:]), stats=stats)
+    print(assembler.assemble_genome())
+    if stats_file:
+        stats.write(stats_file)
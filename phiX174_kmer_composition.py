@@ -1,6 +1,14 @@
 # python2
+import itertools
 import sys
 
+import numpy as np
+
+from csr_graph import CSRGraph
+from hierholzer import eulerian_cycle, path_nodes
+from kmer_engine import BASES, KmerEngine, decode, packed_constant, packed_dtype
+from read_io import iter_reads, source_from_argv
+
 """
 GENOME ASSEMBLY FROM K-MER
 Task: Given the K-mer composition of some string,
@@ -27,9 +35,9 @@ Hierholzer's Algorithm: O(Edges) Time
             and repeat this search process
             Join the previous and new tour
             
-Implementation Details:
-*   Maintain a Set of unused edges
-*   Maintain a List of vertices on current tour that have unused edges
+Implementation Details (see hierholzer):
+*   Keep a cursor to the next unused edge of every vertex
+*   Keep the current trail on a stack, a vertex is added to the tour once all its edges are used
 
 '''
 
@@ -41,27 +49,11 @@ Step 2 : Run Eulerian Cycle on this Graph to determine genome
 
 
 class EulerianCycle:
-    def __init__(self, adj):
-        self.n = len(adj)
-        self.numUnexploredEdges = 0  # number of unexplored edges
-        self.nodesWUE = dict()  # key: node with unused edges; value: the position of such node in the current path
-        self.inDeg = dict()
-        self.outDeg = dict()
-        self.adjCurPos = dict()
+    def __init__(self, graph):
+        self.n = graph.num_nodes
         self.path = []
         self.unbalancedNode = []
-        self.adjList = adj
-        self.update_adj_list()
-
-    def update_adj_list(self):
-        for w, vList in self.adjList.items():
-            self.inDeg[w] = self.inDeg.get(w, 0)
-            for v in vList:
-                self.inDeg[v] = self.inDeg.get(v, 0) + 1
-            l = len(vList)
-            self.outDeg[w] = l
-            self.numUnexploredEdges += l
-            self.adjCurPos[w] = 0
+        self.graph = graph  # CSRGraph, the edges leaving w are targets[out_offsets[w]:out_offsets[w + 1]]
 
     def read_input(self):
         data = list(sys.stdin.read().strip().split())
@@ -69,86 +61,32 @@ class EulerianCycle:
         for i in range(len(data) // 3):
             curMax = max(int(data[i * 3]), curMax, max(list(map(int, data[i * 3 + 2].split(',')))))
         self.n = curMax + 1
-        self.adjList = [[]] * self.n
-        self.unusedEdges = [[]] * self.n
-        self.inDeg = [0] * self.n
-        self.outDeg = [0] * self.n
-        self.adjCurPos = [0] * self.n
+        sources, targets = [], []
         for i in range(len(data) // 3):
             curIn = int(data[i * 3])
-            self.adjList[curIn] = list(map(int, data[i * 3 + 2].split(',')))
-            for v in self.adjList[curIn]:
-                self.inDeg[v] += 1
-            l = len(self.adjList[curIn])
-            self.outDeg[curIn] = l
-            self.numUnexploredEdges += l
+            for v in map(int, data[i * 3 + 2].split(',')):
+                sources.append(curIn)
+                targets.append(v)
+        self.graph = CSRGraph(self.n, sources, targets)
 
     def add_edge(self):
-        if type(self.adjList) is dict:
-            for v in self.adjList.keys():
-                if self.inDeg[v] != self.outDeg[v]:
-                    if self.inDeg[v] < self.outDeg[v]:
-                        self.unbalancedNode.append(v)
-                    else:
-                        self.unbalancedNode.insert(0, v)
-            if len(self.unbalancedNode) > 0:
-                self.adjList[self.unbalancedNode[0]].append(self.unbalancedNode[1])
-                self.outDeg[self.unbalancedNode[0]] += 1
-                self.inDeg[self.unbalancedNode[1]] += 1
-            return
+        inDeg, outDeg = self.graph.in_degree.tolist(), self.graph.out_degree.tolist()
         for v in range(self.n):
-            if self.inDeg[v] != self.outDeg[v]:
-                if self.inDeg[v] < self.outDeg[v]:
+            if inDeg[v] != outDeg[v]:
+                if inDeg[v] < outDeg[v]:
                     self.unbalancedNode.append(v)
                 else:
                     self.unbalancedNode.insert(0, v)
         if len(self.unbalancedNode) > 0:
-            self.adjList[self.unbalancedNode[0]].append(self.unbalancedNode[1])
-            self.outDeg[self.unbalancedNode[0]] += 1
-            self.inDeg[self.unbalancedNode[1]] += 1
-        return
-
-    def explore(self, s):
-        self.path.append(s)
-        curr_pos = self.adjCurPos[s]
-        cur_max_pos = self.outDeg[s]
-        while curr_pos < cur_max_pos:
-            self.adjCurPos[s] = curr_pos + 1
-            if curr_pos + 1 < cur_max_pos:
-                self.nodesWUE[s] = len(self.path) - 1
-            else:
-                if s in self.nodesWUE:
-                    del self.nodesWUE[s]
-            v = self.adjList[s][curr_pos]
-            self.path.append(v)
-            s = v
-            curr_pos = self.adjCurPos[s]
-            cur_max_pos = self.outDeg[s]
-            self.numUnexploredEdges -= 1
-        return
-
-    def update_path(self, start_pos):
-        l = len(self.path) - 1
-        self.path = self.path[start_pos:l] + self.path[:start_pos]
-        for node, pos in self.nodesWUE.items():
-            if pos < start_pos:
-                self.nodesWUE[node] = pos + l - start_pos
-            else:
-                self.nodesWUE[node] = pos - start_pos
+            # CSR arrays are immutable in size => rebuild with the extra edge
+            graph = self.graph
+            self.graph = CSRGraph(self.n, np.append(graph.sources, self.unbalancedNode[0]),
+                                  np.append(graph.targets, self.unbalancedNode[1]), labels=graph.labels)
         return
 
     def build_eulerian_cycle(self):
-        if type(self.adjList) is dict:
-            w, vList = self.adjList.popitem()
-            self.adjList[w] = vList
-            self.explore(w)
-        else:
-            self.explore(0)
-
-        while self.numUnexploredEdges > 0:
-            node, pos = self.nodesWUE.popitem()
-            self.update_path(pos)
-            self.explore(node)
+        # stack based Hierholzer with per node cursors, sub-tours are spliced in place (see hierholzer)
+        self.path = path_nodes(self.graph, eulerian_cycle(self.graph))
         return self.path
 
     def print_path(self):
@@ -159,29 +97,28 @@ class GenomeAssembly_k_mer_composition:
     def __init__(self):
         self.k, self.adj = self.read_data()
         self.path = EulerianCycle(self.adj).build_eulerian_cycle()
-        print(self.reconstruct_from_path(self.path)[:-self.k + 1])
+        print(self.reconstruct_from_path(self.path, self.adj.labels, self.k)[:-self.k + 1])
 
     def read_data(self):
-        data = list(sys.stdin.read().strip().split())
-        adj = self.de_brujin(len(data[0]), data)
-        return len(data[0]), adj
+        # k-mers are streamed, k is the length of the first one
+        data = iter_reads(source_from_argv(sys.argv[1:]))
+        first = next(data)
+        adj = self.de_brujin(len(first), itertools.chain([first], data))
+        return len(first), adj
 
     @staticmethod
     def de_brujin(k, patterns):
-        adjdb = dict()
-        for p in patterns:
-            if p[:k - 1] in adjdb:
-                adjdb[p[:k - 1]].append(p[1:])
-            else:
-                adjdb[p[:k - 1]] = []
-                adjdb[p[:k - 1]].append(p[1:])
-            if p[1:] not in adjdb:
-                adjdb[p[1:]] = []
-        return adjdb
+        # one edge per pattern (repeats and self loops included), nodes are the packed (k-1)-mers
+        kmer_engine = KmerEngine(k)
+        kmers = np.fromiter(kmer_engine.reads_to_kmers(patterns), dtype=packed_dtype(k))
+        left, right = kmers >> 2, kmers & packed_constant(kmers, kmer_engine.node_mask)
+        labels, ids = np.unique(np.concatenate((left, right)), return_inverse=True)
+        ids = ids.ravel()
+        return CSRGraph(len(labels), ids[:len(kmers)], ids[len(kmers):], labels=labels)
 
     @staticmethod
-    def reconstruct_from_path(path):
-        return path[0] + ''.join(seq[-1] for seq in path[1:])
+    def reconstruct_from_path(path, labels, k):
+        return decode(int(labels[path[0]]), k - 1) + ''.join(BASES[int(labels[node]) & 3] for node in path[1:])
 
 
 if __name__ == "__main__":
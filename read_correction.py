@@ -0,0 +1,119 @@
+# python3
+import numpy as np
+
+from kmer_engine import KmerEngine, count_kmers_bulk, decode, encode
+
+'''
+k-mer spectrum read error correction, run on the reads before the de Bruijn graph is built.
+
+Spectrum => how many times every k-mer occurs in the reads. Genomic k-mers are seen about coverage times,
+a k-mer containing a sequencing error is seen once or twice, so the histogram of counts has a valley
+between the two populations => k-mers counted at least `cutoff` times are solid, the others weak.
+
+One mismatch at position p of a read makes the k-mers starting at p - k + 1 .. p weak,
+so every run of weak k-mers in a read points at one error:
+    run of weak k-mers i .. j => the error is at one of the positions j .. i + k - 1
+    (exactly one position unless the run is cut short by an end of the read)
+Every candidate position and substitute base is tried, the fix is applied only if exactly one of them
+makes all the k-mers covering the position solid. Ambiguous or hopeless reads are left as they are.
+'''
+
+DEFAULT_CUTOFF = 2
+MAX_CORRECTIONS = 4  # per read, beyond that the read is more likely a chimera or a repeat
+
+
+def spectrum_cutoff(counts, default=DEFAULT_CUTOFF):
+    """
+    First count past the valley of the k-mer count histogram, where erroneous k-mers give way to genomic ones
+    :param default: lowest cutoff, also the cutoff of a spectrum without a valley (flat, or only decreasing)
+    """
+    histogram = np.bincount(counts)
+    for count in range(1, len(histogram) - 1):
+        if histogram[count + 1] > histogram[count]:
+            return max(count + 1, default)
+    return default
+
+
+class ReadCorrector(object):
+
+    def __init__(self, reads, k, cutoff=None):
+        self.k = k
+        self.kmer_engine = KmerEngine(k)
+        kmers, counts = count_kmers_bulk(reads, k)
+        self.cutoff = spectrum_cutoff(counts) if cutoff is None else cutoff
+        self.solid = set(kmers[counts >= self.cutoff].tolist())
+
+        self.reads_corrected = 0
+        self.bases_corrected = 0
+        self.reads_uncorrectable = 0
+
+    def _is_solid_around(self, packed, length, position):
+        """Are all the k-mers of a packed read covering `position` solid?"""
+        k, mask, solid = self.k, self.kmer_engine.kmer_mask, self.solid
+        for start in range(max(0, position - k + 1), min(position, length - k) + 1):
+            if (packed >> 2 * (length - k - start)) & mask not in solid:
+                return False
+        return True
+
+    def _fix(self, packed, length, first, last):
+        """
+        Single substitution which makes the weak k-mers first .. last solid
+        :return corrected packed read, None if there is no fix or more than one
+        """
+        fixes = []
+        for position in range(last, min(first + self.k - 1, length - 1) + 1):
+            shift = 2 * (length - 1 - position)
+            base = (packed >> shift) & 3
+            for other in range(4):
+                if other != base:
+                    candidate = packed ^ ((base ^ other) << shift)
+                    if self._is_solid_around(candidate, length, position):
+                        fixes.append(candidate)
+        return fixes[0] if len(fixes) == 1 else None
+
+    def _weak_runs(self, packed, length):
+        """(first, last) start positions of every run of weak k-mers"""
+        k, mask, solid = self.k, self.kmer_engine.kmer_mask, self.solid
+        runs, first = [], None
+        for start in range(length - k + 1):
+            weak = (packed >> 2 * (length - k - start)) & mask not in solid
+            if weak and first is None:
+                first = start
+            elif not weak and first is not None:
+                runs.append((first, start - 1))
+                first = None
+        if first is not None:
+            runs.append((first, length - k))
+        return runs
+
+    def correct(self, read):
+        """Read with its isolated mismatches fixed, unchanged if it can't be fixed with certainty"""
+        length = len(read)
+        if length < self.k or read.strip('ACGT'):
+            return read  # too short, or bases other than A/C/G/T
+        packed = original = encode(read)
+
+        corrections = 0
+        for first, last in self._weak_runs(packed, length):
+            fixed = self._fix(packed, length, first, last)
+            if fixed is None or corrections == MAX_CORRECTIONS:
+                self.reads_uncorrectable += 1
+                return read
+            packed = fixed
+            corrections += 1
+
+        if packed == original:
+            return read
+        self.reads_corrected += 1
+        self.bases_corrected += corrections
+        return decode(packed, length)
+
+
+def correct_reads(reads, k, cutoff=None):
+    """
+    Corrected copy of the reads (the spectrum needs every read before the first one is corrected)
+    :param cutoff: minimum count of a solid k-mer, the first valley of the spectrum by default
+    """
+    reads = list(reads)
+    corrector = ReadCorrector(reads, k, cutoff)
+    return [corrector.correct(read) for read in reads]
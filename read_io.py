@@ -0,0 +1,114 @@
+# python3
+import gzip
+import io
+import itertools
+import sys
+
+'''
+Streaming read ingestion shared by every entry point.
+
+Reads are yielded one at a time from
+    * plain text  => whitespace separated reads (one per line in the assignment datasets)
+    * FASTA       => '>' header lines, the sequence may be wrapped over several lines
+    * FASTQ       => 4 line records '@header', sequence, '+', qualities
+optionally gzip compressed. Format and compression are detected from the first bytes (text streams without
+a binary buffer, e.g. io.StringIO, are read line by line as they are and can't be compressed),
+the input is read through a large buffer line by line, so memory does not grow with the file size
+and there is no fixed number of reads.
+'''
+
+BUFFER_SIZE = 1 << 20
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _buffered(stream):
+    """Peekable buffered binary stream, gzip is decompressed on the fly"""
+    stream = getattr(stream, 'buffer', stream)  # text files wrap a binary buffer
+    if not hasattr(stream, 'peek'):
+        stream = io.BufferedReader(stream, BUFFER_SIZE)
+    if stream.peek(2)[:2] == GZIP_MAGIC:
+        stream = io.BufferedReader(gzip.GzipFile(fileobj=stream), BUFFER_SIZE)
+    return stream
+
+
+def _first_symbol(stream):
+    head = stream.peek(BUFFER_SIZE).lstrip()
+    return head[:1]
+
+
+def _text_lines(stream):
+    """:return first symbol, ascii encoded lines of a text stream (the blank lines before it are kept)"""
+    lines = (line.encode('ascii') for line in stream)
+    head = []
+    for line in lines:
+        head.append(line)
+        if line.strip():
+            break
+    return b''.join(head).lstrip()[:1], itertools.chain(head, lines)
+
+
+def _plain_reads(stream):
+    for line in stream:
+        for read in line.split():
+            yield read.decode('ascii')
+
+
+def _fasta_reads(stream):
+    parts = []
+    for line in stream:
+        line = line.strip()
+        if line.startswith(b'>'):
+            if parts:
+                yield b''.join(parts).decode('ascii')
+            parts = []
+        elif line:
+            parts.append(line)
+    if parts:
+        yield b''.join(parts).decode('ascii')
+
+
+def _fastq_reads(stream):
+    lines = (line.strip() for line in stream)
+    for line in lines:
+        if not line.startswith(b'@'):
+            continue  # blank line between records
+        sequence = next(lines, b'')
+        next(lines, None)  # '+' separator
+        next(lines, None)  # qualities
+        yield sequence.decode('ascii')
+
+
+def _stream_reads(stream):
+    if not hasattr(stream, 'buffer') and isinstance(stream.read(0), str):
+        symbol, stream = _text_lines(stream)
+    else:
+        stream = _buffered(stream)
+        symbol = _first_symbol(stream)
+    if symbol == b'>':
+        return _fasta_reads(stream)
+    if symbol == b'@':
+        return _fastq_reads(stream)
+    return _plain_reads(stream)
+
+
+def iter_reads(source=None):
+    """
+    Yield the reads of a plain text, FASTA or FASTQ input (gzip or not) lazily
+    :param source: path, '-' / None for stdin, or an open file
+    """
+    if source is None or source == '-':
+        for read in _stream_reads(sys.stdin):
+            yield read
+    elif isinstance(source, str):
+        with open(source, 'rb', buffering=BUFFER_SIZE) as handle:
+            for read in _stream_reads(handle):
+                yield read
+    else:
+        for read in _stream_reads(source):
+            yield read
+
+
+def source_from_argv(argv):
+    """First command line argument which is not a --flag, stdin if there is none"""
+    paths = [arg for arg in argv if not arg.startswith('--')]
+    return paths[0] if paths else None
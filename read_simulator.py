@@ -0,0 +1,54 @@
+# python3
+import numpy as np
+
+'''
+Seeded synthetic data for benchmarks => a random genome and reads sampled from it.
+
+    genome => uniform random bases, circular like phiX174
+    reads  => start positions drawn uniformly around the genome, enough of them for the requested coverage
+              (coverage = reads * read length / genome length), every base of a read is substituted
+              by one of the 3 other bases with probability error_rate,
+              or with exact_errors exactly error_rate * read_length bases of every read are
+              (the assignment datasets => one error per 100 base read)
+The same seed always gives the same genome and the same reads.
+'''
+
+BASES = np.frombuffer(b'ACGT', dtype=np.uint8)
+
+
+def random_genome(length, seed=0):
+    rng = np.random.default_rng(seed)
+    return BASES[rng.integers(0, 4, size=length)].tobytes().decode('ascii')
+
+
+def simulate_reads(genome, read_length=100, coverage=30, error_rate=0.0, seed=0, exact_errors=False):
+    """
+    Reads of a circular genome
+    :return list of read strings, about coverage * len(genome) / read_length of them
+    """
+    rng = np.random.default_rng(seed)
+    num_reads = max(1, int(round(coverage * len(genome) / read_length)))
+    codes = np.searchsorted(BASES, np.frombuffer(genome.encode('ascii'), dtype=np.uint8))
+
+    starts = rng.integers(0, len(genome), size=num_reads)
+    reads = codes[(starts[:, None] + np.arange(read_length)) % len(genome)]
+    if error_rate:
+        if exact_errors:
+            # the smallest random keys of every row pick distinct positions
+            per_read = int(round(error_rate * read_length))
+            positions = np.argsort(rng.random(reads.shape), axis=1)[:, :per_read]
+            errors = np.zeros(reads.shape, dtype=bool)
+            np.put_along_axis(errors, positions, True, axis=1)
+        else:
+            errors = rng.random(reads.shape) < error_rate
+        # adding 1..3 modulo 4 always gives another base
+        reads = np.where(errors, (reads + rng.integers(1, 4, size=reads.shape)) % 4, reads)
+
+    raw = BASES[reads].tobytes().decode('ascii')
+    return [raw[i * read_length:(i + 1) * read_length] for i in range(num_reads)]
+
+
+def kmer_composition(genome, k):
+    """Every k-mer of a circular genome once per occurrence, sorted like the k-mer composition datasets"""
+    circular = genome + genome[:k - 1]
+    return sorted(circular[i:i + k] for i in range(len(genome)))
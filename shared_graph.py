@@ -0,0 +1,95 @@
+# python3
+from multiprocessing import shared_memory
+
+import numpy as np
+
+'''
+Shared memory arena for the graph arrays => process pool workers read the graph without a copy.
+
+Pickling a graph into every task costs time and memory proportional to the graph in every worker.
+Instead the parent copies the arrays once into a single multiprocessing.shared_memory block
+    layout => (block name, {array name: (dtype, shape, byte offset)}), a few hundred bytes
+and only the layout goes into a task. A worker attaches to the block by name (an mmap, O(1)) and wraps
+read-only NumPy arrays around it, so its startup cost does not depend on the graph size.
+Workers never write into the arena, they send back small deltas (e.g. ids of the edges to delete)
+and the parent applies them to its own graph.
+
+A worker attaches once per process (attachments are cached by block name) and keeps the mapping until it exits,
+the parent unlinks the block when the arena is closed.
+'''
+
+ALIGNMENT = 64
+GRAPH_ARRAYS = ('sources', 'targets', 'coverage', 'lengths', 'out_offsets', 'in_offsets', 'in_edges',
+                'out_degree', 'in_degree', 'labels', 'sequence_offsets')
+
+
+class SharedArena(object):
+
+    def __init__(self, arrays):
+        """:param arrays: dict name => numpy array, copied into one shared memory block"""
+        fields, size = {}, 0
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            size = -(-size // ALIGNMENT) * ALIGNMENT
+            fields[name] = (array.dtype.str, array.shape, size)
+            size += array.nbytes
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name, array in arrays.items():
+            dtype, shape, offset = fields[name]
+            np.ndarray(shape, dtype, buffer=self.shm.buf, offset=offset)[...] = array
+        self.layout = (self.shm.name, fields)
+
+    @property
+    def nbytes(self):
+        return self.shm.size
+
+    def close(self):
+        """Release and remove the block, attached workers keep their mapping until they exit"""
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_attached = {}
+
+
+def attach(layout):
+    """:return dict name => read-only array over the arena of layout (no copy)"""
+    name, fields = layout
+    if name not in _attached:
+        shm = shared_memory.SharedMemory(name=name)
+        arrays = {}
+        for field, (dtype, shape, offset) in fields.items():
+            array = np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+            array.setflags(write=False)
+            arrays[field] = array
+        _attached.clear()  # a worker serves one arena at a time, drop the views of an older one
+        _attached[name] = (shm, arrays)
+    return _attached[name][1]
+
+
+def graph_arrays(graph):
+    """Arrays of a CSRGraph (node labels, unitig sequences, adjacency, coverage, degrees, deleted bitmap)"""
+    arrays = {name: getattr(graph, name) for name in GRAPH_ARRAYS if getattr(graph, name) is not None}
+    arrays['deleted'] = np.frombuffer(bytes(graph.deleted), dtype=np.uint8)
+    if graph.sequence_data is not None:
+        arrays['sequence_data'] = np.frombuffer(bytes(graph.sequence_data), dtype=np.uint8)
+    arrays['shape'] = np.array([graph.num_nodes, graph.num_edges], dtype=np.int64)
+    return arrays
+
+
+def graph_arena(graph, extra=None):
+    """
+    SharedArena holding graph (see graph_arrays)
+    :param extra: more arrays for the workers, e.g. a work partition
+    """
+    arrays = graph_arrays(graph)
+    arrays.update(extra or {})
+    return SharedArena(arrays)
+
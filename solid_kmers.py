@@ -0,0 +1,108 @@
+# python3
+import itertools
+
+import numpy as np
+
+from kmer_engine import packed_dtype
+
+'''
+Solid k-mer filter => two pass ingestion with a count-min sketch.
+
+With a 1% error rate almost every read carries up to k erroneous k-mers which occur once,
+they end up as tips and bubbles which the cleanup stages remove again.
+
+    pass 1 => every packed k-mer is added to a count-min sketch, depth rows of width counters,
+              row i counts the k-mer in column hash_i(kmer). Memory is fixed, whatever the number of k-mers
+    pass 2 => a k-mer goes into the graph only if its estimate min_i row_i[hash_i(kmer)] >= cutoff
+
+Collisions only add to a counter, so the estimate is never below the true count:
+a solid k-mer is never dropped, a few weak k-mers may get through and are left to the cleanup stages.
+k-mers longer than 32 bases are folded into 64 bit keys first, a shared key is one more collision.
+'''
+
+DEFAULT_SKETCH_WIDTH = 1 << 20
+DEFAULT_SKETCH_DEPTH = 4
+KMER_BATCH = 1 << 16  # packed k-mers hashed at a time
+# odd 64 bit multipliers, multiply-shift hashing (kmer * a) >> (64 - log2(width)) for each row
+_MULTIPLIERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93,
+                         0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53, 0x94D049BB133111EB, 0xBF58476D1CE4E5B9],
+                        dtype=np.uint64)
+
+
+class CountMinSketch(object):
+
+    def __init__(self, width=DEFAULT_SKETCH_WIDTH, depth=DEFAULT_SKETCH_DEPTH):
+        if width & (width - 1) or not 1 < width < 1 << 32:
+            raise ValueError('sketch width must be a power of two, got %d' % width)
+        if not 0 < depth <= len(_MULTIPLIERS):
+            raise ValueError('sketch depth must be between 1 and %d, got %d' % (len(_MULTIPLIERS), depth))
+        self.width, self.depth = width, depth
+        self.shift = np.uint64(64 - width.bit_length() + 1)
+        self.table = np.zeros((depth, width), dtype=np.uint32)
+
+    def _columns(self, kmers, row):
+        kmers = _sketch_keys(kmers)
+        return ((kmers * _MULTIPLIERS[row]) >> self.shift).astype(np.intp)
+
+    def add(self, kmers):
+        """Count every packed k-mer of an uint64 array"""
+        for row in range(self.depth):
+            self.table[row] += np.bincount(self._columns(kmers, row), minlength=self.width).astype(np.uint32)
+
+    def estimate(self, kmers):
+        """Upper bound of the number of times every packed k-mer was added"""
+        estimate = self.table[0][self._columns(kmers, 0)]
+        for row in range(1, self.depth):
+            np.minimum(estimate, self.table[row][self._columns(kmers, row)], out=estimate)
+        return estimate
+
+    def nbytes(self):
+        return self.table.nbytes
+
+
+def _fold(kmer):
+    key = 0
+    while kmer:
+        key ^= kmer & 0xFFFFFFFFFFFFFFFF
+        kmer >>= 64
+    return key
+
+
+def _sketch_keys(kmers):
+    """uint64 keys of packed k-mers, Python int k-mers (k > 32) xor-folded 64 bits at a time"""
+    if kmers.dtype != object:
+        return kmers
+    return np.fromiter(map(_fold, kmers), dtype=np.uint64, count=len(kmers))
+
+
+def kmer_batches(kmers, size=KMER_BATCH, k=None):
+    """Packed k-mers of a generator as uint64 arrays (object arrays for k > 32) of at most `size` k-mers"""
+    kmers = iter(kmers)
+    dtype = packed_dtype(k) if k else np.uint64
+    while True:
+        batch = np.fromiter(itertools.islice(kmers, size), dtype=dtype)
+        if not len(batch):
+            return
+        yield batch
+
+
+def solid_kmers(kmer_engine, reads, cutoff, width=DEFAULT_SKETCH_WIDTH, depth=DEFAULT_SKETCH_DEPTH):
+    """
+    Yield the packed k-mers of the reads whose sketch estimate is at least cutoff, every occurrence is yielded
+    so counting them still gives their coverage. `reads` is read twice, it must not be a one-shot generator.
+    """
+    sketch = CountMinSketch(width, depth)
+    for batch in kmer_batches(kmer_engine.reads_to_kmers(reads), k=kmer_engine.k):
+        sketch.add(batch)
+
+    for batch in kmer_batches(kmer_engine.reads_to_kmers(reads), k=kmer_engine.k):
+        for kmer in batch[sketch.estimate(batch) >= cutoff].tolist():
+            yield kmer
+
+
+def min_coverage_from_argv(argv):
+    """Solid k-mer cutoff given as --min-coverage=N, None (every k-mer is kept) if there is none"""
+    for arg in argv:
+        if arg.startswith('--min-coverage='):
+            return int(arg.split('=', 1)[1])
+    return None
@@ -0,0 +1,91 @@
+# python3
+import numpy as np
+
+from overlap_adjacency import OverlapAdjacency
+
+'''
+Transitive reduction of an overlap graph into a string graph (Myers 2005).
+
+An overlap a -> b of length o places b shift(a, b) = len(a) - o bases after a.
+If a -> b -> c and a -> c all exist with shift(a, b) + shift(b, c) == shift(a, c), the edge a -> c says nothing
+the path through b doesn't => it is transitive. At coverage c every read overlaps ~c others, but only the edges
+to the next read(s) are irreducible, so the string graph has O(reads) edges instead of O(reads * c).
+
+For every read v with at least two neighbours (on the packed arrays, a batch of two-edge paths at a time):
+    1. every neighbour w of v is in play, with its shift
+    2. every path v -> w -> x with shift(v, w) + shift(w, x) <= longest shift of v + fuzz:
+           v -> x exists and the shifts agree up to fuzz => v -> x is transitive, eliminate it
+    3. keep the edges to neighbours still in play
+Adjacency lists are sorted longest overlap first, i.e. by increasing shift, so the paths through w are a prefix
+of the list of w (np.searchsorted) instead of all of it.
+The shift check (instead of Myers' plain length bound) keeps an edge whose path through w lands on another
+copy of a repeat.
+'''
+
+DEFAULT_FUZZ = 0  # shifts agree exactly for exact overlaps, substitution errors don't move them either
+PATH_BATCH = 1 << 20  # two-edge paths checked at a time
+
+
+def irreducible_edges(adj, lengths, fuzz=DEFAULT_FUZZ):
+    """
+    :param adj: OverlapAdjacency, edges of a read longest overlap first
+    :param lengths: read lengths
+    :return bool mask over adj.edges, True for the edges not implied by a path of two other edges
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    sources, targets = adj.sources(), adj.edges['target'].astype(np.int64)
+    shifts = lengths[sources] - adj.edges['overlap']
+    eliminated = np.zeros(adj.num_edges, dtype=bool)
+    if not adj.num_edges:
+        return ~eliminated
+
+    degrees = np.diff(adj.offsets)
+    longest = np.zeros(len(adj), dtype=np.int64)
+    longest[degrees > 0] = shifts[adj.offsets[1:][degrees > 0] - 1]
+    # edges sorted by (source, shift) => key source * width + shift is sorted too
+    width = int(max(shifts.max(), 0)) + 1
+    shift_keys = sources * width + shifts
+    # edges sorted by (source, target) to find v -> x
+    by_pair = np.argsort(sources * len(adj) + targets, kind='stable')
+    pair_keys = (sources * len(adj) + targets)[by_pair]
+
+    # paths v -> w -> x start at an edge v -> w of a read v with two neighbours or more
+    first = np.flatnonzero(degrees[sources] > 1)
+    w = targets[first]
+    bound = np.clip(longest[sources[first]] + fuzz - shifts[first], -1, width - 1)
+    starts = adj.offsets[w]
+    counts = np.maximum(np.searchsorted(shift_keys, w * width + bound, side='right') - starts, 0)
+
+    totals = np.cumsum(counts)
+    lo = 0
+    while lo < len(first):
+        done = totals[lo - 1] if lo else 0
+        hi = max(int(np.searchsorted(totals, done + PATH_BATCH, side='right')), lo + 1)
+        batch = counts[lo:hi]
+        if batch.sum():
+            ends = np.cumsum(batch)
+            second = np.repeat(starts[lo:hi] - ends + batch, batch) + np.arange(ends[-1])
+            edge = np.repeat(first[lo:hi], batch)
+            keys = sources[edge] * len(adj) + targets[second]
+            found = np.minimum(np.searchsorted(pair_keys, keys), len(pair_keys) - 1)
+            direct = by_pair[found]
+            agree = np.abs(shifts[direct] - shifts[edge] - shifts[second]) <= fuzz
+            transitive = (pair_keys[found] == keys) & agree
+            eliminated[direct[transitive]] = True
+        lo = hi
+    return ~eliminated
+
+
+def transitive_reduction(adj, lengths, fuzz=DEFAULT_FUZZ):
+    """:return OverlapAdjacency with only the irreducible edges of adj, in the same order (adj is not modified)"""
+    if not isinstance(adj, OverlapAdjacency):
+        adj = OverlapAdjacency.from_lists(adj)
+    keep = irreducible_edges(adj, lengths, fuzz)
+    offsets = np.zeros_like(adj.offsets)
+    np.cumsum(np.bincount(adj.sources()[keep], minlength=len(adj)), out=offsets[1:])
+    return OverlapAdjacency(offsets, adj.edges[keep])
+
+
+def string_graph(adj, reads, fuzz=DEFAULT_FUZZ):
+    """:return the transitively reduced overlap graph as an OverlapAdjacency"""
+    return transitive_reduction(adj, [len(read) for read in reads], fuzz)
@@ -0,0 +1,67 @@
+# python3
+import itertools
+import random
+
+import pytest
+
+from bubble_detection import bubble_detection
+from read_simulator import random_genome, simulate_reads
+
+'''
+count_bubbles => one bubble per pair of simple paths V -> W of at most threshold k-mers sharing only V and W
+'''
+
+
+def brute_force_bubbles(k, threshold, reads):
+    """Every simple path from every branching node, every pair of them checked"""
+    graph = {}
+    for read in reads:
+        for i in range(len(read) - k + 1):
+            left, right = read[i:i + k - 1], read[i + 1:i + k]
+            if left != right:
+                graph.setdefault(left, set()).add(right)
+                graph.setdefault(right, set())
+    in_degree = {node: sum(node in targets for targets in graph.values()) for node in graph}
+
+    def paths_from(path):
+        if len(path) > 1 and in_degree[path[-1]] > 1:
+            yield path
+        if len(path) <= threshold:
+            for target in graph[path[-1]]:
+                if target not in path:
+                    yield from paths_from(path + [target])
+
+    bubbles = 0
+    for source in graph:
+        if len(graph[source]) > 1:
+            paths = sorted(paths_from([source]), key=lambda path: path[-1])
+            for _, ending in itertools.groupby(paths, key=lambda path: path[-1]):
+                bubbles += sum(len(set(a) & set(b)) == 2 for a, b in itertools.combinations(list(ending), 2))
+    return bubbles
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_small_random_graphs_match_brute_force(seed):
+    rng = random.Random(seed)
+    genome = random_genome(rng.randint(30, 80), seed=seed)
+    reads = [genome] + [''.join(base if rng.random() > 0.05 else rng.choice('ACGT') for base in genome)
+                        for _ in range(rng.randint(1, 4))]
+    k, threshold = rng.randint(3, 6), rng.randint(2, 8)
+    expected = brute_force_bubbles(k, threshold, reads)
+    assert bubble_detection(k, threshold, reads, max_visited=10 ** 6).count_bubbles() == expected
+
+
+def test_substitution_makes_one_bubble_of_k_kmers():
+    genome = random_genome(60, seed=1)
+    variant = genome[:30] + ('A' if genome[30] != 'A' else 'C') + genome[31:]
+    assert bubble_detection(9, 20, [genome]).count_bubbles() == 0
+    assert bubble_detection(9, 20, [genome, variant]).count_bubbles() == 1
+    assert bubble_detection(9, 8, [genome, variant]).count_bubbles() == 0  # both paths are 9 k-mers long
+
+
+def test_bubbles_of_simulated_reads_match_brute_force():
+    reads = simulate_reads(random_genome(1000, seed=0), 100, 30, 0.01, seed=2, exact_errors=True)
+    expected = brute_force_bubbles(15, 16, reads)
+    assert expected > 0
+    assert bubble_detection(15, 16, reads).count_bubbles() == expected
+    assert bubble_detection(15, 16, iter(reads), bulk=True).count_bubbles() == expected
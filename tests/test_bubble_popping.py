@@ -0,0 +1,45 @@
+# python3
+from bubble_popping import count_bubbles, find_bubbles, pop_bubbles
+from compaction import compact_graph
+from components import parallel_pop_bubbles
+from csr_graph import CSRGraph
+from kmer_engine import KmerEngine, count_packed_kmers
+from read_simulator import random_genome, simulate_reads
+
+
+def test_later_shorter_path_is_relaxed():
+    # S -> W (15 k-mers), S -> X -> W (1 + 1), W -> Z (5), S -> Y -> Z (1 + 5)
+    S, W, X, Y, Z = range(5)
+    graph = CSRGraph(5, [S, S, X, W, S, Y], [W, X, W, Z, Y, Z], lengths=[15, 1, 1, 5, 1, 5])
+    bubbles = {(tuple(graph.targets[path].tolist()), tuple(graph.targets[other].tolist()))
+               for path, other in find_bubbles(graph, S, threshold=16)}
+    # the (S, Z)-bubble is only within 16 k-mers through the shorter path to W
+    assert bubbles == {((X, W), (W,)), ((Y, Z), (X, W, Z))}
+
+
+def test_compaction_does_not_change_the_bubbles():
+    reads = simulate_reads(random_genome(5386, seed=2), 100, 15, 0.01, seed=3, exact_errors=True)
+    graph = CSRGraph.from_kmer_counts(*count_packed_kmers(KmerEngine(15).reads_to_kmers(reads)), 15)
+    unitigs = compact_graph(graph)
+    assert unitigs.num_edges < graph.num_edges
+    assert count_bubbles(graph, 16) == count_bubbles(unitigs, 16) == 669
+    # nearest bubbles are popped first on both => the same k-mers are removed
+    assert pop_bubbles(graph, 16) == pop_bubbles(unitigs, 16) == 581
+
+
+def test_edges_removed_counts_kmers():
+    reads = simulate_reads(random_genome(5386, seed=2), 100, 15, 0.01, seed=3, exact_errors=True)
+    graph = CSRGraph.from_kmer_counts(*count_packed_kmers(KmerEngine(15).reads_to_kmers(reads)), 15)
+    unitigs = compact_graph(graph)
+    kmer_counters, unitig_counters = {}, {}
+    pop_bubbles(graph, 16, counters=kmer_counters)
+    pop_bubbles(unitigs, 16, counters=unitig_counters)
+    assert kmer_counters['edges_removed'] == unitig_counters['edges_removed']
+
+
+def test_region_workers_pop_the_serial_bubbles():
+    reads = simulate_reads(random_genome(5386, seed=2), 100, 15, 0.01, seed=3, exact_errors=True)
+    counts = count_packed_kmers(KmerEngine(15).reads_to_kmers(reads))
+    serial, regions = (compact_graph(CSRGraph.from_kmer_counts(*counts, 15)) for _ in range(2))
+    assert pop_bubbles(serial, 16) == parallel_pop_bubbles(regions, 16, workers=2)
+    assert (serial.live_edges() == regions.live_edges()).all()
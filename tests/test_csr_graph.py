@@ -0,0 +1,43 @@
+# python3
+import numpy as np
+
+from csr_graph import CSRGraph
+
+ARRAYS = ('sources', 'targets', 'coverage', 'lengths', 'out_offsets', 'in_offsets', 'in_edges', 'out_degree',
+          'in_degree', 'labels')
+
+
+def random_edges(rng, num_nodes, count, exclude=()):
+    pairs = {(int(a), int(b)) for a, b in zip(rng.integers(0, num_nodes, count), rng.integers(0, num_nodes, count))}
+    pairs = sorted(pairs - set(exclude))
+    return [a for a, _ in pairs], [b for _, b in pairs]
+
+
+def test_inserted_edges_match_a_graph_built_with_them():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        sources, targets = random_edges(rng, 20, 40)
+        coverage = rng.integers(1, 9, len(sources))
+        graph = CSRGraph(20, sources, targets, coverage, labels=np.arange(20, dtype=np.uint64) * 7)
+        for edge in rng.integers(0, len(sources), 10).tolist():
+            graph.remove_edge(edge)
+        deleted = {(int(graph.sources[edge]), int(graph.targets[edge]))
+                   for edge in range(len(graph.targets)) if graph.is_deleted(edge)}
+
+        new_sources, new_targets = random_edges(rng, 23, 15, exclude=zip(sources, targets))
+        new_coverage = rng.integers(1, 9, len(new_sources))
+        old_ids, new_ids = graph.insert_edges(new_sources, new_targets, new_coverage,
+                                              np.arange(20, 23, dtype=np.uint64) * 7)
+
+        expected = CSRGraph(23, sources + new_sources, targets + new_targets,
+                            np.concatenate((coverage, new_coverage)), labels=np.arange(23, dtype=np.uint64) * 7)
+        for edge in range(len(expected.targets)):
+            if (int(expected.sources[edge]), int(expected.targets[edge])) in deleted:
+                expected.remove_edge(edge)
+        for name in ARRAYS:
+            assert np.array_equal(getattr(graph, name), getattr(expected, name))
+            assert getattr(graph, name).dtype == getattr(expected, name).dtype
+        assert bytes(graph.deleted) == bytes(expected.deleted)
+        assert (graph.num_nodes, graph.num_edges) == (expected.num_nodes, expected.num_edges)
+        assert graph.sources[new_ids].tolist() == new_sources and graph.targets[new_ids].tolist() == new_targets
+        assert len(old_ids) == len(sources) and (np.diff(old_ids) > 0).all()
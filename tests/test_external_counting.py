@@ -0,0 +1,44 @@
+# python3
+import os
+
+import pytest
+
+import external_counting
+from external_counting import PARTITION_BITS, count_kmers_external, iter_partition_counts
+from kmer_engine import KmerEngine, count_packed_kmers
+from read_simulator import random_genome, simulate_reads
+
+K = 15
+
+
+def serial_counts(reads, k):
+    kmers, counts = count_packed_kmers(KmerEngine(k).reads_to_kmers(reads))
+    return kmers.tolist(), counts.tolist()
+
+
+@pytest.mark.parametrize('memory_budget', [1 << 12, 1 << 16, 1 << 30])
+def test_external_counts_match_serial_counts(tmp_path, memory_budget):
+    reads = simulate_reads(random_genome(3000, seed=1), 100, 10, 0.01, seed=2, exact_errors=True)
+    kmers, counts = count_kmers_external(reads, K, memory_budget, directory=str(tmp_path))
+    assert (kmers.tolist(), counts.tolist()) == serial_counts(reads, K)
+    assert not os.listdir(str(tmp_path))  # partition files are removed
+
+
+def test_oversized_partitions_are_split(tmp_path, monkeypatch):
+    # low complexity reads all fall into the AAA.. partition, only splitting it keeps it within the budget
+    reads = ['A' * 60 + read for read in simulate_reads(random_genome(2000, seed=3), 100, 5, seed=4)]
+    spilled = []
+    count_partition = external_counting._count_partition
+
+    def counting(path, k, used_bits, memory_budget):
+        spilled.append(used_bits)
+        return count_partition(path, k, used_bits, memory_budget)
+
+    monkeypatch.setattr(external_counting, '_count_partition', counting)
+    partitions = list(iter_partition_counts(reads, K, 1 << 12, directory=str(tmp_path)))
+    assert max(spilled) > PARTITION_BITS
+    assert len(partitions) > 1 << PARTITION_BITS
+    assert all(a[0][-1] < b[0][0] for a, b in zip(partitions, partitions[1:]) if len(a[0]) and len(b[0]))
+
+    kmers, counts = count_kmers_external(reads, K, 1 << 12, directory=str(tmp_path))
+    assert (kmers.tolist(), counts.tolist()) == serial_counts(reads, K)
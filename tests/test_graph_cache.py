@@ -0,0 +1,16 @@
+# python3
+from phiX174_error_prone import DeBruijnGraph
+from read_simulator import random_genome, simulate_reads
+
+
+def test_cutoff_graphs_are_cached_per_counting_mode(tmp_path):
+    reads = simulate_reads(random_genome(2000, seed=5), 100, 20, 0.01, seed=6, exact_errors=True)
+    sketch = DeBruijnGraph(20, reads, min_coverage=3, cache_dir=str(tmp_path)).de_bruijn_graph
+    exact = DeBruijnGraph(20, reads, bulk=True, min_coverage=3, cache_dir=str(tmp_path)).de_bruijn_graph
+    assert sorted(path.name.split('-', 1)[1] for path in tmp_path.iterdir()) == ['k20-c3-exact', 'k20-c3-sketch']
+
+    # a later run gets the graph of its own counting mode back
+    cached = DeBruijnGraph(20, reads, bulk=True, min_coverage=3, cache_dir=str(tmp_path)).de_bruijn_graph
+    assert cached.num_edges == exact.num_edges
+    cached = DeBruijnGraph(20, reads, min_coverage=3, cache_dir=str(tmp_path)).de_bruijn_graph
+    assert cached.num_edges == sketch.num_edges
@@ -0,0 +1,69 @@
+# python3
+import random
+
+from csr_graph import CSRGraph
+from hierholzer import eulerian_cycle, path_nodes
+
+
+def assert_eulerian_walk(graph, walk, closed=True):
+    live = [edge for edge in range(len(graph.targets)) if not graph.is_deleted(edge)]
+    assert sorted(walk) == live  # every live edge exactly once
+    for edge, next_edge in zip(walk, walk[1:]):
+        assert graph.targets[edge] == graph.sources[next_edge]
+    if closed:
+        assert graph.targets[walk[-1]] == graph.sources[walk[0]]
+
+
+def graph_of_cycles(num_nodes, cycles):
+    sources, targets = [], []
+    for cycle in cycles:
+        sources.extend(cycle)
+        targets.extend(cycle[1:] + cycle[:1])
+    return CSRGraph(num_nodes, sources, targets)
+
+
+def test_cycles_sharing_nodes_are_spliced_into_one():
+    # 0 -> 1 -> 2 -> 0, 1 -> 3 -> 4 -> 1, 2 -> 5 -> 2, 4 -> 6 -> 4 => several sub-tours to splice in
+    graph = graph_of_cycles(7, [[0, 1, 2], [1, 3, 4], [2, 5], [4, 6]])
+    walk = eulerian_cycle(graph, start=0)
+    assert_eulerian_walk(graph, walk)
+    nodes = path_nodes(graph, walk)
+    assert len(walk) == 10 and nodes[0] == nodes[-1] == 0
+
+
+def test_random_unions_of_cycles():
+    rng = random.Random(1)
+    for _ in range(50):
+        num_nodes = rng.randint(2, 30)
+        cycles = [[0] + rng.sample(range(1, num_nodes), rng.randint(1, num_nodes - 1))]
+        for _ in range(rng.randint(1, 20)):
+            # every new cycle goes through a node with edges, so the graph stays connected
+            anchor = rng.choice([node for cycle in cycles for node in cycle])
+            others = rng.sample([node for node in range(num_nodes) if node != anchor], rng.randint(1, num_nodes - 1))
+            cycles.append([anchor] + others)
+        graph = graph_of_cycles(num_nodes, cycles)
+        assert_eulerian_walk(graph, eulerian_cycle(graph))
+
+
+def test_deleted_edges_are_skipped():
+    graph = graph_of_cycles(5, [[0, 1, 2], [1, 3], [2, 4]])
+    for edge in range(len(graph.targets)):
+        if graph.sources[edge] == 3 or graph.targets[edge] == 3:
+            graph.remove_edge(edge)
+    assert_eulerian_walk(graph, eulerian_cycle(graph))
+
+
+def test_eulerian_path_starts_at_the_unbalanced_node():
+    # 3 -> 0 -> 1 -> 2 -> 0 -> 4, nodes 3 and 4 are the ends
+    graph = CSRGraph(5, [3, 0, 1, 2, 0], [0, 1, 2, 0, 4])
+    walk = eulerian_cycle(graph)
+    assert_eulerian_walk(graph, walk, closed=False)
+    assert path_nodes(graph, walk) == [3, 0, 1, 2, 0, 4]
+
+
+def test_long_cycle_with_many_loops():
+    # a cycle of 200000 nodes with a self contained loop at every 10th node, walked without recursion
+    num_nodes = 200000
+    cycles = [list(range(num_nodes))] + [[node, num_nodes + node // 10] for node in range(0, num_nodes, 10)]
+    graph = graph_of_cycles(num_nodes + num_nodes // 10, cycles)
+    assert_eulerian_walk(graph, eulerian_cycle(graph, start=0))
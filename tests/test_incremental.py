@@ -0,0 +1,22 @@
+# python3
+import numpy as np
+
+from incremental import IncrementalAssembler
+from read_simulator import random_genome, simulate_reads
+
+
+def test_batches_assemble_the_genome():
+    genome = random_genome(5386, seed=1)
+    reads = simulate_reads(genome, 100, 20, 0.01, seed=2, exact_errors=True)
+    assembler = IncrementalAssembler(20, reads[:len(reads) // 2])
+    for start in range(len(reads) // 2, len(reads), 150):
+        assert assembler.add_reads(reads[start:start + 150]) > 0
+
+    # node and edge lookups follow the inserted nodes and the renumbered edges
+    graph = assembler.de_bruijn_graph
+    assert assembler.nodes.find(graph.labels)[0].tolist() == list(range(graph.num_nodes))
+    edges, known = assembler.edges.find(assembler.edge_kmers(graph.sources, graph.targets))
+    assert known.all() and (edges == np.arange(len(graph.targets))).all()
+
+    assembled = assembler.assemble()
+    assert len(assembled) == len(genome) and assembled in genome + genome
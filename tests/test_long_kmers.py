@@ -0,0 +1,64 @@
+# python3
+import pytest
+
+from csr_graph import CSRGraph
+from graph_cache import load_graph, save_graph
+from kmer_engine import KmerEngine, count_packed_kmers, decode
+from phiX174_error_prone import PhiX174GenomeAssembler
+from phiX174_kmer_composition import EulerianCycle, GenomeAssembly_k_mer_composition
+from read_simulator import kmer_composition, random_genome, simulate_reads
+from tip_removal import remove_tip
+
+'''
+k > 32 => packed k-mers no longer fit in an uint64, labels are kept as Python ints (object arrays)
+'''
+
+K = 40
+
+
+def test_graph_of_40_mers_matches_string_graph():
+    reads = simulate_reads(random_genome(2000, seed=3), coverage=10, error_rate=0.01, seed=4, exact_errors=True)
+    kmers, counts = count_packed_kmers(KmerEngine(K).reads_to_kmers(reads))
+    graph = CSRGraph.from_kmer_counts(kmers, counts, K)
+
+    expected = set()
+    for read in reads:
+        for i in range(len(read) - K + 1):
+            if read[i:i + K - 1] != read[i + 1:i + K]:
+                expected.add((read[i:i + K - 1], read[i + 1:i + K]))
+    edges = {(decode(int(graph.labels[source]), K - 1), decode(int(graph.labels[target]), K - 1))
+             for source, target in zip(graph.sources.tolist(), graph.targets.tolist())}
+    assert edges == expected
+
+
+def test_40_mer_composition_assembles_the_genome():
+    genome = random_genome(3000, seed=9)
+    graph = GenomeAssembly_k_mer_composition.de_brujin(K, kmer_composition(genome, K))
+    path = EulerianCycle(graph).build_eulerian_cycle()
+    assembled = GenomeAssembly_k_mer_composition.reconstruct_from_path(path, graph.labels, K)[:-K + 1]
+    assert len(assembled) == len(genome) and assembled in genome + genome
+
+
+def test_tip_removal_with_40_mers_and_cache(tmp_path):
+    reads = simulate_reads(random_genome(3000, seed=1), coverage=10, error_rate=0.01, seed=2, exact_errors=True)
+    removed = remove_tip(K, reads).remove_tips()
+    assert removed > 0
+    assert remove_tip(K, reads, cache_dir=str(tmp_path)).remove_tips() == removed
+    assert remove_tip(K, reads, cache_dir=str(tmp_path)).remove_tips() == removed  # memory-mapped this time
+
+
+def test_labels_of_40_mers_survive_the_cache(tmp_path):
+    reads = simulate_reads(random_genome(1000, seed=5), coverage=5, seed=6)
+    graph = CSRGraph.from_kmer_counts(*count_packed_kmers(KmerEngine(K).reads_to_kmers(reads)), K)
+    save_graph(graph, str(tmp_path / 'graph'))
+    assert load_graph(str(tmp_path / 'graph')).labels.tolist() == graph.labels.tolist()
+
+
+@pytest.mark.parametrize('options', [{}, {'bulk': True}, {'min_coverage': 2}, {'workers': 2}])
+def test_assembler_with_40_mers(options):
+    genome = random_genome(3000, seed=11)
+    reads = simulate_reads(genome, coverage=30, error_rate=0.01, seed=12, exact_errors=True)
+    assembler = PhiX174GenomeAssembler(K, reads, **options)
+    assembled = assembler.assemble_genome()
+    assert len(assembled) == len(genome) and assembled in genome + genome
+    assert assembler.node_index is None
@@ -0,0 +1,24 @@
+# python3
+import numpy as np
+
+from node_index import NodeIndex
+from phiX174_error_prone import DeBruijnGraph
+from read_simulator import random_genome, simulate_reads
+
+
+def test_get_matches_lookup():
+    keys = np.unique(np.random.default_rng(1).integers(0, 1 << 40, 20000, dtype=np.uint64))
+    index = NodeIndex(keys)
+    ids = index.lookup(keys)
+    assert sorted(ids.tolist()) == list(range(len(keys)))
+    assert [index.get(key) for key in keys.tolist()] == ids.tolist()
+    assert index.get(1 << 41) is None and (1 << 41) not in index
+
+
+def test_assembler_index_matches_its_graph():
+    reads = simulate_reads(random_genome(2000, seed=3), coverage=10, error_rate=0.01, seed=4, exact_errors=True)
+    graph = DeBruijnGraph(15, reads)
+    ids = graph.node_index.lookup(graph.de_bruijn_graph.labels)
+    assert ids.tolist() == list(range(graph.de_bruijn_graph.num_nodes))
+    graph.compact()
+    assert graph.node_index is None  # compaction renumbers the nodes
@@ -0,0 +1,30 @@
+# python3
+import pytest
+
+from optimal_k import find_optimal_k
+from read_simulator import random_genome, simulate_reads
+
+
+def is_optimal(k, reads):
+    """The original search => k-mer, prefix and suffix sets rebuilt from the reads for every k"""
+    kmers = {read[i:i + k] for read in reads for i in range(len(read) - k + 1)}
+    return {kmer[:-1] for kmer in kmers} == {kmer[1:] for kmer in kmers}
+
+
+@pytest.mark.parametrize('genome_length, read_length, coverage, seed',
+                         [(400, 30, 10, 1), (400, 30, 3, 2), (1000, 50, 8, 3), (2000, 100, 20, 4), (60, 12, 1, 5)])
+def test_balance_of_every_k_matches_the_original_search(genome_length, read_length, coverage, seed):
+    reads = simulate_reads(random_genome(genome_length, seed=seed), read_length, coverage, seed=seed + 10)
+    optimal_k, balance = find_optimal_k(reads, report=True)
+    assert balance == {k: is_optimal(k, reads) for k in range(read_length, 1, -1)}
+    assert optimal_k == next((k for k in range(read_length, 1, -1) if is_optimal(k, reads)), None)
+    assert find_optimal_k(iter(reads)) == optimal_k
+
+
+def test_reads_of_different_lengths():
+    genome = random_genome(300, seed=6)
+    reads = [genome[start:start + length] for start, length in [(0, 40), (30, 25), (50, 60), (100, 90), (160, 140),
+                                                                 (290, 10)]]
+    optimal_k, balance = find_optimal_k(reads, report=True)
+    assert balance == {k: is_optimal(k, reads) for k in range(140, 1, -1)}
+    assert optimal_k is not None
@@ -0,0 +1,31 @@
+# python3
+import os
+import subprocess
+import sys
+
+import pytest
+
+from approximate_overlaps import tolerant_suffix_prefix_overlap
+from read_simulator import random_genome, simulate_reads
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_tolerant_overlap_below_the_minimum_length():
+    genome = random_genome(300, seed=1)
+    first, second = genome[:100], genome[32:132]
+    second = second[:10] + ('A' if second[10] != 'A' else 'C') + second[11:]
+    assert tolerant_suffix_prefix_overlap(first, second) == 68
+    assert tolerant_suffix_prefix_overlap(first, second, max_mismatch_rate=0) < 68
+
+
+@pytest.mark.parametrize('genome_length, seed', [(5386, 1), (5386, 3), (20000, 1)])
+def test_reads_with_errors_assemble_to_the_genome_length(tmp_path, genome_length, seed):
+    genome = random_genome(genome_length, seed=seed)
+    reads = simulate_reads(genome, 100, 20, 0.01, seed=seed + 10, exact_errors=True)
+    path = tmp_path / 'reads.txt'
+    path.write_text('\n'.join(reads) + '\n')
+
+    output = subprocess.run([sys.executable, os.path.join(REPOSITORY, 'overlap_graph.py'), '--errors', str(path)],
+                            capture_output=True, text=True, check=True).stdout
+    assert len(output.strip()) == genome_length
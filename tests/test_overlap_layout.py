@@ -0,0 +1,32 @@
+# python3
+import random
+
+import overlap_layout
+from overlap_layout import layout_path, suffix_prefix_overlap
+from read_simulator import random_genome
+
+
+def brute_force_overlap(s, t):
+    return max((n for n in range(1, min(len(s), len(t))) if s[-n:] == t[:n]), default=0)
+
+
+def test_overlap_is_always_a_matching_suffix_and_prefix():
+    assert suffix_prefix_overlap('ACAC', 'ACAC') == 2  # not 3, 'CAC' != 'ACA'
+    assert suffix_prefix_overlap('GACAC', 'ACAC') == 2
+    assert suffix_prefix_overlap('ACGT', 'ACGT') == 0
+    rng = random.Random(1)
+    for _ in range(2000):
+        s, t = (''.join(rng.choice('AC') for _ in range(rng.randint(0, 8))) for _ in range(2))
+        assert suffix_prefix_overlap(s, t) == brute_force_overlap(s, t)
+
+
+def test_chains_past_the_cap_are_joined_by_their_overlaps(monkeypatch):
+    monkeypatch.setattr(overlap_layout, 'MAX_ORDERED_CHAINS', 4)
+    genome = random_genome(3000, seed=4)
+    reads = [genome[start:start + 100] for start in range(0, len(genome) - 99, 40)]
+    random.Random(5).shuffle(reads)
+
+    path = layout_path([[] for _ in reads], reads)  # no overlaps known => one chain per read
+    assert sorted(read for read, _ in path) == list(range(len(reads)))
+    assert [length for _, length in path[1:]] == [60] * (len(reads) - 1)
+    assert ''.join(reads[read][length:] for read, length in path) == genome[:len(reads) * 40 + 60]
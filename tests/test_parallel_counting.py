@@ -0,0 +1,22 @@
+# python3
+from kmer_engine import count_kmers_bulk
+from parallel_counting import MIN_CHUNK_SIZE, STREAM_CHUNK_SIZE, _chunks, chunk_size_for, count_kmers_parallel
+from read_simulator import random_genome, simulate_reads
+
+K = 15
+
+
+def test_chunks_are_sized_for_the_workers():
+    reads = ['ACGT'] * 10000
+    assert len(list(_chunks(reads, chunk_size_for(reads, 2)))) == 8
+    assert chunk_size_for(reads[:100], 2) == MIN_CHUNK_SIZE
+    assert chunk_size_for(iter(reads), 2) == STREAM_CHUNK_SIZE
+
+
+def test_two_workers_count_like_one():
+    reads = simulate_reads(random_genome(5000, seed=1), 100, 30, 0.01, seed=2, exact_errors=True)
+    assert len(list(_chunks(reads, chunk_size_for(reads, 2)))) > 1
+    kmers, counts = count_kmers_bulk(reads, K)
+    for counted in (count_kmers_parallel(reads, K, workers=2),
+                    count_kmers_parallel(iter(reads), K, workers=2, chunk_size=100)):
+        assert counted[0].tolist() == kmers.tolist() and counted[1].tolist() == counts.tolist()
@@ -0,0 +1,31 @@
+# python3
+import numpy as np
+
+from read_correction import DEFAULT_CUTOFF, correct_reads, spectrum_cutoff
+from read_simulator import random_genome, simulate_reads
+
+
+def spectrum(histogram):
+    """counts array whose histogram is histogram[count] for count = 1, 2 ..."""
+    return np.repeat(np.arange(1, len(histogram) + 1), histogram)
+
+
+def test_cutoff_past_the_valley():
+    assert spectrum_cutoff(spectrum([500, 80, 20, 30, 60, 90, 60, 20])) == 4
+    assert spectrum_cutoff(spectrum([500, 80, 20, 30, 60, 90, 60, 20]), default=6) == 6  # floor
+
+
+def test_spectrum_without_a_valley():
+    flat = spectrum([40] * 10)
+    decreasing = spectrum([400, 200, 100, 50, 20, 5])
+    assert spectrum_cutoff(flat) == spectrum_cutoff(decreasing) == DEFAULT_CUTOFF
+    assert spectrum_cutoff(flat, default=5) == spectrum_cutoff(decreasing, default=5) == 5
+    # error free reads => a single peak at the coverage, the histogram rises from count 1 on
+    assert spectrum_cutoff(spectrum([1, 5, 20, 60, 90, 60, 20]), default=3) == 3
+
+
+def test_reads_with_one_error_are_corrected():
+    genome = random_genome(3000, seed=1)
+    reads = simulate_reads(genome, 100, 30, 0.01, seed=2, exact_errors=True)
+    assert not any(read in genome for read in reads)
+    assert sum(read in genome for read in correct_reads(reads, 20)) > 0.9 * len(reads)
@@ -0,0 +1,39 @@
+# python3
+import gzip
+import io
+
+import pytest
+
+from read_io import iter_reads
+
+READS = ['ACGTACGTAA', 'TTGCAGGCAT', 'GGGACCTTAC']
+
+FORMATS = {
+    'plain': ''.join(read + '\n' for read in READS),
+    'fasta': ''.join('>read%d description\n%s\n%s\n' % (i, read[:4], read[4:]) for i, read in enumerate(READS)),
+    'fastq': ''.join('@read%d\n%s\n+\n%s\n\n' % (i, read, 'I' * len(read)) for i, read in enumerate(READS)),
+}
+
+
+@pytest.mark.parametrize('name', sorted(FORMATS))
+@pytest.mark.parametrize('compress', [False, True])
+def test_files(tmp_path, name, compress):
+    path = tmp_path / ('reads.%s%s' % (name, '.gz' if compress else ''))
+    data = FORMATS[name].encode('ascii')
+    path.write_bytes(gzip.compress(data) if compress else data)
+    assert list(iter_reads(str(path))) == READS
+
+
+@pytest.mark.parametrize('name', sorted(FORMATS))
+def test_open_streams(tmp_path, name):
+    assert list(iter_reads(io.StringIO('\n' + FORMATS[name]))) == READS
+    assert list(iter_reads(io.BytesIO(FORMATS[name].encode('ascii')))) == READS
+    path = tmp_path / 'reads.txt'
+    path.write_text(FORMATS[name])
+    with open(str(path)) as handle:  # text file => read through its binary buffer
+        assert list(iter_reads(handle)) == READS
+
+
+def test_whitespace_separated_reads_on_one_line():
+    assert list(iter_reads(io.StringIO(' '.join(READS)))) == READS
+    assert list(iter_reads(io.StringIO(''))) == []
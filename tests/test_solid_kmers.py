@@ -0,0 +1,52 @@
+# python3
+import numpy as np
+
+from kmer_engine import KmerEngine, count_packed_kmers
+from phiX174_error_prone import DeBruijnGraph
+from read_simulator import random_genome, simulate_reads
+from solid_kmers import CountMinSketch, solid_kmers
+
+K = 15
+
+
+def test_sketch_never_underestimates():
+    rng = np.random.default_rng(1)
+    kmers = rng.integers(0, 1 << 30, 20000, dtype=np.uint64)
+    kmers = np.concatenate((kmers, kmers[:5000], kmers[:100]))  # some k-mers seen 2 and 3 times
+    sketch = CountMinSketch(width=1 << 10, depth=3)  # far fewer counters than k-mers => collisions
+    sketch.add(kmers)
+
+    distinct, counts = np.unique(kmers, return_counts=True)
+    estimates = sketch.estimate(distinct)
+    assert (estimates >= counts).all()
+    assert (estimates > counts).any()
+
+
+def test_sketch_of_long_kmers_never_underestimates():
+    kmers = np.array([(1 << 70) + i * (1 << 64) + i for i in range(3000)] * 2 + [5], dtype=object)
+    sketch = CountMinSketch(width=1 << 8, depth=2)
+    sketch.add(kmers)
+    assert (sketch.estimate(kmers[:3000]) >= 2).all()
+
+
+def test_solid_kmers_keep_every_occurrence_of_the_kmers_at_the_cutoff():
+    reads = simulate_reads(random_genome(3000, seed=1), 100, 10, 0.01, seed=2, exact_errors=True)
+    engine = KmerEngine(K)
+    kmers, counts = count_packed_kmers(engine.reads_to_kmers(reads))
+    solid, solid_counts = count_packed_kmers(solid_kmers(engine, reads, 3))
+    # a sketch as large as the default one has no collisions on 30000 k-mers
+    assert solid.tolist() == kmers[counts >= 3].tolist()
+    assert solid_counts.tolist() == counts[counts >= 3].tolist()
+
+    # a tiny sketch lets some weak k-mers through, but never drops a solid one
+    lenient, lenient_counts = count_packed_kmers(solid_kmers(engine, reads, 3, width=1 << 10, depth=2))
+    assert set(kmers[counts >= 3].tolist()) < set(lenient.tolist())
+    assert lenient_counts.tolist() == counts[np.isin(kmers, lenient)].tolist()
+
+
+def test_graph_has_only_the_solid_edges():
+    reads = simulate_reads(random_genome(3000, seed=1), 100, 10, 0.01, seed=2, exact_errors=True)
+    kmers, counts = count_packed_kmers(KmerEngine(K).reads_to_kmers(reads))
+    for bulk in (False, True):
+        graph = DeBruijnGraph(K, reads, bulk=bulk, min_coverage=3).de_bruijn_graph
+        assert graph.num_edges == (counts >= 3).sum() and graph.coverage.min() >= 3
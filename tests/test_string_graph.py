@@ -0,0 +1,42 @@
+# python3
+from overlap_adjacency import OverlapAdjacency
+from overlap_graph import assemble_genome, build_hamiltonian_path_greedy, build_overlap_graph, reduce_overlap_graph
+from read_simulator import random_genome, simulate_reads
+from string_graph import transitive_reduction
+
+A, B, C = 0, 1, 2
+
+
+def test_transitive_edge_is_removed():
+    # A -> B -> C places C 6 bases after A, as A -> C does
+    adj = [[(B, 7), (C, 4)], [(C, 7)], []]
+    reduced = transitive_reduction(adj, [10, 10, 10])
+    assert isinstance(reduced, OverlapAdjacency)
+    assert list(reduced) == [[(B, 7)], [(C, 7)], []]
+    assert adj == [[(B, 7), (C, 4)], [(C, 7)], []]
+
+
+def test_edge_to_another_repeat_copy_is_kept():
+    # A -> C lands 7 bases after A, the path through B 6 bases after it
+    adj = [[(B, 7), (C, 3)], [(C, 7)], []]
+    assert list(transitive_reduction(adj, [10, 10, 10])) == adj
+    assert list(transitive_reduction(adj, [10, 10, 10], fuzz=1)) == [[(B, 7)], [(C, 7)], []]
+
+
+def test_only_irreducible_edges_are_left():
+    # every read overlaps the next three, only the edge to the next one isn't implied
+    adj = [[(b, 10 - 2 * (b - a)) for b in range(a + 1, min(a + 4, 8))] for a in range(8)]
+    reduced = transitive_reduction(adj, [10] * 8)
+    assert list(reduced) == [[(a + 1, 8)] for a in range(7)] + [[]]
+
+
+def test_reduced_graph_assembles_the_same_genome():
+    genome = random_genome(5386, seed=2)
+    reads = list(dict.fromkeys(simulate_reads(genome, 100, 20, seed=12)))
+    adj = build_overlap_graph(reads)
+    reduced = reduce_overlap_graph(adj, reads)
+    assert reduced.num_edges < adj.num_edges / 5
+
+    assembled = assemble_genome(build_hamiltonian_path_greedy(reduced, reads), reads)
+    assert assembled == assemble_genome(build_hamiltonian_path_greedy(adj, reads), reads)
+    assert len(assembled) == len(genome) and assembled in genome + genome
@@ -0,0 +1,36 @@
+# python3
+import pytest
+
+from read_simulator import random_genome, simulate_reads
+from tip_removal import remove_tip
+
+'''
+Tips removed on seeded simulated read sets, pinned to the output of the original recursive scan
+(sets where the original answer does not depend on string hash order)
+'''
+
+
+def simulated_reads(genome_length, num_reads, seed):
+    genome = random_genome(genome_length, seed=seed)
+    return simulate_reads(genome, 100, num_reads * 100 / genome_length, 0.01, seed + 1, exact_errors=True)
+
+
+@pytest.mark.parametrize('k, genome_length, num_reads, seed, expected', [
+    (15, 2000, 100, 3, 254),
+    (15, 5386, 200, 1, 434),
+    (15, 5386, 100, 4, 181),
+    (15, 5386, 200, 2, 495),
+    (15, 5386, 400, 1, 766),
+    (40, 2000, 100, 5, 1722),
+    (40, 3000, 200, 3, 3057),
+])
+def test_tips_match_the_original_scan(k, genome_length, num_reads, seed, expected):
+    assert remove_tip(k, simulated_reads(genome_length, num_reads, seed)).remove_tips() == expected
+
+
+def test_tips_do_not_depend_on_the_counting_path(tmp_path):
+    reads = simulated_reads(5386, 200, 1)
+    assert remove_tip(15, iter(reads), bulk=True).remove_tips() == 434
+    assert remove_tip(15, reads, workers=2).remove_tips() == 434
+    assert remove_tip(15, reads, cache_dir=str(tmp_path)).remove_tips() == 434
+    assert remove_tip(15, reads, cache_dir=str(tmp_path)).remove_tips() == 434  # cache hit
@@ -0,0 +1,170 @@
+# python3
+import numpy as np
+
+from instrumentation import counting
+
+'''
+Worklist tip clipping on a CSRGraph.
+
+A tip is a short dead-end chain hanging off the graph:
+    source tip => starts at a node without incoming edges and runs into a node with several incoming edges
+    sink tip   => starts at a node with several outgoing edges and runs into a node without outgoing edges
+every node inside the chain has exactly one incoming and one outgoing edge.
+A short chain with dead ends on both sides (an isolated path) is removed as well.
+Chain lengths are counted in k-mers (graph.lengths), so the same threshold works on a compacted graph.
+
+Instead of rescanning the whole graph after every removal:
+    1. Seed a worklist with the dead ends => (in 0, out 1) and (out 0, in 1) nodes
+    2. Walk each candidate chain once, at most `threshold` k-mers, and remove it if it is a tip
+    3. Removing a tip changes the degrees of its junction only, so that junction is the only node
+       which can become a new dead end => enqueue it
+Every edge is removed at most once and every walk is bounded by threshold => O(V + E) overall,
+and there is no recursion, so long chains can't hit the recursion limit.
+
+scan_tips keeps the rules of the original recursive remove_tip scan, whose edge count is the answer of tip_removal:
+    * candidates are visited once, in the order given (the order a dict graph created its nodes in)
+        source    => 1 outgoing edge, no incoming edge  => a tip if the chain runs into a node without outgoing
+                     edges or with several incoming edges within `threshold` k-mers
+        branching => several outgoing edges => every branch which runs into a node without outgoing edges
+                     through single-edge nodes within `threshold` + 1 k-mers is a tip
+    * incoming degrees are the ones the scan started with, removing a tip never turns its junction into a chain
+A walk is only repeated if it ran back into its candidate, the only node a removal there changes.
+'''
+
+
+def _tip_chain(graph, node, threshold, forward):
+    """
+    Walk from a dead end towards the rest of the graph.
+    :return (edges of the tip, node where it joins the graph) or (None, None) if it is not a tip
+    """
+    if forward:
+        next_edge, other_end = graph.out_edges, graph.targets
+        ahead, behind = graph.out_degree, graph.in_degree
+    else:
+        next_edge, other_end = graph.incoming_edges, graph.sources
+        ahead, behind = graph.in_degree, graph.out_degree
+
+    chain, length = [], 0
+    while True:
+        edge = next(next_edge(node))
+        length += graph.lengths[edge]
+        if length > threshold:
+            return None, None  # too long to be a tip
+        chain.append(edge)
+        node = int(other_end[edge])
+        if behind[node] > 1 or ahead[node] == 0:
+            return chain, node  # joins the graph / isolated path
+        if ahead[node] > 1:
+            return None, None  # the chain branches out, this is not a tip
+
+
+def is_dead_end(graph, node):
+    out_degree, in_degree = graph.out_degree[node], graph.in_degree[node]
+    return (in_degree == 0 and out_degree == 1) or (out_degree == 0 and in_degree == 1)
+
+
+def clip_tips(graph, threshold, worklist=None, counters=None):
+    """
+    Remove every tip of at most `threshold` k-mers, including the tips exposed by earlier removals.
+    :param worklist: nodes to start from, all the dead ends of the graph by default
+    :param counters: dict receiving tip_candidates / tips_clipped / edges_removed (see instrumentation)
+    :return number of k-mer edges removed
+    """
+    if worklist is None:
+        out_degree, in_degree = graph.out_degree, graph.in_degree
+        dead_ends = ((in_degree == 0) & (out_degree == 1)) | ((out_degree == 0) & (in_degree == 1))
+        worklist = np.flatnonzero(dead_ends).tolist()
+    else:
+        worklist = list(worklist)
+
+    edges_removed = tips = candidates = 0
+    while worklist:
+        node = worklist.pop()
+        if not is_dead_end(graph, node):
+            continue  # stale entry, an earlier removal changed this node
+
+        candidates += 1
+        chain, junction = _tip_chain(graph, node, threshold, forward=graph.out_degree[node] == 1)
+        if chain is None:
+            continue
+        tips += 1
+
+        for edge in chain:
+            graph.remove_edge(edge)
+            edges_removed += int(graph.lengths[edge])
+
+        if is_dead_end(graph, junction):
+            worklist.append(junction)
+
+    counting(counters, 'tip_candidates', candidates)
+    counting(counters, 'tips_clipped', tips)
+    counting(counters, 'edges_removed', edges_removed)
+    return edges_removed
+
+
+def _scan_walk(graph, edge, limit, in_degree, start, branching):
+    """
+    Follow the only (first) live edge out of every node from edge.
+    :return (edges of the tip or None, True if the walk came back to start)
+    """
+    out_degree, targets, lengths = graph.out_degree, graph.targets, graph.lengths
+    chain, length, returned = [], 0, False
+    while True:
+        chain.append(edge)
+        length += lengths[edge]
+        if length > limit:
+            return None, returned
+        node = int(targets[edge])
+        returned = returned or node == start
+        if branching:
+            if out_degree[node] > 1 or in_degree[node] > 1:
+                return None, returned
+            if out_degree[node] == 0:
+                return chain, returned
+        elif out_degree[node] == 0 or in_degree[node] > 1:
+            return chain, returned
+        edge = next(graph.out_edges(node))
+
+
+def scan_tips(graph, threshold, order, counters=None):
+    """
+    Remove tips the way the original recursive scan did (see above), every candidate visited once in `order`.
+    :param order: node ids, in the order the candidates are visited
+    :param counters: dict receiving tip_candidates / tips_clipped / edges_removed (see instrumentation)
+    :return number of k-mer edges removed
+    """
+    in_degree = graph.in_degree.copy()  # degrees at the start, never updated
+    out_degree = graph.out_degree
+    edges_removed = tips = candidates = 0
+    for node in np.asarray(order).tolist():
+        if out_degree[node] == 1 and in_degree[node] == 0:
+            branching, limit = False, threshold
+        elif out_degree[node] > 1:
+            branching, limit = True, threshold + 1
+        else:
+            continue
+        candidates += 1
+
+        failed = set()  # branches which can't become tips while this candidate is scanned
+        removed = True
+        while removed:
+            removed = False
+            for edge in list(graph.out_edges(node)):
+                if edge in failed:
+                    continue
+                chain, returned = _scan_walk(graph, edge, limit, in_degree, node, branching)
+                if chain is None:
+                    if not returned:
+                        failed.add(edge)
+                    continue
+                tips += 1
+                for tip_edge in chain:
+                    graph.remove_edge(tip_edge)
+                    edges_removed += int(graph.lengths[tip_edge])
+                removed = True
+                break
+
+    counting(counters, 'tip_candidates', candidates)
+    counting(counters, 'tips_clipped', tips)
+    counting(counters, 'edges_removed', edges_removed)
+    return edges_removed
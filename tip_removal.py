@@ -1,6 +1,15 @@
 # python3
 import sys
 
+from compaction import compact_graph
+from csr_graph import CSRGraph
+from external_counting import count_kmers_external, memory_budget_from_argv
+from graph_cache import GraphCache, cache_dir_from_argv, reads_digest
+from kmer_engine import KmerEngine, NodeDiscovery, count_packed_kmers
+from parallel_counting import count_kmers_parallel, workers_from_argv
+from read_io import iter_reads, source_from_argv
+from tip_clipping import scan_tips
+
 '''
 Tips are error-prone ends of the reads that do not form a bubble but instead form a path starting in a vertex
 without incoming edges or ending in a vertex without outgoing edges in the de Bruijn graph.
@@ -24,117 +33,83 @@ Note that you are not given the 100-mer composition of the genome
 
 class remove_tip:
 
-    def __init__(self, k, reads):
+    def __init__(self, k, reads, bulk=False, workers=1, memory_budget=None, cache_dir=None):
         self.k = k
+        self.workers = workers  # processes counting k-mers, 1 => serial
+        self.memory_budget = memory_budget  # bytes, k-mers are counted through temporary files if set
         self.threshold = self.k
-        self.de_bruijn_graph = {}
+        self.kmer_engine = KmerEngine(k)
         self.paths = {}
         self.edges_removed = 0
-        # for each node, we're storing [set of outgoing edges, number of incoming edges]
-        self.build_de_bruijn_graph(self.reads_to_kmers(reads))
-        # print(self.de_bruijn_graph)
+        # order the nodes first show up in the reads, tips are scanned in that order (see kmer_engine.NodeDiscovery)
+        self.discovery = NodeDiscovery(k)
+        # the compacted graph of the same reads and k is memory-mapped from the cache if it was built before
+        self.cache = None
+        if cache_dir:
+            reads = list(reads)  # hashed first, built from only on a cache miss
+            self.cache = GraphCache(cache_dir, reads_digest(reads), self.k)
+        self.de_bruijn_graph = self.cache.load('unitigs') if self.cache else None
+        if self.de_bruijn_graph is not None:
+            self.discovery.add(reads)
+        else:
+            reads = self.discovery.observe(reads)
+            # CSR graph => integer nodes, out/in degree arrays and a deleted-edge bitmap (see csr_graph)
+            if bulk or workers > 1 or memory_budget:
+                self.de_bruijn_graph = self.build_de_bruijn_graph_bulk(reads)
+            else:
+                self.de_bruijn_graph = self.build_de_bruijn_graph(self.reads_to_kmers(reads))
+            # walk unitigs instead of single k-mers, lengths are kept in k-mers (see compaction)
+            self.de_bruijn_graph = compact_graph(self.de_bruijn_graph)
+            if self.cache:
+                self.cache.store('unitigs', self.de_bruijn_graph)
 
     def reads_to_kmers(self, reads):
-        k_mers = []
-        for read in reads:
-            for j in range(len(read) - self.k + 1):
-                k_mers.append(read[j: j + self.k])
-        # print(k_mers)
-        return k_mers
+        # packed k-mers, generated lazily
+        return self.kmer_engine.reads_to_kmers(reads)
 
     def build_de_bruijn_graph(self, kmers):
         """
             How to Build de-bruijn graph:
-            1. For each k_mer get left and right K-1 mer
+            1. For each k_mer get left and right K-1 mer (2-bit packed integers, see kmer_engine)
             2. Add an edge from left -> right in the graph
             3. If left and right already exist in the graph use those nodes as opposed to creating new ones
         """
-        for kmer in kmers:
-            left, right = kmer[:-1], kmer[1:]
-
-            if left != right:
-                # for each node, add [set of outgoing edges, number of incoming edges] by default
-                self.de_bruijn_graph.setdefault(left, [set(), 0])
-                self.de_bruijn_graph.setdefault(right, [set(), 0])
-
-                if right not in self.de_bruijn_graph[left][0]:
-                    self.de_bruijn_graph[left][0].add(right)
-                    self.de_bruijn_graph[right][1] += 1
+        return CSRGraph.from_kmer_counts(*count_packed_kmers(kmers), self.k)
 
+    def build_de_bruijn_graph_bulk(self, reads):
+        """
+        Same graph, but k-mers are counted with NumPy in one pass (see kmer_engine.count_kmers_bulk),
+        on `workers` processes partitioned by minimizer if there is more than one (see parallel_counting),
+        through partition files on disk if there is a memory budget (see external_counting)
+        """
+        if self.memory_budget:
+            return CSRGraph.from_kmer_counts(*count_kmers_external(reads, self.k, self.memory_budget), self.k)
+        return CSRGraph.from_kmer_counts(*count_kmers_parallel(reads, self.k, self.workers), self.k)
 
     def remove_tips(self):
         """
-        Iterate over nodes, for nodes which could be tips run a dfs and keep removing tips
-        Removing a Tip also exposes Other tips so take care of that
+        Visit the nodes in the order they showed up in the reads and clip the tips starting there,
+        every candidate chain is walked iteratively up to threshold edges (see tip_clipping.scan_tips)
         """
-        for node, edge_info in self.de_bruijn_graph.items():
-            find_and_remove = None
-            # 2 cases of remove
-            # case 1 => Single Outgoing edge, no incoming edge
-            # case 2 => more than 1 outgoing edge
-            if len(edge_info[0]) == 1 and edge_info[1] == 0:
-                find_and_remove = self.remove_incoming
-            elif len(edge_info[0]) > 1:
-                find_and_remove = self.remove_outgoing
-            else:
-                continue
-
-            condition = True
-            while condition:
-                condition = False
-                for edge in edge_info[0]:
-                    if find_and_remove(edge, 0):
-                        edge_info[0].remove(edge)
-                        self.edges_removed += 1
-                        condition = True
-                        break
-
+        order = self.discovery.order(self.de_bruijn_graph.labels)
+        self.edges_removed += scan_tips(self.de_bruijn_graph, self.threshold, order)
         return self.edges_removed
 
-    def remove_outgoing(self, current, depth):
-        if self.num_outgoing(current) > 1 or self.num_incoming(current) > 1:
-            return False  # This is definitely not a tip
-
-        if self.num_outgoing(current) == 0:
-            return True  # this is a tip
-
-        if depth == self.threshold:
-            return False
-
-        # Recurse and if it returns true => We removed a tip and now another tip is exposed
-        if self.remove_outgoing(next(iter(self.de_bruijn_graph[current][0])), depth + 1):
-            self.de_bruijn_graph[current][0].pop()
-            self.edges_removed += 1
-            return True
-
-        return False
-
-    def remove_incoming(self, current, depth):
-        if depth == self.threshold:
-            return False
-
-        if self.num_outgoing(current) == 0 or self.num_incoming(current) > 1:
-            return True
-
-        if self.remove_incoming(next(iter(self.de_bruijn_graph[current][0])), depth + 1):
-            self.de_bruijn_graph[current][0].pop()
-            self.edges_removed += 1
-            return True
-
-        return False
-
     def num_incoming(self, v):
-        return self.de_bruijn_graph[v][1]
+        return self.de_bruijn_graph.in_degree[v]
 
     def num_outgoing(self, v):
-        return len(self.de_bruijn_graph[v][0])
+        return self.de_bruijn_graph.out_degree[v]
 
 
 if __name__ == "__main__":
     k_mer_size = 15
-    k, reads = k_mer_size, sys.stdin.read().split()
+    # reads are streamed from a file given on the command line or stdin (plain, FASTA, FASTQ, gzip)
+    k, reads = k_mer_size, iter_reads(source_from_argv(sys.argv[1:]))
 
-    print(remove_tip(k, reads).remove_tips())
+    tips = remove_tip(k, reads, bulk='--bulk' in sys.argv[1:], workers=workers_from_argv(sys.argv[1:]),
+                      memory_budget=memory_budget_from_argv(sys.argv[1:]), cache_dir=cache_dir_from_argv(sys.argv[1:]))
+    print(tips.remove_tips())
 
 '''
 Another Interesting Approach (Think about it later)